@@ -0,0 +1,28 @@
+"""
+URL configuration used in ASGI mode
+
+The read endpoints are served by async views first, everything else
+falls through to the regular URL configuration.
+"""
+from django.urls import include, path, re_path
+
+from app import urls
+from core import views as core_view
+from core.async_views import pooled_view
+from receipe.urls import router
+
+
+ASYNC_ROUTES = {
+    "receipe-list", "receipe-detail", "tag-list", "ingredient-list",
+}
+
+async_receipe_urls = [
+    re_path(str(url.pattern), pooled_view(url.callback), name=url.name)
+    for url in router.urls
+    if url.name in ASYNC_ROUTES
+]
+
+urlpatterns = [
+    path('api/health-check/', core_view.async_health_check),
+    path('api/', include(async_receipe_urls)),
+] + urls.urlpatterns
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,16 +53,22 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'app.urls'
+# Server mode: wsgi (uWSGI) or asgi (uvicorn), see scripts/run.sh.
+# ASGI serves the read endpoints through the async views in app.asgi_urls.
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+
+ROOT_URLCONF = 'app.asgi_urls' if SERVER_MODE == 'asgi' else 'app.urls'
 
 TEMPLATES = [
     {
@@ -81,20 +88,104 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# Size of the thread pool the async views run sync code and queries in,
+# which also bounds the database connections each ASGI process opens
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql',
         'NAME': os.environ.get('DB_NAME'),
         'HOST': os.environ.get('DB_HOST'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        # Seconds a worker keeps its connection between requests,
+        # 0 closes it after each request
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # Check a kept connection still works before reusing it
+        'CONN_HEALTH_CHECKS': bool(
+            int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1))
+        ),
+        # Connections per process in the in-process pool, 0 disables it.
+        # Pooled connections go back to the pool after each request
+        # whatever CONN_MAX_AGE is.
+        'POOL_SIZE': int(os.environ.get('DB_POOL_SIZE', 0)),
+        # Seconds to wait for a free pooled connection
+        'POOL_TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+    }
+}
+
+# Read replicas of the default database, comma separated hosts. Each is
+# added as replica1, replica2, ... with the credentials of the primary.
+for index, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Aliases safe requests read from, see core.db.routers
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+
+# A second test database standing in for a replica in the routing tests.
+# Unlike a TEST MIRROR it is a database of its own, so the tests can tell
+# which of the two a query read from. Not in REPLICA_DATABASES.
+if int(os.environ.get('DB_TEST_REPLICA', 0)):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'TEST': {'NAME': f"test_{DATABASES['default']['NAME']}_replica"},
+    }
+
+# Seconds a user reads from the primary after writing, so replication
+# lag never hides their own writes. Needs a cache shared by the workers,
+# reads stay on the primary without one.
+DB_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+
+# Seconds each readiness check may take, and seconds its results are
+# reused for so frequent probes do not add load on the database
+HEALTH_CHECK_TIMEOUT = float(os.environ.get('HEALTH_CHECK_TIMEOUT', 2))
+HEALTH_CHECK_TTL = float(os.environ.get('HEALTH_CHECK_TTL', 5))
+
+# Measure the queries, serializers and rendering of every request and
+# report them in Server-Timing headers and histograms, see core.metrics
+REQUEST_METRICS = bool(int(os.environ.get('REQUEST_METRICS', 1)))
+
+# Addresses or networks, comma separated, that may read /api/metrics/
+# without a token. Scrapers elsewhere, or behind the proxy, send
+# "Authorization: Bearer <METRICS_TOKEN>"; no token allows no one else.
+METRICS_ALLOWED_IPS = [
+    network.strip() for network in
+    os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+    if network.strip()
+]
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# The default LocMemCache is per process, the response and token caches
+# stay off with it. Deployments point these at a shared memcached instead.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+# Cache alias and lifetime (seconds) of cached receipe list responses
+RECEIPE_CACHE_ALIAS = os.environ.get('RECEIPE_CACHE_ALIAS', 'default')
+RECEIPE_CACHE_TIMEOUT = int(os.environ.get('RECEIPE_CACHE_TIMEOUT', 300))
 
 
 # Password validation
@@ -116,6 +207,32 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashers, first one hashes new passwords. Logins with a hash
+# from a later hasher, or from different cost settings, are rehashed.
+# Argon2 and bcrypt need the argon2-cffi and bcrypt packages installed.
+PASSWORD_HASHERS = os.environ.get(
+    'PASSWORD_HASHERS',
+    'user.hashers.TunedPBKDF2PasswordHasher,'
+    'user.hashers.TunedArgon2PasswordHasher,'
+    'user.hashers.TunedBCryptSHA256PasswordHasher,'
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+).split(',')
+# Cost settings of the tuned hashers in user.hashers
+PASSWORD_PBKDF2_ITERATIONS = int(
+    os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 260000)
+)
+PASSWORD_BCRYPT_ROUNDS = int(os.environ.get('PASSWORD_BCRYPT_ROUNDS', 12))
+PASSWORD_ARGON2_TIME_COST = int(
+    os.environ.get('PASSWORD_ARGON2_TIME_COST', 2)
+)
+PASSWORD_ARGON2_MEMORY_COST = int(
+    os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 102400)
+)
+PASSWORD_ARGON2_PARALLELISM = int(
+    os.environ.get('PASSWORD_ARGON2_PARALLELISM', 8)
+)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -153,4 +270,45 @@ REST_FRAMEWORK = {
 }
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
-}
\ No newline at end of file
+}
+
+# Number of rows validated and inserted together by the bulk import endpoint
+RECEIPE_BULK_CHUNK_SIZE = int(os.environ.get('RECEIPE_BULK_CHUNK_SIZE', 500))
+# Number of receipes loaded and serialized together by the export endpoint
+RECEIPE_EXPORT_CHUNK_SIZE = int(os.environ.get('RECEIPE_EXPORT_CHUNK_SIZE', 500))
+# Render the tags and ingredients of receipe lists from the copies kept on
+# the receipe rows instead of the link tables
+RECEIPE_DENORMALIZED_LIST = bool(
+    int(os.environ.get('RECEIPE_DENORMALIZED_LIST', 1))
+)
+
+# Cache alias and lifetime (seconds) of resolved auth tokens. Tokens are
+# only cached when the alias is a backend the workers share.
+AUTH_TOKEN_CACHE_ALIAS = os.environ.get('AUTH_TOKEN_CACHE_ALIAS', 'default')
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.environ.get('AUTH_TOKEN_CACHE_TIMEOUT', 300))
+# Size and lifetime (seconds) of the per-process token cache; a TTL of 0
+# disables it. Other processes only see an invalidation after this TTL.
+AUTH_TOKEN_LOCAL_CACHE_SIZE = int(
+    os.environ.get('AUTH_TOKEN_LOCAL_CACHE_SIZE', 1024)
+)
+AUTH_TOKEN_LOCAL_CACHE_TTL = float(
+    os.environ.get('AUTH_TOKEN_LOCAL_CACHE_TTL', 5)
+)
+
+# Threads per process rendering receipe image variants; with 0 they are
+# rendered by the request itself once it commits
+RECEIPE_IMAGE_WORKERS = int(os.environ.get('RECEIPE_IMAGE_WORKERS', 2))
+
+# Resumable image uploads: directory of the partial files, which must not
+# be served, the largest accepted image in bytes and the seconds an idle
+# upload is kept before cleanup_uploads removes it
+RESUMABLE_UPLOAD_DIR = os.environ.get(
+    'RESUMABLE_UPLOAD_DIR',
+    os.path.join(tempfile.gettempdir(), 'receipe-uploads'),
+)
+RESUMABLE_UPLOAD_MAX_SIZE = int(
+    os.environ.get('RESUMABLE_UPLOAD_MAX_SIZE', 100 * 1024 * 1024)
+)
+RESUMABLE_UPLOAD_EXPIRY = int(
+    os.environ.get('RESUMABLE_UPLOAD_EXPIRY', 24 * 60 * 60)
+)
@@ -11,6 +11,9 @@ from drf_spectacular.views import (
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/health-check/', core_view.health_check, name='health-check'),
+    path('api/health-check/ready/', core_view.readiness_check,
+         name='readiness-check'),
+    path('api/metrics/', core_view.metrics, name='metrics'),
     path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'),
     path('api/user/', include('user.urls')),
@@ -0,0 +1,51 @@
+"""
+Helpers for serving sync views from async views under ASGI
+
+Django runs every sync view of an ASGI process on one shared thread,
+so a slow query stalls all requests of the process. Views wrapped here
+run on a bounded pool of threads instead, while the event loop keeps
+accepting requests.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASGI_THREADS, thread_name_prefix="asgi-view"
+)
+
+
+async def run_in_pool(func, *args, **kwargs):
+    """Run func in the view thread pool and return its result"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor, functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+def _call_view(view, request, *args, **kwargs):
+    try:
+        response = view(request, *args, **kwargs)
+        # Render in the pool too, lazy querysets are evaluated by then
+        if callable(getattr(response, "render", None)):
+            response = response.render()
+        return response
+    finally:
+        # Pool threads outlive requests; a connection kept open here
+        # would sit idle with no request_finished signal to close it
+        connections.close_all()
+
+
+def pooled_view(view):
+    """Return an async view running the sync view in the thread pool"""
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await run_in_pool(_call_view, view, request, *args, **kwargs)
+
+    return async_view
@@ -0,0 +1,14 @@
+"""
+Helpers for the cache backends of the API
+"""
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+# Backends whose entries the other worker processes never see
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def is_shared(cache):
+    """Return whether every worker process sees the entries of cache"""
+    return not isinstance(cache, PROCESS_LOCAL_BACKENDS)
@@ -0,0 +1,141 @@
+"""
+PostgreSQL backend with health checked and optionally pooled connections
+
+Besides the usual settings a database may set:
+
+- CONN_HEALTH_CHECKS: check a reused connection with SELECT 1 before the
+  first query of each request, reconnecting when the server dropped it.
+- POOL_SIZE: hand out connections from an in-process pool of at most
+  this many per process; 0 disables the pool.
+- POOL_TIMEOUT: seconds to wait for a free pooled connection before
+  raising OperationalError.
+
+With the pool, connections go back to it at the end of each request or
+task whatever CONN_MAX_AGE is; the pool is what keeps them open.
+"""
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extensions
+
+from core.db import pool as pools
+
+
+Database = base.Database
+
+
+def reset_connection(conn):
+    """Ready a returned connection for reuse, False when it is broken"""
+    if conn.closed:
+        return False
+    if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+    return True
+
+
+def is_usable(conn):
+    """Return whether a round trip through the connection succeeds"""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except Database.Error:
+        return False
+    return True
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """Close pooled connections before the test database is dropped"""
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        pools.close_idle()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL connection with health checks and pooling"""
+
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = True
+
+    @property
+    def health_check_enabled(self):
+        return bool(self.settings_dict.get("CONN_HEALTH_CHECKS"))
+
+    def get_pool(self, conn_params):
+        """Return the pool to take connections from, None if disabled"""
+        size = int(self.settings_dict.get("POOL_SIZE") or 0)
+        if size <= 0:
+            return None
+        return pools.get_pool(
+            self.alias,
+            repr(sorted(conn_params.items())),
+            size,
+            float(self.settings_dict.get("POOL_TIMEOUT") or 5),
+            reset=reset_connection,
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool(conn_params)
+        self._pool = pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+
+        while True:
+            created = []
+
+            def connect():
+                created.append(super(DatabaseWrapper, self)
+                               .get_new_connection(conn_params))
+                return created[0]
+
+            try:
+                conn = pool.acquire(connect)
+            except pools.PoolTimeout as exc:
+                raise Database.OperationalError(str(exc)) from exc
+            if created:
+                return conn
+            # A pooled connection may have been idle long enough for the
+            # server or a proxy to drop it
+            if not self.health_check_enabled or is_usable(conn):
+                self.isolation_level = self.settings_dict["OPTIONS"].get(
+                    "isolation_level", conn.isolation_level
+                )
+                return conn
+            pool.release(conn, discard=True)
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def _close(self):
+        pool = getattr(self, "_pool", None)
+        if pool is None or self.connection is None:
+            return super()._close()
+        # Closing inside an atomic block keeps self.connection around
+        # until the block exits, so it must not go to another thread
+        pool.release(self.connection, discard=self.in_atomic_block)
+
+    def close_if_unusable_or_obsolete(self):
+        if self.connection is not None:
+            self.health_check_done = False
+            # A connection kept by an idle thread would hold one of the
+            # pool's few slots, starving the threads serving requests
+            if (getattr(self, "_pool", None) is not None and
+                    not self.in_atomic_block):
+                self.close()
+                return
+        super().close_if_unusable_or_obsolete()
+
+    def close_if_health_check_failed(self):
+        """Reconnect if the connection kept from a previous request died"""
+        if (self.connection is None or self.health_check_done or
+                not self.health_check_enabled or self.in_atomic_block):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def ensure_connection(self):
+        self.close_if_health_check_failed()
+        super().ensure_connection()
@@ -0,0 +1,50 @@
+"""
+Middleware scoping replica routing to a request
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+from core.db import routers
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    """Start each request on the primary and pin users who write
+
+    Views opt in to replicas with ReplicaReadMixin. The user is only
+    known once DRF authenticated the request, so the pin is set on the
+    way out. Under ASGI it stays async, so requests are not funnelled
+    through the one thread Django runs sync middleware on.
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = routers.read_from_primary()
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.reset(token)
+        self.pin_writer(request)
+        return response
+
+    async def __acall__(self, request):
+        # Set in the coroutine, so the routing belongs to this request's task
+        token = routers.read_from_primary()
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.reset(token)
+        if request.method not in SAFE_METHODS:
+            # request.user may still be lazy and query the database
+            await sync_to_async(self.pin_writer)(request)
+        return response
+
+    def pin_writer(self, request):
+        """Pin the user of a write to the primary"""
+        user = getattr(request, "user", None)
+        if (request.method not in SAFE_METHODS and user is not None and
+                user.is_authenticated):
+            routers.pin_to_primary(user.pk)
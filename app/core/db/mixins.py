@@ -0,0 +1,22 @@
+"""
+View mixins for reading from database replicas
+"""
+from rest_framework.permissions import SAFE_METHODS
+
+from core.db import routers
+
+
+class ReplicaReadMixin:
+    """Serve safe requests from a replica unless the user just wrote
+
+    Authentication runs first, on the primary, so a token created a
+    moment ago is found before it reaches the replicas.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        user = request.user
+        if request.method in SAFE_METHODS and not (
+            user.is_authenticated and routers.is_pinned(user.pk)
+        ):
+            routers.read_from_replica()
@@ -0,0 +1,191 @@
+"""
+In-process pool of database connections
+"""
+import threading
+import time
+from collections import namedtuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+
+POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Open pooled database connections, in use or idle",
+    ["alias", "state"],
+    multiprocess_mode="livesum",
+)
+POOL_WAIT_SECONDS = Histogram(
+    "db_pool_wait_seconds",
+    "Seconds waited for a free pooled connection",
+    ["alias"],
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts",
+    "Connections not acquired within the pool timeout",
+    ["alias"],
+)
+
+PoolMetrics = namedtuple("PoolMetrics", "in_use idle wait timeouts")
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became free within the pool's timeout"""
+
+
+class ConnectionPool:
+    """Bounded pool of connections shared by the threads of a process
+
+    At most size connections are open at once, idle or handed out.
+    acquire() reuses an idle connection, opens a new one while under the
+    limit, and otherwise waits up to timeout seconds for a release. The
+    waits are counted so starved pools show up in stats().
+    """
+
+    def __init__(self, size, timeout, reset=None, close=None, name=None):
+        self.size = size
+        self.timeout = timeout
+        # reset(conn) readies a returned connection for its next user and
+        # returns False when it must be discarded instead
+        self._reset = reset or (lambda conn: True)
+        self._close = close or (lambda conn: conn.close())
+        self._idle = []
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self.acquired = 0
+        self.opened = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        # Pools named after their alias are exported to Prometheus
+        self._metrics = None
+        if name is not None:
+            self._metrics = PoolMetrics(
+                POOL_CONNECTIONS.labels(name, "in_use"),
+                POOL_CONNECTIONS.labels(name, "idle"),
+                POOL_WAIT_SECONDS.labels(name),
+                POOL_TIMEOUTS.labels(name),
+            )
+
+    def acquire(self, factory):
+        """Return an idle connection, or a new one made by factory()"""
+        start = time.monotonic()
+        waited = False
+        with self._cond:
+            while not self._idle and self._in_use >= self.size:
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    if self._metrics:
+                        self._metrics.timeouts.inc()
+                    raise PoolTimeout(
+                        f"No connection free after {self.timeout}s, "
+                        f"all {self.size} are in use"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+            conn = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            self.acquired += 1
+            if waited:
+                elapsed = time.monotonic() - start
+                self.waits += 1
+                self.wait_time += elapsed
+                self.max_wait_time = max(self.max_wait_time, elapsed)
+                if self._metrics:
+                    self._metrics.wait.observe(elapsed)
+            if self._metrics:
+                self._metrics.in_use.inc()
+                if conn is not None:
+                    self._metrics.idle.dec()
+
+        if conn is None:
+            try:
+                conn = factory()
+            except BaseException:
+                self._give_back(None)
+                raise
+            with self._cond:
+                self.opened += 1
+        return conn
+
+    def _give_back(self, conn):
+        with self._cond:
+            self._in_use -= 1
+            if conn is not None:
+                self._idle.append(conn)
+            if self._metrics:
+                self._metrics.in_use.dec()
+                if conn is not None:
+                    self._metrics.idle.inc()
+            self._cond.notify()
+
+    def release(self, conn, discard=False):
+        """Return a connection, closing it when it cannot be reused"""
+        try:
+            reusable = not discard and self._reset(conn)
+        except Exception:
+            reusable = False
+        if not reusable:
+            try:
+                self._close(conn)
+            except Exception:
+                pass
+            conn = None
+        self._give_back(conn)
+
+    def close_idle(self):
+        """Close every idle connection"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            if self._metrics:
+                self._metrics.idle.dec(len(idle))
+        for conn in idle:
+            try:
+                self._close(conn)
+            except Exception:
+                pass
+
+    def stats(self):
+        """Return the pool's gauges and counters"""
+        with self._cond:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "acquired": self.acquired,
+                "opened": self.opened,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "wait_time": self.wait_time,
+                "max_wait_time": self.max_wait_time,
+            }
+
+
+# {(alias, connection params): pool} of the process
+pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, params, size, timeout, **kwargs):
+    """Return the pool of connections made with params for an alias
+
+    Keying on the params too keeps connections to the test database
+    apart from those to the database it was created from.
+    """
+    key = (alias, params)
+    with _pools_lock:
+        pool = pools.get(key)
+        if pool is None:
+            pool = pools[key] = ConnectionPool(
+                size, timeout, name=alias, **kwargs
+            )
+        return pool
+
+
+def close_idle():
+    """Close the idle connections of every pool"""
+    with _pools_lock:
+        current = list(pools.values())
+    for pool in current:
+        pool.close_idle()
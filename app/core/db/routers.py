@@ -0,0 +1,88 @@
+"""
+Routing of reads to replicas of the default database
+
+Reads go to the primary unless a view opted the current request into
+replicas with read_from_replica(). Writes always go to the primary. A
+user who wrote is pinned to the primary for DB_REPLICA_PIN_SECONDS so
+they read their own writes while the replicas catch up. The pins are
+kept in the default cache, so reads only go to replicas when every
+worker process shares it.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+from core.caches import is_shared
+
+
+PIN_KEY = "db:pin:{user_id}"
+
+_read_db = contextvars.ContextVar("read_db", default=None)
+
+
+def replicas():
+    """Return the aliases of the configured replicas"""
+    return list(settings.REPLICA_DATABASES)
+
+
+def is_enabled():
+    """Return whether reads may go to replicas
+
+    With a process local cache a worker never sees the pin another one
+    set, and would serve a writer from a replica that has not caught up.
+    """
+    return is_shared(caches["default"])
+
+
+def read_from_replica():
+    """Route the reads of the current request to one of the replicas"""
+    aliases = replicas()
+    if aliases and is_enabled():
+        _read_db.set(random.choice(aliases))
+
+
+def read_from_primary():
+    """Route the reads of the current request back to the primary"""
+    return _read_db.set(None)
+
+
+def reset(token):
+    """Restore the routing in place before read_from_primary()"""
+    _read_db.reset(token)
+
+
+def pin_to_primary(user_id):
+    """Send a user's reads to the primary for the pin window"""
+    cache.set(
+        PIN_KEY.format(user_id=user_id),
+        True,
+        timeout=settings.DB_REPLICA_PIN_SECONDS,
+    )
+
+
+def is_pinned(user_id):
+    """Return whether a user wrote within the pin window"""
+    return bool(cache.get(PIN_KEY.format(user_id=user_id)))
+
+
+class ReplicaRouter:
+    """Route reads to the replica chosen for the request, writes to default"""
+
+    def db_for_read(self, model, **hints):
+        return _read_db.get()
+
+    def db_for_write(self, model, **hints):
+        # Rows read from a replica are saved to the primary
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db in replicas():
+            return "default"
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        same_data = {"default", *replicas()}
+        if obj1._state.db in same_data and obj2._state.db in same_data:
+            return True
+        return None
@@ -0,0 +1,159 @@
+"""
+Readiness checks of the dependencies of the API
+
+Each check runs on a small thread pool so a hung database or volume
+fails its check after HEALTH_CHECK_TIMEOUT instead of hanging the
+probe. Results are kept for HEALTH_CHECK_TTL seconds and refreshed by
+one request at a time, so a storm of probes costs the database at most
+one SELECT 1 per process and TTL. A check still running from an earlier
+probe is waited on again rather than started twice, so hung checks
+cannot take every thread of the pool.
+"""
+import math
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+
+executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="health")
+
+_result = None
+_expires_at = 0.0
+_lock = threading.Lock()
+# {check name: future} of the last run of each check
+_running = {}
+
+
+def _fail_fast(alias):
+    """Return the thread's connection to alias, set to give up in time
+
+    Executor threads have connections of their own, so changing their
+    settings leaves the connections of requests alone.
+    """
+    connection = connections[alias]
+    if connection.vendor == "postgresql":
+        settings_dict = connections.databases[alias]
+        connection.settings_dict = {
+            **settings_dict,
+            # A pooled connection would outlive the check
+            "POOL_SIZE": 0,
+            "OPTIONS": {
+                **settings_dict["OPTIONS"],
+                # libpq waits whole seconds, at least 2
+                "connect_timeout": max(
+                    2, math.ceil(settings.HEALTH_CHECK_TIMEOUT)
+                ),
+            },
+        }
+    return connection
+
+
+def check_database(alias):
+    """Run SELECT 1 on a database within HEALTH_CHECK_TIMEOUT"""
+    connection = _fail_fast(alias)
+    # Pool threads live across probes and no request_finished signal
+    # closes what they open, so close it once the check is done
+    try:
+        with transaction.atomic(using=alias):
+            with connection.cursor() as cursor:
+                if connection.vendor == "postgresql":
+                    cursor.execute(
+                        "SET LOCAL statement_timeout = %s",
+                        [int(settings.HEALTH_CHECK_TIMEOUT * 1000)],
+                    )
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+    finally:
+        connection.close()
+
+
+def check_cache():
+    """Write and read back a key of the default cache"""
+    value = str(time.monotonic())
+    cache.set("health:probe", value, timeout=60)
+    if cache.get("health:probe") != value:
+        raise RuntimeError("Cache did not return the value just set")
+
+
+def check_media():
+    """Write a file to MEDIA_ROOT"""
+    with tempfile.NamedTemporaryFile(
+        dir=settings.MEDIA_ROOT, prefix=".health-"
+    ) as probe:
+        probe.write(b"ok")
+        probe.flush()
+
+
+def get_checks():
+    """Return {name: (func, *args)} of the checks to run"""
+    checks = {
+        "database" if alias == "default" else f"database:{alias}":
+            (check_database, alias)
+        for alias in connections
+    }
+    checks["cache"] = (check_cache,)
+    checks["media"] = (check_media,)
+    return checks
+
+
+def _run(func, *args):
+    """Return the seconds func took"""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def _submit(name, check):
+    """Start a check unless its last run is still going"""
+    future = _running.get(name)
+    if future is None or future.done():
+        future = _running[name] = executor.submit(_run, *check)
+    return future
+
+
+def run_checks():
+    """Run every check at once, returning {name: result}"""
+    futures = {
+        name: (time.perf_counter(), _submit(name, check))
+        for name, check in get_checks().items()
+    }
+    deadline = time.monotonic() + settings.HEALTH_CHECK_TIMEOUT
+    results = {}
+    for name, (start, future) in futures.items():
+        try:
+            elapsed = future.result(max(deadline - time.monotonic(), 0))
+        except TimeoutError:
+            results[name] = {
+                "ok": False,
+                "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+                "error": f"Timed out after {settings.HEALTH_CHECK_TIMEOUT}s",
+            }
+        except Exception as exc:
+            results[name] = {
+                "ok": False,
+                "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+                "error": f"{type(exc).__name__}: {exc}",
+            }
+        else:
+            results[name] = {
+                "ok": True, "latency_ms": round(elapsed * 1000, 2),
+            }
+    return results
+
+
+def readiness():
+    """Return the check results, at most HEALTH_CHECK_TTL seconds old"""
+    global _result, _expires_at
+    if time.monotonic() < _expires_at:
+        return _result
+    with _lock:
+        # Another probe may have refreshed them while this one waited
+        if time.monotonic() >= _expires_at:
+            _result = run_checks()
+            _expires_at = time.monotonic() + settings.HEALTH_CHECK_TTL
+        return _result
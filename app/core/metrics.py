@@ -0,0 +1,258 @@
+"""
+Per request timings of the API and their Prometheus exposition
+
+RequestMetricsMiddleware measures every request: the number and time
+of its queries, the time spent in serializers and renderers, and the
+total. The timings are sent back in a Server-Timing header and observed
+into Prometheus histograms labelled with the DRF view and action.
+
+With PROMETHEUS_MULTIPROC_DIR set before the workers start, every
+process writes its samples to files there and exposition() adds up the
+files of all processes.
+"""
+import asyncio
+import contextvars
+import functools
+import glob
+import hmac
+import ipaddress
+import os
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.deprecation import MiddlewareMixin
+from prometheus_client import (
+    REGISTRY, CollectorRegistry, Histogram, generate_latest, multiprocess
+)
+
+
+PHASES = ("db", "serialize", "render", "total")
+
+REQUEST_SECONDS = Histogram(
+    "api_request_seconds",
+    "Seconds spent serving API requests, per phase",
+    ["view", "action", "phase"],
+)
+REQUEST_QUERIES = Histogram(
+    "api_request_queries",
+    "Database queries run per API request",
+    ["view", "action"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, float("inf")),
+)
+
+# Collectors reading state shared by the processes, like the cache or
+# the database, when scraped. Apps register their own in ready().
+STATE_REGISTRY = CollectorRegistry(auto_describe=False)
+
+_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Seconds spent by one request in each phase"""
+
+    __slots__ = ("view", "action", "queries", "db", "serialize", "render")
+
+    def __init__(self):
+        self.view = "unmatched"
+        self.action = ""
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+
+    def server_timing(self, total):
+        """Return the Server-Timing header value, durations in ms"""
+        return (
+            f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries", '
+            f"serialize;dur={self.serialize * 1000:.2f}, "
+            f"render;dur={self.render * 1000:.2f}, "
+            f"total;dur={total * 1000:.2f}"
+        )
+
+    def observe(self, total):
+        """Add the request to the histograms"""
+        phases, queries = _children(self.view, self.action)
+        seconds = (self.db, self.serialize, self.render, total)
+        for child, value in zip(phases, seconds):
+            child.observe(value)
+        queries.observe(self.queries)
+
+
+@functools.lru_cache(maxsize=None)
+def _children(view, action):
+    """Return the histograms of a view and action, labels() being slow"""
+    return (
+        [REQUEST_SECONDS.labels(view, action, phase) for phase in PHASES],
+        REQUEST_QUERIES.labels(view, action),
+    )
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper adding each query to the request's timings"""
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db += time.perf_counter() - start
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    # First in line, so the pop() of execute_wrapper() blocks opened
+    # before the connection was made still removes their own wrapper
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def timed(phase, func):
+    """Wrap func to add its duration to a phase of the request"""
+    def wrapper(*args, **kwargs):
+        timings = _timings.get()
+        if timings is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            setattr(timings, phase, getattr(timings, phase) + elapsed)
+
+    return wrapper
+
+
+def view_labels(view_func, request):
+    """Return the (view, action) labels of a resolved view"""
+    cls = getattr(view_func, "cls", None)
+    if cls is None:
+        return view_func.__name__, ""
+    method = request.method.lower()
+    actions = getattr(view_func, "actions", None) or {}
+    return cls.__name__, actions.get(method, method)
+
+
+class TimedViewMixin:
+    """Time the serializers and renderer of a DRF view"""
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if _timings.get() is not None:
+            serializer.run_validation = timed(
+                "serialize", serializer.run_validation
+            )
+            serializer.to_representation = timed(
+                "serialize", serializer.to_representation
+            )
+        return serializer
+
+    def perform_content_negotiation(self, request, force=False):
+        renderer, media_type = super().perform_content_negotiation(
+            request, force
+        )
+        if _timings.get() is not None:
+            # Renderers are instantiated per negotiation
+            renderer.render = timed("render", renderer.render)
+        return renderer, media_type
+
+
+class RequestMetricsMiddleware(MiddlewareMixin):
+    """Measure each request and report it in Server-Timing
+
+    Under ASGI it stays async, so requests are not funnelled through the
+    one thread Django runs sync middleware on.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        connection_created.connect(
+            install_query_recorder, dispatch_uid="core.metrics"
+        )
+        for connection in connections.all():
+            install_query_recorder(connection=connection)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(response, timings, start)
+
+    async def __acall__(self, request):
+        # Set in the coroutine, so the timings belong to this request's task
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(response, timings, start)
+
+    def finish(self, response, timings, start):
+        """Report the timings of a request in its response"""
+        total = time.perf_counter() - start
+        response["Server-Timing"] = timings.server_timing(total)
+        timings.observe(total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = _timings.get()
+        if timings is not None:
+            timings.view, timings.action = view_labels(view_func, request)
+
+
+def _mark_dead_workers(path):
+    """Drop the live gauges of worker processes that exited"""
+    for name in glob.glob(os.path.join(path, "gauge_live*_*.db")):
+        pid = int(os.path.basename(name)[:-3].rsplit("_", 1)[1])
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            multiprocess.mark_process_dead(pid, path)
+        except PermissionError:
+            pass
+
+
+def is_scrape_allowed(request):
+    """Return whether a request may read the metrics
+
+    Allowed with the bearer METRICS_TOKEN or from METRICS_ALLOWED_IPS.
+    """
+    token = settings.METRICS_TOKEN
+    if token and hmac.compare_digest(
+        request.META.get("HTTP_AUTHORIZATION", "").encode(),
+        f"Bearer {token}".encode(),
+    ):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in settings.METRICS_ALLOWED_IPS
+    )
+
+
+def exposition():
+    """Return the metrics of every worker process in the text format"""
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        _mark_dead_workers(path)
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=path)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(STATE_REGISTRY)
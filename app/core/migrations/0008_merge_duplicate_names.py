@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-17 09:12
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge tags and ingredients sharing a name for the same user"""
+    Receipe = apps.get_model('core', 'Receipe')
+    for model_name, relation in (('Tags', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        field = Receipe._meta.get_field(relation)
+        through = field.remote_field.through
+        target = f'{field.m2m_reverse_field_name()}_id'
+        duplicates = (
+            model.objects.values('user', 'name')
+            .annotate(keep=Min('id'), total=Count('id'))
+            .filter(total__gt=1)
+        )
+        for dup in duplicates:
+            others = list(
+                model.objects.filter(user=dup['user'], name=dup['name'])
+                .exclude(id=dup['keep']).values_list('id', flat=True)
+            )
+            linked = through.objects.filter(
+                **{target: dup['keep']}
+            ).values('receipe_id')
+            through.objects.filter(
+                **{f'{target}__in': others, 'receipe_id__in': linked}
+            ).delete()
+            through.objects.filter(
+                **{f'{target}__in': others}
+            ).update(**{target: dup['keep']})
+            model.objects.filter(id__in=others).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_receipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
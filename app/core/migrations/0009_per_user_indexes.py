@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_merge_duplicate_names'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='receipe',
+            index=models.Index(fields=['user', '-id'], name='receipe_user_id_desc'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_ingredient_name_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='tags',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_tag_name_per_user'),
+        ),
+    ]
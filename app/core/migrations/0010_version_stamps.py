@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_per_user_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipe',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='data_version',
+            field=models.PositiveBigIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_version_stamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipe',
+            name='image_height',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='receipe',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], max_length=10),
+        ),
+        migrations.AddField(
+            model_name='receipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='receipe',
+            name='image_width',
+            field=models.PositiveIntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-18 00:20
+
+import core.models
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_image_upload_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='receipe',
+            name='image',
+            field=models.ImageField(null=True, storage=core.storage.get_image_storage, upload_to=core.models.receipe_image_file_path),
+        ),
+        migrations.AddIndex(
+            model_name='receipe',
+            index=models.Index(fields=['image'], name='receipe_image'),
+        ),
+    ]
@@ -0,0 +1,153 @@
+# Generated by Django 3.2.25 on 2026-10-18 00:27
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# The vector weighs the title A, tag and ingredient names B and the
+# description C. Triggers keep it current: receipe rows recompute it when
+# their text changes, the link tables after every statement adding or
+# removing links, and tags and ingredients when they are renamed.
+CREATE_SEARCH = """
+CREATE FUNCTION core_receipe_search_vector(
+    receipe_id bigint, title text, description text
+) RETURNS tsvector LANGUAGE sql STABLE AS $$
+    SELECT
+        setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce((
+            SELECT string_agg(t.name, ' ')
+            FROM core_receipe_tags rt JOIN core_tags t ON t.id = rt.tags_id
+            WHERE rt.receipe_id = $1
+        ), '')), 'B')
+        || setweight(to_tsvector('english', coalesce((
+            SELECT string_agg(i.name, ' ')
+            FROM core_receipe_ingredients ri
+            JOIN core_ingredient i ON i.id = ri.ingredient_id
+            WHERE ri.receipe_id = $1
+        ), '')), 'B')
+        || setweight(to_tsvector('english', coalesce(description, '')), 'C')
+$$;
+
+CREATE FUNCTION core_receipe_search_row() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := core_receipe_search_vector(
+        NEW.id, NEW.title, NEW.description
+    );
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER core_receipe_search
+BEFORE INSERT OR UPDATE OF title, description ON core_receipe
+FOR EACH ROW EXECUTE FUNCTION core_receipe_search_row();
+
+CREATE FUNCTION core_receipe_search_links() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE core_receipe r
+    SET search_vector = core_receipe_search_vector(r.id, r.title, r.description)
+    WHERE r.id IN (SELECT receipe_id FROM changed_links);
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER core_receipe_tags_added
+AFTER INSERT ON core_receipe_tags REFERENCING NEW TABLE AS changed_links
+FOR EACH STATEMENT EXECUTE FUNCTION core_receipe_search_links();
+CREATE TRIGGER core_receipe_tags_removed
+AFTER DELETE ON core_receipe_tags REFERENCING OLD TABLE AS changed_links
+FOR EACH STATEMENT EXECUTE FUNCTION core_receipe_search_links();
+CREATE TRIGGER core_receipe_ingredients_added
+AFTER INSERT ON core_receipe_ingredients
+REFERENCING NEW TABLE AS changed_links
+FOR EACH STATEMENT EXECUTE FUNCTION core_receipe_search_links();
+CREATE TRIGGER core_receipe_ingredients_removed
+AFTER DELETE ON core_receipe_ingredients
+REFERENCING OLD TABLE AS changed_links
+FOR EACH STATEMENT EXECUTE FUNCTION core_receipe_search_links();
+
+CREATE FUNCTION core_tags_search_renamed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE core_receipe r
+    SET search_vector = core_receipe_search_vector(r.id, r.title, r.description)
+    WHERE r.id IN (
+        SELECT receipe_id FROM core_receipe_tags WHERE tags_id = NEW.id
+    );
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER core_tags_search
+AFTER UPDATE OF name ON core_tags
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+EXECUTE FUNCTION core_tags_search_renamed();
+
+CREATE FUNCTION core_ingredient_search_renamed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE core_receipe r
+    SET search_vector = core_receipe_search_vector(r.id, r.title, r.description)
+    WHERE r.id IN (
+        SELECT receipe_id FROM core_receipe_ingredients
+        WHERE ingredient_id = NEW.id
+    );
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER core_ingredient_search
+AFTER UPDATE OF name ON core_ingredient
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+EXECUTE FUNCTION core_ingredient_search_renamed();
+
+UPDATE core_receipe
+SET search_vector = core_receipe_search_vector(id, title, description);
+
+CREATE INDEX receipe_search_vector ON core_receipe USING gin (search_vector);
+"""
+
+DROP_SEARCH = """
+DROP INDEX IF EXISTS receipe_search_vector;
+DROP TRIGGER IF EXISTS core_ingredient_search ON core_ingredient;
+DROP TRIGGER IF EXISTS core_tags_search ON core_tags;
+DROP TRIGGER IF EXISTS core_receipe_ingredients_removed ON core_receipe_ingredients;
+DROP TRIGGER IF EXISTS core_receipe_ingredients_added ON core_receipe_ingredients;
+DROP TRIGGER IF EXISTS core_receipe_tags_removed ON core_receipe_tags;
+DROP TRIGGER IF EXISTS core_receipe_tags_added ON core_receipe_tags;
+DROP TRIGGER IF EXISTS core_receipe_search ON core_receipe;
+DROP FUNCTION IF EXISTS core_ingredient_search_renamed();
+DROP FUNCTION IF EXISTS core_tags_search_renamed();
+DROP FUNCTION IF EXISTS core_receipe_search_links();
+DROP FUNCTION IF EXISTS core_receipe_search_row();
+DROP FUNCTION IF EXISTS core_receipe_search_vector(bigint, text, text);
+"""
+
+
+def create_search(apps, schema_editor):
+    """Install the search triggers and GIN index on PostgreSQL"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH)
+
+
+def drop_search(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_image_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # Other backends search without the vector, see receipe.search
+        migrations.RunPython(create_search, drop_search),
+    ]
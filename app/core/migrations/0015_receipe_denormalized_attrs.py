@@ -0,0 +1,91 @@
+# Generated by Django 3.2.25 on 2026-10-18 01:02
+
+from django.db import migrations, models
+
+
+FILL_SQL = """
+UPDATE core_receipe SET
+    tag_cache = coalesce(t.items, '[]'::jsonb), tag_count = t.n,
+    ingredient_cache = coalesce(i.items, '[]'::jsonb), ingredient_count = i.n
+FROM core_receipe src
+LEFT JOIN LATERAL (
+    SELECT jsonb_agg(jsonb_build_object('id', a.id, 'name', a.name)
+                     ORDER BY a.id) AS items, count(*) AS n
+    FROM core_receipe_tags l JOIN core_tags a ON a.id = l.tags_id
+    WHERE l.receipe_id = src.id
+) t ON true
+LEFT JOIN LATERAL (
+    SELECT jsonb_agg(jsonb_build_object('id', a.id, 'name', a.name)
+                     ORDER BY a.id) AS items, count(*) AS n
+    FROM core_receipe_ingredients l
+    JOIN core_ingredient a ON a.id = l.ingredient_id
+    WHERE l.receipe_id = src.id
+) i ON true
+WHERE core_receipe.id = src.id
+"""
+
+
+def fill_denormalized_attrs(apps, schema_editor):
+    """Copy the tags and ingredients of existing receipes onto them"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(FILL_SQL)
+        return
+    Receipe = apps.get_model('core', 'Receipe')
+    ids = list(Receipe.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), 1000):
+        batch = ids[start:start + 1000]
+        receipes = {r.pk: r for r in Receipe.objects.filter(pk__in=batch)}
+        for relation, cache, count in (
+            ('tags', 'tag_cache', 'tag_count'),
+            ('ingredients', 'ingredient_cache', 'ingredient_count'),
+        ):
+            field = Receipe._meta.get_field(relation)
+            owner = f'{field.m2m_field_name()}_id'
+            target = field.m2m_reverse_field_name()
+            rows = field.remote_field.through.objects.filter(
+                **{f'{owner}__in': batch}
+            ).order_by(owner, f'{target}_id').values_list(
+                owner, f'{target}_id', f'{target}__name'
+            )
+            for receipe in receipes.values():
+                setattr(receipe, cache, [])
+            for receipe_id, attr_id, name in rows:
+                getattr(receipes[receipe_id], cache).append(
+                    {'id': attr_id, 'name': name}
+                )
+            for receipe in receipes.values():
+                setattr(receipe, count, len(getattr(receipe, cache)))
+        Receipe.objects.bulk_update(receipes.values(), [
+            'tag_cache', 'tag_count', 'ingredient_cache', 'ingredient_count',
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_receipe_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipe',
+            name='ingredient_cache',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='receipe',
+            name='ingredient_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='receipe',
+            name='tag_cache',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='receipe',
+            name='tag_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_denormalized_attrs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_receipe_denormalized_attrs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='receipe',
+            index=models.Index(condition=models.Q(('image_status', 'pending')), fields=['image_status'], name='receipe_image_pending'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:20
+
+from django.db import migrations, models
+
+
+# receipe.images.VARIANTS as of this migration, smallest first
+LABELS = ['thumb', 'small', 'medium', 'large', 'full']
+
+
+def variants_to_list(apps, schema_editor):
+    """Turn {label: variant} objects into lists ordered by size
+
+    Empty objects are left as they are, they read like empty lists.
+    """
+    Receipe = apps.get_model('core', 'Receipe')
+    receipes = []
+    for receipe in Receipe.objects.exclude(image_variants={}).only(
+        'pk', 'image_variants'
+    ).iterator():
+        variants = receipe.image_variants
+        if not isinstance(variants, dict):
+            continue
+        receipe.image_variants = [
+            {'label': label, **variants[label]}
+            for label in LABELS if label in variants
+        ]
+        receipes.append(receipe)
+    Receipe.objects.bulk_update(receipes, ['image_variants'], batch_size=1000)
+
+
+def variants_to_dict(apps, schema_editor):
+    Receipe = apps.get_model('core', 'Receipe')
+    receipes = []
+    for receipe in Receipe.objects.exclude(image_variants=[]).only(
+        'pk', 'image_variants'
+    ).iterator():
+        variants = receipe.image_variants
+        if not isinstance(variants, list):
+            continue
+        receipe.image_variants = {
+            variant['label']: {
+                key: value for key, value in variant.items()
+                if key != 'label'
+            }
+            for variant in variants
+        }
+        receipes.append(receipe)
+    Receipe.objects.bulk_update(receipes, ['image_variants'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_receipe_image_pending'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='receipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(variants_to_list, variants_to_dict),
+    ]
@@ -9,6 +9,9 @@ import os
 from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import (AbstractBaseUser, BaseUserManager, PermissionsMixin)
+from django.contrib.postgres.search import SearchVectorField
+
+from core.storage import get_image_storage
 
 def receipe_image_file_path(instance, filename):
     """Generate file path for new receipe image"""
@@ -47,11 +50,31 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Bumped on every write to the user's receipes, tags or ingredients
+    data_version = models.PositiveBigIntegerField(default=1)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+    def save(self, *args, **kwargs):
+        """Save the user, leaving data_version to its UPDATEs
+
+        data_version is only bumped with F() expressions, see
+        receipe.versions, so a full save of an instance loaded before a
+        bump would write the old number back.
+        """
+        using = kwargs.get('using') or self._state.db
+        if (not self._state.adding and not args
+                and using == self._state.db
+                and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'data_version'
+            ]
+        super().save(*args, **kwargs)
+
 
 class Receipe(models.Model):
     """Model for receipe"""
@@ -66,7 +89,80 @@ class Receipe(models.Model):
                              )
     tags = models.ManyToManyField('Tags')
     ingredients = models.ManyToManyField('Ingredient')
-    image = models.ImageField(null=True, upload_to=receipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=receipe_image_file_path,
+        storage=get_image_storage,
+    )
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = [
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    ]
+    # Set by receipe.images while the resized variants of image are made
+    image_status = models.CharField(
+        max_length=10, choices=IMAGE_STATUS_CHOICES, blank=True
+    )
+    image_width = models.PositiveIntegerField(null=True)
+    image_height = models.PositiveIntegerField(null=True)
+    # Rendered sizes, smallest first, see receipe.images.render_variants
+    image_variants = models.JSONField(default=list, blank=True)
+    # Bumped on every write changing the receipe's representation
+    version = models.PositiveIntegerField(default=1)
+    # Copies of the tags and ingredients, see receipe.denormalized
+    tag_cache = models.JSONField(default=list, blank=True, editable=False)
+    ingredient_cache = models.JSONField(
+        default=list, blank=True, editable=False
+    )
+    tag_count = models.PositiveIntegerField(default=0, editable=False)
+    ingredient_count = models.PositiveIntegerField(default=0, editable=False)
+    # Maintained by database triggers on PostgreSQL, see receipe.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='receipe_user_id_desc'),
+            models.Index(fields=['image'], name='receipe_image'),
+            # Keeps counting the images waiting for variants cheap
+            models.Index(
+                fields=['image_status'],
+                name='receipe_image_pending',
+                condition=models.Q(image_status='pending'),
+            ),
+        ]
+
+    # Written by receipe.denormalized alone, see save()
+    DENORMALIZED_FIELDS = (
+        'tag_cache', 'ingredient_cache', 'tag_count', 'ingredient_count',
+    )
+
+    def save(self, *args, **kwargs):
+        # Updating a receipe loaded before its links changed must not
+        # write its outdated copies of them back
+        using = kwargs.get('using') or self._state.db
+        if (not self._state.adding and not args
+                and using == self._state.db
+                and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DENORMALIZED_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored image so receipe.signals can release it
+        # once it is replaced
+        instance._stored_image = instance.__dict__.get('image')
+        return instance
 
     def __str__(self):
         return self.title
@@ -76,6 +172,14 @@ class Tags(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     name = models.CharField(max_length=255, null=False)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_name_per_user',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -87,5 +191,42 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_ingredient_name_per_user',
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ImageUploadSession(models.Model):
+    """Resumable upload of a receipe image sent in chunks"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    receipe = models.ForeignKey(Receipe, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    # Number of bytes received so far, the next chunk has to start here
+    offset = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+
+class ImageBlob(models.Model):
+    """Image file shared by every receipe with the same content"""
+    name = models.CharField(max_length=255, unique=True)
+    # Number of receipe images stored as this file
+    refcount = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return self.name
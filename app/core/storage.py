@@ -0,0 +1,134 @@
+"""
+Content addressed file storage
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage keeping a single file per distinct content
+
+    Files are named after the SHA-256 of their bytes, computed while the
+    upload is spooled to disk, so storing the same content again returns
+    the existing name. Each save takes a reference on the file's
+    ImageBlob row and release() gives it back; the file is deleted with
+    its last reference. Since a name always holds the same bytes, the
+    files can be served with immutable caching headers.
+    """
+
+    prefix = "blobs"
+    chunk_size = 64 * 1024
+
+    def is_blob(self, name):
+        """Return True for names this storage gave out"""
+        return bool(name) and name.startswith(f"{self.prefix}/")
+
+    def _spool(self, content, directory):
+        """Return the path of a file holding content and its digest
+
+        Uploads already on disk are only read, others are copied to a
+        temporary file in directory while they are hashed.
+        """
+        digest = hashlib.sha256()
+        if hasattr(content, "temporary_file_path"):
+            path = content.temporary_file_path()
+            with open(path, "rb") as source:
+                for chunk in iter(lambda: source.read(self.chunk_size), b""):
+                    digest.update(chunk)
+            return path, digest.hexdigest()
+
+        fd, path = tempfile.mkstemp(dir=directory, suffix=".upload")
+        with os.fdopen(fd, "wb") as target:
+            if hasattr(content, "seek"):
+                content.seek(0)
+            for chunk in content.chunks(self.chunk_size):
+                digest.update(chunk)
+                target.write(chunk)
+        return path, digest.hexdigest()
+
+    def _reference(self, name):
+        """Take a reference on a blob, creating its row when missing"""
+        from core.models import ImageBlob
+
+        blob, _created = (
+            ImageBlob.objects.select_for_update().get_or_create(name=name)
+        )
+        ImageBlob.objects.filter(pk=blob.pk).update(
+            refcount=F("refcount") + 1
+        )
+
+    def _save(self, name, content):
+        directory = self.path(self.prefix)
+        os.makedirs(directory, exist_ok=True)
+        spool, digest = self._spool(content, directory)
+        ext = os.path.splitext(name)[1].lower()
+        name = posixpath.join(self.prefix, digest[:2], digest + ext)
+        path = self.path(name)
+        try:
+            # The blob row stays locked until the file is in place, so a
+            # concurrent release cannot delete it in between
+            with transaction.atomic():
+                self._reference(name)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    file_move_safe(spool, path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+        finally:
+            spooled = not hasattr(content, "temporary_file_path")
+            if spooled and os.path.exists(spool):
+                os.remove(spool)
+        return name
+
+    def release(self, name, cleanup=None):
+        """Drop a reference to a blob, deleting it with the last one
+
+        The file goes once the transaction commits. cleanup(name) is
+        called after the file was deleted. Returns True when this was
+        the last reference.
+        """
+        from core.models import ImageBlob
+
+        with transaction.atomic():
+            blob = ImageBlob.objects.select_for_update().filter(
+                name=name
+            ).first()
+            if blob is None:
+                return False
+            blob.refcount = max(blob.refcount - 1, 0)
+            blob.save(update_fields=["refcount"])
+            if blob.refcount:
+                return False
+        transaction.on_commit(lambda: self.collect(name, cleanup))
+        return True
+
+    def collect(self, name, cleanup=None):
+        """Delete a blob nothing references any more"""
+        from core.models import ImageBlob
+
+        with transaction.atomic():
+            # A save taking a new reference meanwhile keeps the row alive,
+            # and the file is removed before the row lock is released
+            deleted, _rows = ImageBlob.objects.filter(
+                name=name, refcount=0
+            ).delete()
+            if deleted:
+                self.delete(name)
+        if deleted and cleanup is not None:
+            cleanup(name)
+        return bool(deleted)
+
+
+image_storage = ContentAddressedStorage()
+
+
+def get_image_storage():
+    """Return the storage of receipe images"""
+    return image_storage
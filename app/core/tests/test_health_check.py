@@ -1,11 +1,21 @@
 """Test for the health check API"""
+import os
+import tempfile
+import threading
+from unittest.mock import patch
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core import health
+
+
+READY_URL = reverse("readiness-check")
+
+
 class HealthChechTests(TestCase):
     """Test the Health Check API"""
 
@@ -15,4 +25,82 @@ class HealthChechTests(TestCase):
         url = reverse("health-check")
         res = client.get(url)
 
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
\ No newline at end of file
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+@override_settings(HEALTH_CHECK_TTL=60)
+class ReadinessCheckTests(TestCase):
+    """Test the readiness probe of the dependencies"""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        media = override_settings(MEDIA_ROOT=self.media.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        # Start every test without the results of the previous one
+        health._expires_at = 0.0
+        self.client = APIClient()
+
+    def test_ready(self):
+        """Test every check passes and reports its latency"""
+        res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data['ready'])
+        for name in ('database', 'cache', 'media'):
+            self.assertTrue(res.data['checks'][name]['ok'])
+            self.assertGreaterEqual(res.data['checks'][name]['latency_ms'], 0)
+        self.assertEqual(os.listdir(self.media.name), [])
+
+    def test_failing_check(self):
+        """Test a failing dependency makes the API unready"""
+        os.rmdir(self.media.name)
+
+        res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(res.data['ready'])
+        self.assertFalse(res.data['checks']['media']['ok'])
+        self.assertIn(
+            'FileNotFoundError', res.data['checks']['media']['error']
+        )
+        self.assertTrue(res.data['checks']['database']['ok'])
+
+    @override_settings(HEALTH_CHECK_TIMEOUT=0.05)
+    def test_hung_check_times_out(self):
+        """Test a check taking too long fails instead of hanging the probe"""
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        with patch('core.health.check_cache', lambda: release.wait(5)):
+            res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Timed out', res.data['checks']['cache']['error'])
+
+    @override_settings(HEALTH_CHECK_TIMEOUT=0.05, HEALTH_CHECK_TTL=0)
+    def test_hung_check_not_started_again(self):
+        """Test probes wait on a hung check instead of queueing more"""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        calls = []
+
+        def hang():
+            calls.append(1)
+            release.wait(5)
+
+        with patch('core.health.check_cache', hang):
+            self.client.get(READY_URL)
+            res = self.client.get(READY_URL)
+
+        self.assertEqual(len(calls), 1)
+        self.assertIn('Timed out', res.data['checks']['cache']['error'])
+
+    def test_results_cached(self):
+        """Test probes within the TTL reuse the results"""
+        with patch('core.health.check_cache') as check_cache:
+            self.client.get(READY_URL)
+            self.client.get(READY_URL)
+
+        check_cache.assert_called_once()
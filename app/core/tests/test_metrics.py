@@ -0,0 +1,195 @@
+"""
+Test the request timing middleware and the metrics endpoint
+"""
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Receipe
+
+
+RECEIPES_URL = reverse('receipe:receipe-list')
+METRICS_URL = reverse('metrics')
+
+
+def durations(response):
+    """Return {metric: (ms, description)} from Server-Timing"""
+    found = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, dur = re.match(r'(\w+);dur=([\d.]+)', metric).groups()
+        desc = re.search(r'desc="([^"]*)"', metric)
+        found[name] = (float(dur), desc.group(1) if desc else None)
+    return found
+
+
+def observed(view, action, phase='total'):
+    return REGISTRY.get_sample_value('api_request_seconds_count', {
+        'view': view, 'action': action, 'phase': phase,
+    }) or 0
+
+
+class RequestMetricsTests(TestCase):
+    """Test requests are timed per phase"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='metrics@example.com',
+            password='12345',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Receipe.objects.create(
+            user=self.user,
+            title='Dal',
+            time_minutes=10,
+            price=Decimal('1.00'),
+        )
+
+    def test_server_timing_header(self):
+        """Test the header counts the queries and times every phase"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECEIPES_URL, {'facets': 1})
+
+        timings = durations(res)
+        self.assertEqual(
+            set(timings), {'db', 'serialize', 'render', 'total'}
+        )
+        self.assertEqual(timings['db'][1], f'{len(queries)} queries')
+        self.assertGreater(timings['serialize'][0], 0)
+        self.assertGreater(timings['render'][0], 0)
+        self.assertGreaterEqual(
+            timings['total'][0],
+            timings['serialize'][0] + timings['render'][0],
+        )
+
+    def test_histograms_labelled_by_view_and_action(self):
+        """Test requests are observed under their view and action"""
+        before = observed('ReceipeViewSet', 'list')
+        cookable_before = observed('ReceipeViewSet', 'cookable', 'db')
+
+        self.client.get(RECEIPES_URL)
+        self.client.get(reverse('receipe:receipe-cookable'), {
+            'ingredients': '1',
+        })
+
+        self.assertEqual(observed('ReceipeViewSet', 'list'), before + 1)
+        self.assertEqual(
+            observed('ReceipeViewSet', 'cookable', 'db'), cookable_before + 1
+        )
+
+    async def test_async_requests_timed(self):
+        """Test requests through the ASGI handler are timed too"""
+        token = await sync_to_async(Token.objects.create)(user=self.user)
+
+        res = await AsyncClient().get(
+            RECEIPES_URL, authorization=f'Token {token.key}'
+        )
+
+        self.assertEqual(res.status_code, 200)
+        timings = durations(res)
+        self.assertEqual(
+            set(timings), {'db', 'serialize', 'render', 'total'}
+        )
+        self.assertNotEqual(timings['db'][1], '0 queries')
+        self.assertGreater(timings['serialize'][0], 0)
+
+    @override_settings(REQUEST_METRICS=False)
+    def test_disabled(self):
+        """Test nothing is measured with the setting off"""
+        res = self.client.get(RECEIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+
+class MetricsEndpointTests(TestCase):
+    """Test the Prometheus metrics endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='scrape@example.com',
+            password='12345',
+        )
+
+    def test_exposes_requests_and_shared_state(self):
+        """Test request histograms, cache and queue gauges are exposed"""
+        Receipe.objects.create(
+            user=self.user,
+            title='Dal',
+            time_minutes=10,
+            price=Decimal('1.00'),
+            image_status=Receipe.IMAGE_PENDING,
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.get(RECEIPES_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        self.assertIn(
+            'api_request_seconds_bucket{action="list",'
+            'le="0.005",phase="total",view="ReceipeViewSet"}', body
+        )
+        self.assertIn('receipe_cache_misses_total', body)
+        self.assertIn('receipe_cache_hits_total', body)
+        self.assertIn('receipe_images_pending 1.0', body)
+        self.assertIn('receipe_upload_sessions 0.0', body)
+
+    def test_other_addresses_refused(self):
+        """Test scrapers outside METRICS_ALLOWED_IPS are refused"""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.7')
+
+        self.assertEqual(res.status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.0/8'])
+    def test_allowed_network(self):
+        """Test addresses in an allowed network may scrape"""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='10.1.2.3')
+
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_token_allows_any_address(self):
+        """Test the bearer token is accepted from anywhere, others not"""
+        res = self.client.get(
+            METRICS_URL, REMOTE_ADDR='203.0.113.7',
+            HTTP_AUTHORIZATION='Bearer scrape-secret',
+        )
+        wrong = self.client.get(
+            METRICS_URL, REMOTE_ADDR='203.0.113.7',
+            HTTP_AUTHORIZATION='Bearer guess',
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(wrong.status_code, 403)
+
+    def test_multiprocess_drops_dead_workers(self):
+        """Test files of exited workers are dropped from live gauges"""
+        worker = subprocess.Popen([sys.executable, '-c', ''])
+        worker.wait()
+        with tempfile.TemporaryDirectory() as path:
+            dead = os.path.join(path, f'gauge_livesum_{worker.pid}.db')
+            open(dead, 'wb').close()
+
+            with patch.dict(os.environ, PROMETHEUS_MULTIPROC_DIR=path):
+                res = self.client.get(METRICS_URL)
+
+            self.assertFalse(os.path.exists(dead))
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('receipe_images_pending 0.0', res.content.decode())
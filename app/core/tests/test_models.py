@@ -52,6 +52,18 @@ class ModelTests(TestCase):
         self.assertEqual(user.is_superuser, True)
         self.assertEqual(user.is_staff, True)
 
+    def test_save_keeps_data_version(self):
+        """Test saving a stale user does not roll back its data version"""
+        user = create_user(email='stale@example.com', password='test123')
+        get_user_model().objects.filter(pk=user.pk).update(data_version=3)
+
+        user.name = 'Stale'
+        user.save()
+
+        user.refresh_from_db()
+        self.assertEqual(user.name, 'Stale')
+        self.assertEqual(user.data_version, 3)
+
     def test_create_receipe(self):
         """Test creating a receipe is successful"""
         user = get_user_model().objects.create_user(
@@ -67,6 +79,20 @@ class ModelTests(TestCase):
         )
         self.assertEqual(str(receipe), receipe.title)
 
+    def test_receipe_save_to_other_database(self):
+        """Test copying a receipe to another database saves every field"""
+        user = create_user(email='copy@example.com', password='test123')
+        receipe = models.Receipe.objects.create(
+            user=user, title='Copied', time_minutes=5, price=Decimal('5.50'),
+        )
+
+        with patch('django.db.models.Model.save') as save:
+            receipe.save(using='replica')
+            receipe.save()
+
+        save.assert_any_call(using='replica')
+        self.assertIn('update_fields', save.call_args.kwargs)
+
     def test_create_tag(self):
         """Test create a tag is succeful"""
         user = create_user(email='new@exmaple.com', password='12345')
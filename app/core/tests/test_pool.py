@@ -0,0 +1,206 @@
+"""
+Test the database connection pool and the backend using it
+"""
+import threading
+import unittest
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from prometheus_client import REGISTRY
+
+from core.db import pool as pools
+from core.db.backends.postgresql.base import DatabaseWrapper
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Stand-in for a DB-API connection"""
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test handing out and taking back connections"""
+
+    def test_reuses_released_connections(self):
+        """Test a released connection is handed out again"""
+        pool = ConnectionPool(size=2, timeout=1)
+
+        conn = pool.acquire(FakeConnection)
+        pool.release(conn)
+
+        self.assertIs(pool.acquire(FakeConnection), conn)
+        self.assertEqual(pool.stats()['opened'], 1)
+        self.assertEqual(pool.stats()['acquired'], 2)
+
+    def test_times_out_when_exhausted(self):
+        """Test acquiring past the size waits then raises and is counted"""
+        pool = ConnectionPool(size=1, timeout=0.05)
+        pool.acquire(FakeConnection)
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+
+        stats = pool.stats()
+        self.assertEqual((stats['in_use'], stats['timeouts']), (1, 1))
+
+    def test_waiter_gets_released_connection(self):
+        """Test a waiting thread gets the connection another releases"""
+        pool = ConnectionPool(size=1, timeout=5)
+        conn = pool.acquire(FakeConnection)
+        got = []
+        waiter = threading.Thread(
+            target=lambda: got.append(pool.acquire(FakeConnection))
+        )
+
+        waiter.start()
+        pool.release(conn)
+        waiter.join()
+
+        self.assertEqual(got, [conn])
+        self.assertLessEqual(pool.stats()['waits'], 1)
+
+    def test_broken_connections_are_discarded(self):
+        """Test connections failing their reset are closed, not reused"""
+        def reset(conn):
+            raise RuntimeError('connection lost')
+
+        pool = ConnectionPool(size=1, timeout=1, reset=reset)
+        conn = pool.acquire(FakeConnection)
+
+        pool.release(conn)
+
+        self.assertTrue(conn.closed)
+        self.assertIsNot(pool.acquire(FakeConnection), conn)
+
+    def test_exports_named_pools(self):
+        """Test named pools report their connections and timeouts"""
+        def sample(name, **labels):
+            return REGISTRY.get_sample_value(
+                name, {'alias': 'exported', **labels}
+            ) or 0
+
+        before = {
+            'in_use': sample('db_pool_connections', state='in_use'),
+            'idle': sample('db_pool_connections', state='idle'),
+            'timeouts': sample('db_pool_timeouts_total'),
+        }
+        pool = ConnectionPool(size=1, timeout=0, name='exported')
+
+        conn = pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+        self.assertEqual(
+            sample('db_pool_connections', state='in_use'),
+            before['in_use'] + 1,
+        )
+        pool.release(conn)
+
+        self.assertEqual(
+            sample('db_pool_connections', state='in_use'), before['in_use']
+        )
+        self.assertEqual(
+            sample('db_pool_connections', state='idle'), before['idle'] + 1
+        )
+        self.assertEqual(
+            sample('db_pool_timeouts_total'), before['timeouts'] + 1
+        )
+        pool.close_idle()
+
+    def test_failed_connect_frees_its_slot(self):
+        """Test a factory error does not leak a slot of the pool"""
+        def factory():
+            raise OSError('refused')
+
+        pool = ConnectionPool(size=1, timeout=0.05)
+
+        with self.assertRaises(OSError):
+            pool.acquire(factory)
+
+        self.assertIsInstance(pool.acquire(FakeConnection), FakeConnection)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'PostgreSQL only')
+class PooledBackendTests(TestCase):
+    """Test health checks and pooling of PostgreSQL connections"""
+
+    def tearDown(self):
+        pools.close_idle()
+        pools.pools.clear()
+
+    def wrapper(self, **overrides):
+        return DatabaseWrapper(
+            {**connection.settings_dict, **overrides}, alias='pool test',
+        )
+
+    def request(self, wrapper):
+        """Run a query the way a request does, returning the backend pid"""
+        wrapper.close_if_unusable_or_obsolete()
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            pid = cursor.fetchone()[0]
+        wrapper.close_if_unusable_or_obsolete()
+        return pid
+
+    def test_health_check_replaces_dropped_connection(self):
+        """Test a connection the server dropped is replaced, not used"""
+        wrapper = self.wrapper(CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True)
+        pid = self.request(wrapper)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+
+        self.assertNotEqual(self.request(wrapper), pid)
+        wrapper.close()
+
+    def test_requests_share_pooled_connection(self):
+        """Test connections closed after a request go back to the pool"""
+        wrapper = self.wrapper(CONN_MAX_AGE=0, POOL_SIZE=1)
+
+        first = self.request(wrapper)
+        second = self.request(wrapper)
+
+        self.assertEqual(first, second)
+        self.assertIsNone(wrapper.connection)
+        stats = wrapper.get_pool(wrapper.get_connection_params()).stats()
+        self.assertEqual((stats['opened'], stats['idle']), (1, 1))
+
+    def test_persistent_connections_go_back_to_pool(self):
+        """Test CONN_MAX_AGE does not keep a pooled connection on a thread"""
+        wrapper = self.wrapper(CONN_MAX_AGE=60, POOL_SIZE=1)
+
+        self.request(wrapper)
+
+        self.assertIsNone(wrapper.connection)
+        stats = wrapper.get_pool(wrapper.get_connection_params()).stats()
+        self.assertEqual((stats['in_use'], stats['idle']), (0, 1))
+
+    def test_more_threads_than_pool_size(self):
+        """Test threads outnumbering the pool take turns without timeouts"""
+        overrides = {'CONN_MAX_AGE': 60, 'POOL_SIZE': 2, 'POOL_TIMEOUT': 5}
+        errors = []
+
+        def work():
+            # Connections belong to the thread creating them
+            wrapper = self.wrapper(**overrides)
+            try:
+                for _ in range(5):
+                    self.request(wrapper)
+            except Exception as exc:
+                errors.append(exc)
+
+        workers = [threading.Thread(target=work) for _ in range(6)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        wrapper = self.wrapper(**overrides)
+        stats = wrapper.get_pool(wrapper.get_connection_params()).stats()
+        self.assertEqual(stats['in_use'], 0)
+        self.assertLessEqual(stats['opened'], 2)
+        self.assertEqual(stats['timeouts'], 0)
@@ -0,0 +1,117 @@
+"""
+Test routing reads to database replicas
+"""
+import tempfile
+import unittest
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.db import routers
+from core.models import Receipe
+
+
+RECEIPES_URL = reverse('receipe:receipe-list')
+ME_URL = reverse('user:me')
+# The stand-in replica database DB_TEST_REPLICA=1 configures
+REPLICA = 'replica'
+
+
+def create_receipe(user, title, using='default'):
+    return Receipe.objects.using(using).create(
+        user=user,
+        title=title,
+        time_minutes=5,
+        price=Decimal('1.00'),
+    )
+
+
+@unittest.skipUnless(
+    REPLICA in settings.DATABASES, 'Set DB_TEST_REPLICA=1 to test replicas'
+)
+@override_settings(REPLICA_DATABASES=[REPLICA], DB_REPLICA_PIN_SECONDS=60)
+class ReplicaRoutingTests(TestCase):
+    """Test safe requests read replicas and writers read the primary"""
+
+    # The runner sets up the databases of skipped classes too
+    databases = {'default', REPLICA} & set(settings.DATABASES)
+
+    def setUp(self):
+        # Pins are only trusted in a cache all processes share
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        shared = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location.name,
+        }})
+        shared.enable()
+        self.addCleanup(shared.disable)
+        self.user = get_user_model().objects.create_user(
+            email='replica@example.com',
+            password='12345',
+        )
+        self.user.save(using=REPLICA)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def titles(self):
+        res = self.client.get(RECEIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [receipe['title'] for receipe in res.data['results']]
+
+    def test_process_local_cache_reads_primary(self):
+        """Test replicas are not read when pins are not shared"""
+        create_receipe(self.user, 'On the primary')
+        create_receipe(self.user, 'On the replica', using=REPLICA)
+
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}):
+            self.assertEqual(self.titles(), ['On the primary'])
+
+    def test_safe_requests_read_replica(self):
+        """Test listing receipes reads from the replica"""
+        create_receipe(self.user, 'On the primary')
+        create_receipe(self.user, 'On the replica', using=REPLICA)
+
+        self.assertEqual(self.titles(), ['On the replica'])
+
+    def test_writer_reads_primary_until_pin_expires(self):
+        """Test a user reads their writes, then replicas again"""
+        res = self.client.post(RECEIPES_URL, {
+            'title': 'Just written',
+            'time_minutes': 5,
+            'price': '1.00',
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertFalse(
+            Receipe.objects.using(REPLICA).filter(user=self.user).exists()
+        )
+        self.assertEqual(self.titles(), ['Just written'])
+
+        cache.delete(routers.PIN_KEY.format(user_id=self.user.pk))
+        create_receipe(self.user, 'Replicated earlier', using=REPLICA)
+        self.assertEqual(self.titles(), ['Replicated earlier'])
+
+    def test_token_read_from_primary(self):
+        """Test a token missing from the replica still authenticates"""
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        res = client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_reads_outside_requests_use_primary(self):
+        """Test code outside views is never routed to a replica"""
+        self.assertIsNone(routers.ReplicaRouter().db_for_read(Receipe))
@@ -0,0 +1,94 @@
+"""
+Tests for the content addressed storage
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from core.models import ImageBlob
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test storing files once per content"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.storage = ContentAddressedStorage(location=self.root)
+
+    def test_named_after_content(self):
+        """Test files are stored under the digest of their bytes"""
+        name = self.storage.save("photo.JPG", ContentFile(b"image"))
+
+        digest = hashlib.sha256(b"image").hexdigest()
+        self.assertEqual(name, f"blobs/{digest[:2]}/{digest}.jpg")
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b"image")
+
+    def test_same_content_stored_once(self):
+        """Test saving identical bytes again reuses the file"""
+        first = self.storage.save("a.jpg", ContentFile(b"same"))
+        second = self.storage.save("b.jpg", ContentFile(b"same"))
+
+        self.assertEqual(first, second)
+        self.assertEqual(ImageBlob.objects.get(name=first).refcount, 2)
+        files = [f for _d, _s, fs in os.walk(self.root) for f in fs]
+        self.assertEqual(len(files), 1)
+
+    def test_release_keeps_referenced_blob(self):
+        """Test a blob stays while references remain"""
+        name = self.storage.save("a.jpg", ContentFile(b"same"))
+        self.storage.save("b.jpg", ContentFile(b"same"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            last = self.storage.release(name)
+
+        self.assertFalse(last)
+        self.assertTrue(self.storage.exists(name))
+
+    def test_last_release_deletes_blob(self):
+        """Test the file goes with its last reference"""
+        name = self.storage.save("a.jpg", ContentFile(b"only"))
+        cleaned = []
+
+        with self.captureOnCommitCallbacks(execute=True):
+            last = self.storage.release(name, cleanup=cleaned.append)
+
+        self.assertTrue(last)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+        self.assertEqual(cleaned, [name])
+
+    def test_collect_skips_rereferenced_blob(self):
+        """Test a blob referenced again before collection survives"""
+        name = self.storage.save("a.jpg", ContentFile(b"only"))
+        self.storage.release(name)
+        self.storage.save("b.jpg", ContentFile(b"only"))
+
+        self.assertFalse(self.storage.collect(name))
+        self.assertTrue(self.storage.exists(name))
+
+    def test_missing_file_rewritten(self):
+        """Test a blob whose file went missing is written again"""
+        name = self.storage.save("a.jpg", ContentFile(b"data"))
+        os.remove(self.storage.path(name))
+
+        self.storage.save("b.jpg", ContentFile(b"data"))
+
+        self.assertTrue(self.storage.exists(name))
+
+    def test_no_temporary_files_left(self):
+        """Test spooled uploads are cleaned up"""
+        self.storage.save("a.jpg", ContentFile(b"data"))
+        self.storage.save("b.jpg", ContentFile(b"data"))
+
+        leftovers = [
+            f for _d, _s, fs in os.walk(self.root) for f in fs
+            if f.endswith(".upload")
+        ]
+        self.assertEqual(leftovers, [])
@@ -2,12 +2,42 @@
 Core views for app
 """
 
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views.decorators.http import require_GET
+from prometheus_client import CONTENT_TYPE_LATEST
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 
+from core import health
+from core.metrics import exposition, is_scrape_allowed
+
 
 @api_view(["GET"])
 def health_check(request):
     """returns successful rersponse"""
-    return Response({"healthy": True}, status.HTTP_200_OK)
\ No newline at end of file
+    return Response({"healthy": True}, status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+def readiness_check(request):
+    """returns whether the database, cache and media volume work"""
+    checks = health.readiness()
+    ready = all(check["ok"] for check in checks.values())
+    return Response(
+        {"ready": ready, "checks": checks},
+        status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+async def async_health_check(request):
+    """returns successful response without leaving the event loop"""
+    return JsonResponse({"healthy": True})
+
+
+@require_GET
+def metrics(request):
+    """returns the Prometheus metrics of all worker processes"""
+    if not is_scrape_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(exposition(), content_type=CONTENT_TYPE_LATEST)
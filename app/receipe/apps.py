@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ReceipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'receipe'
+
+    def ready(self):
+        from receipe import signals  # noqa: F401
+        from core.metrics import STATE_REGISTRY
+        from receipe.metrics import ReceipeCollector
+        STATE_REGISTRY.register(ReceipeCollector())
@@ -0,0 +1,131 @@
+"""
+Helpers for seeding benchmark data and timing receipe queries
+"""
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from core.models import Receipe, Tags, Ingredient
+from receipe import denormalized
+
+
+# Words seeded titles and descriptions are made of, so searches over
+# seeded receipes match realistic fractions of them
+WORDS = (
+    "chicken", "beef", "lentil", "tofu", "salmon", "rice", "noodle",
+    "curry", "soup", "salad", "stew", "roast", "spicy", "sweet", "smoky",
+    "garlic", "lemon", "ginger", "tomato", "mushroom", "baked", "grilled",
+    "quick", "creamy", "crispy", "herb", "honey", "pepper", "coconut",
+    "potato", "bean", "cheese",
+)
+
+
+def _words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def get_bench_user(email):
+    """Return the benchmark user, creating it when missing"""
+    user, _ = get_user_model().objects.get_or_create(
+        email=email,
+        defaults={"name": "bench"},
+    )
+    return user
+
+
+def _seed_names(model, user, prefix, count):
+    """Make sure user owns count named rows and return their ids"""
+    names = [f"{prefix} {i}" for i in range(count)]
+    existing = set(
+        model.objects.filter(user=user, name__in=names)
+        .values_list("name", flat=True)
+    )
+    model.objects.bulk_create(
+        [model(user=user, name=name) for name in names
+         if name not in existing],
+        batch_size=1000,
+    )
+    return list(
+        model.objects.filter(user=user, name__in=names)
+        .values_list("id", flat=True)
+    )
+
+
+def seed_receipes(user, receipes, tags=50, ingredients=200, per_receipe=4,
+                  batch_size=5000, seed=0):
+    """Bulk create receipes linked to random tags and ingredients"""
+    rng = random.Random(seed)
+    tag_ids = _seed_names(Tags, user, "tag", tags)
+    ingr_ids = _seed_names(Ingredient, user, "ingredient", ingredients)
+    tag_through = Receipe.tags.through
+    ingr_through = Receipe.ingredients.through
+
+    created = 0
+    while created < receipes:
+        size = min(batch_size, receipes - created)
+        with transaction.atomic():
+            last_id = (
+                Receipe.objects.order_by("-id")
+                .values_list("id", flat=True).first() or 0
+            )
+            Receipe.objects.bulk_create(
+                [
+                    Receipe(
+                        user=user,
+                        title=f"{_words(rng, 3)} {created + i}",
+                        description=_words(rng, 12),
+                        time_minutes=rng.randint(5, 120),
+                        price=Decimal(rng.randint(100, 9999)) / 100,
+                    )
+                    for i in range(size)
+                ],
+                batch_size=1000,
+            )
+            ids = Receipe.objects.filter(
+                user=user, id__gt=last_id
+            ).values_list("id", flat=True)
+            tag_rows, ingr_rows = [], []
+            for receipe_id in ids:
+                for tag_id in rng.sample(tag_ids, min(per_receipe, tags)):
+                    tag_rows.append(
+                        tag_through(receipe_id=receipe_id, tags_id=tag_id)
+                    )
+                for ingr_id in rng.sample(
+                    ingr_ids, min(per_receipe, ingredients)
+                ):
+                    ingr_rows.append(
+                        ingr_through(
+                            receipe_id=receipe_id, ingredient_id=ingr_id
+                        )
+                    )
+            tag_through.objects.bulk_create(tag_rows, batch_size=5000)
+            ingr_through.objects.bulk_create(ingr_rows, batch_size=5000)
+            denormalized.refresh(ids)
+        created += size
+    return created
+
+
+def time_call(func, repeat=10):
+    """Call func repeat times and return timings in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "max": max(timings),
+    }
+
+
+def format_timing(label, timing):
+    """Return a one line summary of a time_call result"""
+    return (
+        f"{label:<40} median {timing['median']:8.2f} ms  "
+        f"min {timing['min']:8.2f} ms  max {timing['max']:8.2f} ms"
+    )
@@ -0,0 +1,195 @@
+"""
+Streaming bulk import of receipes
+"""
+import csv
+import json
+from itertools import islice
+
+from django.db import DatabaseError, connection, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+
+from core.models import Receipe, Tags, Ingredient
+from receipe import denormalized
+from receipe.resolvers import resolve_names
+from receipe.versions import touch_user
+
+
+NDJSON = "application/x-ndjson"
+CSV = "text/csv"
+
+RELATIONS = (("tags", Tags), ("ingredients", Ingredient))
+
+
+class MalformedBodyError(ValueError):
+    """Raised for a body that is not valid UTF-8 or CSV from a line on"""
+
+    def __init__(self, line, message):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+
+
+def iter_lines(stream):
+    """Yield decoded lines from a binary stream without reading it whole"""
+    for number, raw in enumerate(stream or (), start=1):
+        if not isinstance(raw, bytes):
+            yield raw
+            continue
+        try:
+            yield raw.decode("utf-8-sig")
+        except UnicodeDecodeError as exc:
+            raise MalformedBodyError(number, f"Invalid UTF-8: {exc.reason}.")
+
+
+def iter_ndjson_rows(stream):
+    """Yield (row number, data, error) for each line of an NDJSON body"""
+    for number, line in enumerate(iter_lines(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            yield number, None, {"non_field_errors": [f"Invalid JSON: {exc}"]}
+            continue
+        if not isinstance(data, dict):
+            yield number, None, {"non_field_errors": ["Expected an object."]}
+            continue
+        yield number, data, None
+
+
+def _split_names(value):
+    """Turn a comma separated CSV cell into nested name objects"""
+    return [{"name": name.strip()} for name in value.split(",")
+            if name.strip()]
+
+
+def iter_csv_rows(stream):
+    """Yield (row number, data, error) for each record of a CSV body
+
+    The tags and ingredients columns hold comma separated names, and
+    empty cells are dropped so model defaults apply.
+    """
+    read = 0
+
+    def lines():
+        # reader.line_num lags behind on some errors, count lines here
+        nonlocal read
+        for read, line in enumerate(iter_lines(stream), start=1):
+            yield line
+
+    reader = csv.DictReader(lines())
+    while True:
+        try:
+            data = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as exc:
+            raise MalformedBodyError(read, f"Invalid CSV: {exc}.")
+        row = {
+            key: value for key, value in data.items()
+            if key is not None and value not in (None, "")
+        }
+        for relation, _model in RELATIONS:
+            if relation in row:
+                row[relation] = _split_names(row[relation])
+        yield reader.line_num, row, None
+
+
+class BulkImporter:
+    """Validate and insert receipe rows chunk by chunk
+
+    Only one chunk of rows is held in memory at a time and at most
+    max_errors row errors are kept, so memory use does not grow with
+    the size of the upload.
+    """
+
+    max_errors = 1000
+
+    def __init__(self, serializer_class, user, context, chunk_size=500):
+        # One serializer validates every row, the way ListSerializer reuses
+        # its child, so the fields are only built once per import.
+        self.serializer = serializer_class(context=context)
+        self.user = user
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def _add_error(self, number, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": number, "errors": errors})
+
+    def _insert(self, valid):
+        """Insert the validated rows of one chunk and link their attrs"""
+        receipes = []
+        attrs = {relation: [] for relation, _model in RELATIONS}
+        for _number, data in valid:
+            for relation, _model in RELATIONS:
+                attrs[relation].append(
+                    [item["name"] for item in data.pop(relation, [])]
+                )
+            receipes.append(Receipe(user=self.user, **data))
+
+        if connection.features.can_return_rows_from_bulk_insert:
+            Receipe.objects.bulk_create(receipes)
+        else:
+            for receipe in receipes:
+                receipe.save(force_insert=True)
+
+        for relation, model in RELATIONS:
+            names = attrs[relation]
+            objs = resolve_names(
+                model, self.user, (name for row in names for name in row)
+            )
+            field = Receipe._meta.get_field(relation)
+            through = field.remote_field.through
+            owner = f"{field.m2m_field_name()}_id"
+            target = f"{field.m2m_reverse_field_name()}_id"
+            through.objects.bulk_create(
+                [
+                    through(**{owner: receipe.pk, target: objs[name].pk})
+                    for receipe, row in zip(receipes, names)
+                    for name in set(row)
+                ],
+                ignore_conflicts=True,
+            )
+        # bulk_create sends no signals, so bump the user's version and
+        # copy the links onto the receipes here
+        denormalized.refresh([receipe.pk for receipe in receipes])
+        touch_user(self.user.pk)
+        return len(receipes)
+
+    def _flush(self, chunk):
+        """Validate one chunk of rows and insert the valid ones"""
+        valid = []
+        for number, data, error in chunk:
+            if error:
+                self._add_error(number, error)
+                continue
+            try:
+                valid.append((number, self.serializer.run_validation(data)))
+            except ValidationError as exc:
+                self._add_error(number, as_serializer_error(exc))
+        if not valid:
+            return
+        try:
+            with transaction.atomic():
+                self.created += self._insert(valid)
+        except DatabaseError as exc:
+            for number, _data in valid:
+                self._add_error(number, {"non_field_errors": [str(exc)]})
+
+    def run(self, rows):
+        """Import every row and return a summary of the outcome"""
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self._flush(chunk)
+        return {
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
@@ -0,0 +1,163 @@
+"""
+Per-user response cache for the receipe list endpoints
+
+Cached responses are keyed by a per-user generation number. Any write
+touching a user's receipes, tags or ingredients bumps that number (see
+receipe.signals), which orphans every cached response of the user at
+once instead of deleting them one by one.
+
+The generation has to be seen by every worker process, so nothing is
+cached unless RECEIPE_CACHE_ALIAS names a backend they share.
+"""
+import functools
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from prometheus_client import Counter
+
+from core.caches import is_shared
+
+
+GENERATION_KEY = "receipe:gen:{user_id}"
+RESPONSE_KEY = (
+    "receipe:resp:{user_id}:{generation}:{endpoint}:{variant}:{params}"
+)
+
+# Counted by each process, added up across them like every other metric
+CACHE_HITS = Counter(
+    "receipe_cache_hits",
+    "Receipe list responses served from the cache",
+)
+CACHE_MISSES = Counter(
+    "receipe_cache_misses",
+    "Receipe list responses rendered for the cache",
+)
+
+
+def get_cache():
+    """Return the cache backend holding receipe responses"""
+    return caches[settings.RECEIPE_CACHE_ALIAS]
+
+
+def is_enabled():
+    """Return whether responses are cached
+
+    With a process local backend a write only bumps the generation in
+    the process that served it, and the others keep serving what they
+    cached before.
+    """
+    return is_shared(get_cache())
+
+
+def _fresh_generation():
+    """Return a generation number no earlier generation can collide with"""
+    return time.time_ns()
+
+
+def get_generation(user_id):
+    """Return the current cache generation of a user"""
+    cache = get_cache()
+    key = GENERATION_KEY.format(user_id=user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _fresh_generation(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def reset_generation(user_id):
+    """Start a user on a generation no cached response is stored under"""
+    get_cache().set(
+        GENERATION_KEY.format(user_id=user_id),
+        _fresh_generation(),
+        timeout=None,
+    )
+
+
+def _bump(user_id):
+    try:
+        get_cache().incr(GENERATION_KEY.format(user_id=user_id))
+    except ValueError:
+        reset_generation(user_id)
+
+
+def bump_generation(user_id):
+    """Invalidate every cached response of a user
+
+    The bump happens right away, so reads later in the same transaction
+    miss, and again on commit, so a response cached by a concurrent read
+    of the pre-commit data is not served afterwards.
+    """
+    _bump(user_id)
+    transaction.on_commit(lambda: _bump(user_id))
+
+
+def response_key(user_id, endpoint, query_params, variant=""):
+    """Return the cache key of a response for the current generation"""
+    params = sorted(
+        (key, value)
+        for key, values in query_params.lists()
+        for value in values
+    )
+    return RESPONSE_KEY.format(
+        user_id=user_id,
+        generation=get_generation(user_id),
+        endpoint=endpoint,
+        variant=variant,
+        params=hashlib.sha1(urlencode(params).encode()).hexdigest(),
+    )
+
+
+def cached_list(view_method):
+    """Cache the rendered JSON of a viewset list action per user
+
+    Responses are only cached for the JSON renderer since the browsable
+    API embeds request specific forms and tokens, and only with a shared
+    cache backend. When an ETag was
+    computed for the request it is part of the key, so a cached body is
+    only ever served with the ETag of the data it was rendered from.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != "json" or not is_enabled():
+            return view_method(self, request, *args, **kwargs)
+
+        cache = get_cache()
+        key = response_key(
+            request.user.pk,
+            f"{self.basename}:{self.action}",
+            request.query_params,
+            variant=getattr(request, "etag", ""),
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            CACHE_HITS.inc()
+            status_code, content_type, content = cached
+            response = HttpResponse(
+                content, status=status_code, content_type=content_type
+            )
+            response["X-Cache"] = "HIT"
+            return response
+
+        CACHE_MISSES.inc()
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            response.render()
+            cache.set(
+                key,
+                (response.status_code, response["Content-Type"],
+                 response.content),
+                timeout=settings.RECEIPE_CACHE_TIMEOUT,
+            )
+        response["X-Cache"] = "MISS"
+        return response
+
+    return wrapper
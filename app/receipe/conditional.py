@@ -0,0 +1,143 @@
+"""
+Conditional request handling for the receipe API
+
+ETags are derived from the version stamps kept on the models, so they
+can be checked before anything is serialized: the list ETag from the
+user's data_version and the detail ETag from the receipe's version.
+"""
+import functools
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.models import Receipe
+
+
+def make_etag(request, *parts):
+    """Return a strong ETag for parts rendered for this request"""
+    parts += (
+        request.accepted_renderer.format,
+        request.get_host(),
+        sorted(request.query_params.lists()),
+    )
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def _matches(header, etag, weak=True):
+    """Return True when an If-(None-)Match header matches etag"""
+    if not header:
+        return False
+    etags = parse_etags(header)
+    if "*" in etags:
+        return True
+    if weak:
+        return any(
+            (tag[2:] if tag.startswith("W/") else tag) == etag
+            for tag in etags
+        )
+    return etag in etags
+
+
+def _not_modified(etag):
+    response = HttpResponseNotModified()
+    response["ETag"] = etag
+    return response
+
+
+def _lookup(view, kwargs):
+    """Return the pk the detail request addresses"""
+    return kwargs.get(view.lookup_url_kwarg or view.lookup_field)
+
+
+def _receipe_version(view, kwargs, lock=False):
+    """Return the version of the requested receipe, if the user owns it"""
+    queryset = Receipe.objects.filter(user=view.request.user)
+    if lock:
+        queryset = queryset.select_for_update()
+    try:
+        return queryset.filter(pk=_lookup(view, kwargs)).values_list(
+            "version", flat=True
+        ).first()
+    except (TypeError, ValueError):
+        return None
+
+
+def list_etag(view_method):
+    """Answer If-None-Match on a list action from the user's data_version
+
+    The ETag is also stored on the request so the response cache keys
+    cached bodies by it and never pairs an ETag with older content.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        version = get_user_model().objects.filter(
+            pk=request.user.pk
+        ).values_list("data_version", flat=True).get()
+        etag = make_etag(request, self.basename, request.user.pk, version)
+        if _matches(request.META.get("HTTP_IF_NONE_MATCH"), etag):
+            return _not_modified(etag)
+
+        request.etag = etag
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+        return response
+
+    return wrapper
+
+
+def detail_etag(view_method):
+    """Answer If-None-Match on a detail action from the receipe version"""
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        version = _receipe_version(self, kwargs)
+        if version is None:
+            return view_method(self, request, *args, **kwargs)
+        etag = make_etag(request, _lookup(self, kwargs), version)
+        if _matches(request.META.get("HTTP_IF_NONE_MATCH"), etag):
+            return _not_modified(etag)
+
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+        return response
+
+    return wrapper
+
+
+def if_match(view_method):
+    """Reject writes whose If-Match does not name the current version
+
+    The receipe row is locked while the version is compared and the
+    write runs, so two clients holding the same ETag cannot both win.
+    partial_update goes through update, so only update needs wrapping.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        header = request.META.get("HTTP_IF_MATCH")
+        with transaction.atomic():
+            version = _receipe_version(self, kwargs, lock=True)
+            if version is None:
+                return view_method(self, request, *args, **kwargs)
+            etag = make_etag(request, _lookup(self, kwargs), version)
+            if header and not _matches(header, etag, weak=False):
+                return Response(
+                    {"detail": "Precondition failed."},
+                    status=status.HTTP_412_PRECONDITION_FAILED,
+                )
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response["ETag"] = make_etag(
+                    request,
+                    _lookup(self, kwargs),
+                    _receipe_version(self, kwargs),
+                )
+        return response
+
+    return wrapper
@@ -0,0 +1,50 @@
+"""
+Rank receipes by how much of them the ingredients at hand cover
+"""
+from django.db.models import Count, F, FloatField
+from django.db.models.functions import Cast, NullIf
+
+
+# Fully covered receipes first, then those missing the fewest ingredients
+ORDERING = ("-coverage", "missing", "-id")
+
+
+def annotate_coverage(queryset, ingredient_ids):
+    """Annotate receipes with how many of their ingredients are at hand
+
+    Adds ``matched`` and ``missing`` ingredient counts and ``coverage``,
+    the matched share of the receipe's ingredients, and keeps only the
+    receipes using at least one of ingredient_ids. Only the links to
+    ingredient_ids are joined and grouped; the receipe's total comes
+    from its denormalized ingredient_count, so the ranking is a single
+    query that never reads the other links.
+    """
+    return queryset.filter(ingredients__in=ingredient_ids).annotate(
+        matched=Count("ingredients"),
+    ).annotate(
+        missing=F("ingredient_count") - F("matched"),
+        # A double, so the value survives a round trip through a cursor
+        coverage=(
+            Cast("matched", FloatField())
+            / Cast(NullIf("ingredient_count", 0), FloatField())
+        ),
+    )
+
+
+def load_page(ranked, queryset):
+    """Return the rows of queryset for a ranked page, in ranking order
+
+    The ranking only carries ids and counts through its aggregate, the
+    columns a page renders are read for its rows alone. Receipes deleted
+    in between are left out.
+    """
+    rows = queryset.in_bulk([receipe.pk for receipe in ranked])
+    page = []
+    for receipe in ranked:
+        row = rows.get(receipe.pk)
+        if row is not None:
+            row.matched = receipe.matched
+            row.missing = receipe.missing
+            row.coverage = receipe.coverage
+            page.append(row)
+    return page
@@ -0,0 +1,132 @@
+"""
+Tag and ingredient names kept on the receipe rows themselves
+
+Receipe.tag_cache and ingredient_cache hold the {"id", "name"} of the
+receipe's tags and ingredients, ordered by id, with their counts in
+tag_count and ingredient_count. receipe.signals refreshes them in the
+transaction changing the links or renaming an attribute, so lists can
+render receipes without reading the link tables.
+"""
+from django.db import connection, transaction
+
+from core.models import Receipe, Tags, Ingredient
+
+
+RELATION_OF = {Tags: "tags", Ingredient: "ingredients"}
+RELATIONS = (
+    ("tags", "tag_cache", "tag_count"),
+    ("ingredients", "ingredient_cache", "ingredient_count"),
+)
+FIELDS = [name for _rel, cache, count in RELATIONS for name in (cache, count)]
+BATCH_SIZE = 1000
+
+
+def compute(receipe_ids):
+    """Return {receipe_id: {field: value}} read from the link tables"""
+    values = {
+        pk: {cache: [] for _rel, cache, _count in RELATIONS}
+        for pk in receipe_ids
+    }
+    for relation, cache, count in RELATIONS:
+        field = Receipe._meta.get_field(relation)
+        owner = f"{field.m2m_field_name()}_id"
+        target = field.m2m_reverse_field_name()
+        rows = field.remote_field.through.objects.filter(
+            **{f"{owner}__in": receipe_ids}
+        ).order_by(owner, f"{target}_id").values_list(
+            owner, f"{target}_id", f"{target}__name"
+        )
+        for receipe_id, attr_id, name in rows:
+            values[receipe_id][cache].append({"id": attr_id, "name": name})
+    for fields in values.values():
+        for _rel, cache, count in RELATIONS:
+            fields[count] = len(fields[cache])
+    return values
+
+
+def _update_sql():
+    """Return an UPDATE recomputing the copies of receipes in SQL
+
+    PostgreSQL aggregates each receipe's links into JSON itself, so a
+    batch is one statement however many receipes it holds.
+    """
+    joins, sets = [], []
+    for i, (relation, cache, count) in enumerate(RELATIONS):
+        field = Receipe._meta.get_field(relation)
+        joins.append(
+            f"LEFT JOIN LATERAL ("
+            f"SELECT jsonb_agg(jsonb_build_object('id', a.id, 'name', a.name)"
+            f" ORDER BY a.id) AS items, count(*) AS n"
+            f" FROM {field.remote_field.through._meta.db_table} l"
+            f" JOIN {field.related_model._meta.db_table} a"
+            f" ON a.id = l.{field.m2m_reverse_name()}"
+            f" WHERE l.{field.m2m_column_name()} = src.id"
+            f") a{i} ON true"
+        )
+        sets.append(
+            f"{cache} = coalesce(a{i}.items, '[]'::jsonb), {count} = a{i}.n"
+        )
+    table = Receipe._meta.db_table
+    return (
+        f"UPDATE {table} SET {', '.join(sets)}"
+        f" FROM {table} src {' '.join(joins)}"
+        f" WHERE {table}.id = src.id AND src.id = ANY(%s)"
+    )
+
+
+def _update_rows(receipe_ids):
+    """Recompute the copies of receipes row by row"""
+    receipes = list(Receipe.objects.filter(pk__in=receipe_ids).only("pk"))
+    values = compute(receipe_ids)
+    for receipe in receipes:
+        for name, value in values[receipe.pk].items():
+            setattr(receipe, name, value)
+    Receipe.objects.bulk_update(receipes, FIELDS)
+
+
+def refresh(receipe_ids):
+    """Recompute the denormalized columns of the given receipes
+
+    The receipe rows are locked before the links are read, so of two
+    transactions changing the links of a receipe the later one sees the
+    links the earlier one committed.
+    """
+    receipe_ids = sorted(set(receipe_ids))
+    for start in range(0, len(receipe_ids), BATCH_SIZE):
+        with transaction.atomic():
+            batch = list(
+                Receipe.objects.select_for_update()
+                .filter(pk__in=receipe_ids[start:start + BATCH_SIZE])
+                .order_by("pk").values_list("pk", flat=True)
+            )
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(_update_sql(), [batch])
+            else:
+                _update_rows(batch)
+
+
+def linked_receipe_ids(instance):
+    """Return the ids of the receipes linked to a tag or ingredient"""
+    return list(
+        Receipe.objects.filter(
+            **{RELATION_OF[type(instance)]: instance}
+        ).values_list("pk", flat=True)
+    )
+
+
+def find_inconsistent(queryset, batch_size=BATCH_SIZE):
+    """Yield the ids of receipes whose stored columns are out of date"""
+    ids = queryset.order_by("pk").values_list("pk", flat=True)
+    last = 0
+    while True:
+        batch = list(ids.filter(pk__gt=last)[:batch_size])
+        if not batch:
+            return
+        expected = compute(batch)
+        stored = Receipe.objects.filter(pk__in=batch).values("pk", *FIELDS)
+        for row in stored:
+            pk = row.pop("pk")
+            if row != expected[pk]:
+                yield pk
+        last = batch[-1]
@@ -0,0 +1,56 @@
+"""
+Facet counts of tags and ingredients over a filtered receipe list
+"""
+from django.conf import settings
+from django.db.models import Count
+
+from core.models import Tags, Ingredient
+from receipe import cache
+
+
+FACETS = (("tags", Tags), ("ingredients", Ingredient))
+# Params that page through a list without changing what it holds
+PAGE_PARAMS = ("cursor", "page_size", "facets")
+
+
+def wants_facets(request):
+    """Return True when the request asked for facet counts"""
+    return request.query_params.get("facets") in ("1", "true")
+
+
+def count_facets(queryset, user):
+    """Count the receipes of queryset per tag and per ingredient
+
+    One GROUP BY per attribute over its links to the receipes, so the
+    cost depends on the filtered receipes and never on the page size.
+    """
+    receipes = queryset.order_by().values("pk")
+    return {
+        relation: list(
+            model.objects.filter(user=user, receipe__in=receipes)
+            .annotate(count=Count("receipe"))
+            .order_by("-count", "name")
+            .values("id", "name", "count")
+        )
+        for relation, model in FACETS
+    }
+
+
+def get_facets(request, queryset):
+    """Return the facet counts of queryset, cached per user generation
+
+    Every page of a list shares the facets of the first one.
+    """
+    if not cache.is_enabled():
+        return count_facets(queryset, request.user)
+    params = request.query_params.copy()
+    for param in PAGE_PARAMS:
+        params.pop(param, None)
+    key = cache.response_key(request.user.pk, "receipe:facets", params)
+    facets = cache.get_cache().get(key)
+    if facets is None:
+        facets = count_facets(queryset, request.user)
+        cache.get_cache().set(
+            key, facets, timeout=settings.RECEIPE_CACHE_TIMEOUT
+        )
+    return facets
@@ -0,0 +1,74 @@
+"""
+Filters for receipe APIs
+"""
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+from core.models import Receipe
+
+
+MATCH_ANY = "any"
+MATCH_ALL = "all"
+
+
+def params_to_ints(param, value):
+    """Convert a comma separated list of ids into a list of unique ints"""
+    try:
+        ids = {int(str_id) for str_id in value.split(",") if str_id.strip()}
+    except ValueError:
+        raise ValidationError(
+            {param: _("Expected a comma separated list of ids.")}
+        )
+    return sorted(ids)
+
+
+class ReceipeFilter:
+    """Compile receipe filter params into subqueries on the link tables
+
+    Each relation filter becomes ``EXISTS (SELECT ... FROM <through>
+    WHERE receipe_id = outer.id AND <attr>_id IN (...))`` so the outer
+    query never fans out over the join table and needs no DISTINCT.
+    With ``match=all`` and several ids it becomes ``id IN (SELECT
+    receipe_id FROM <through> WHERE <attr>_id IN (...) GROUP BY
+    receipe_id HAVING COUNT(*) = <number of ids>)``, grouped once
+    instead of once per outer receipe as a correlated subquery would be.
+    """
+
+    relations = ("tags", "ingredients")
+
+    def __init__(self, params):
+        self.match = params.get("match", MATCH_ANY) or MATCH_ANY
+        if self.match not in (MATCH_ANY, MATCH_ALL):
+            raise ValidationError(
+                {"match": _("Expected one of 'any' or 'all'.")}
+            )
+        self.ids = {
+            relation: params_to_ints(relation, params[relation])
+            for relation in self.relations
+            if params.get(relation)
+        }
+
+    def _condition(self, relation, ids):
+        """Return the filter condition for one relation"""
+        field = Receipe._meta.get_field(relation)
+        through = field.remote_field.through
+        owner = f"{field.m2m_field_name()}_id"
+        target = f"{field.m2m_reverse_field_name()}_id"
+
+        # A single id matches all exactly when it matches any
+        if self.match == MATCH_ALL and len(ids) > 1:
+            return Q(pk__in=through.objects.filter(
+                **{f"{target}__in": ids}
+            ).values(owner).annotate(
+                matched=Count(target)
+            ).filter(matched=len(ids)).values(owner))
+        return Exists(through.objects.filter(
+            **{owner: OuterRef("pk"), f"{target}__in": ids}
+        ))
+
+    def filter_queryset(self, queryset):
+        """Return queryset restricted to receipes matching the params"""
+        for relation, ids in self.ids.items():
+            queryset = queryset.filter(self._condition(relation, ids))
+        return queryset
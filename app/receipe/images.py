@@ -0,0 +1,252 @@
+"""
+Image pipeline rendering resized variants of receipe images
+
+Uploads are re-encoded without their metadata before they are stored.
+Once the upload commits, a worker thread renders each size in VARIANTS
+as WebP and JPEG and records the variants and dimensions on the
+receipe.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps, features
+
+from core.models import Receipe
+
+
+logger = logging.getLogger(__name__)
+
+# Label and longest edge in pixels, smallest first. Sizes at least as
+# large as the original are skipped, "full" keeps the original size.
+VARIANTS = (
+    ("thumb", 160),
+    ("small", 480),
+    ("medium", 960),
+    ("large", 1920),
+    ("full", None),
+)
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+# Formats an upload is stored in as sent, others are stored as PNG
+ORIGINAL_FORMATS = {"JPEG": ".jpg", "WEBP": ".webp", "PNG": ".png"}
+EXIF_ORIENTATION = 0x0112
+# Keys of a recorded variant that are not paths of its files
+VARIANT_FIELDS = ("label", "width", "height")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process wide pool of image workers"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECEIPE_IMAGE_WORKERS,
+                thread_name_prefix="receipe-image",
+            )
+        return _executor
+
+
+def variant_path(name, label, ext):
+    """Return the storage path of one variant of the image at name"""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return os.path.join(
+        "uploads", "receipe", "variants", stem, f"{label}.{ext}"
+    )
+
+
+def _formats():
+    formats = [("jpeg", "JPEG", {"quality": JPEG_QUALITY,
+                                 "optimize": True, "progressive": True})]
+    if features.check("webp"):
+        formats.insert(0, ("webp", "WEBP", {"quality": WEBP_QUALITY}))
+    return formats
+
+
+def _encode(img, fmt, options):
+    """Encode img without any of the metadata of the upload"""
+    if fmt == "JPEG" and img.mode != "RGB":
+        img = img.convert("RGB")
+    elif img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def strip_metadata(upload):
+    """Return upload re-encoded without EXIF, XMP or comments
+
+    The EXIF orientation is applied to the pixels first. JPEGs that need
+    no rotation keep their quantization tables, so re-encoding them
+    loses next to nothing.
+    """
+    upload.seek(0)
+    with Image.open(upload) as img:
+        fmt = img.format if img.format in ORIGINAL_FORMATS else "PNG"
+        options = {}
+        if img.info.get("icc_profile"):
+            options["icc_profile"] = img.info["icc_profile"]
+        if img.getexif().get(EXIF_ORIENTATION, 1) != 1:
+            img = ImageOps.exif_transpose(img)
+            options["quality"] = (
+                WEBP_QUALITY if fmt == "WEBP" else JPEG_QUALITY
+            )
+        elif fmt == "JPEG":
+            options["quality"] = "keep"
+        elif fmt == "WEBP":
+            options["lossless"] = img.info.get("lossless", False)
+            options["quality"] = 100 if options["lossless"] else WEBP_QUALITY
+        if fmt == "PNG" and img.mode not in ("1", "L", "LA", "P", "RGB",
+                                             "RGBA", "I", "I;16"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        stem = os.path.splitext(os.path.basename(upload.name))[0]
+        stripped = TemporaryUploadedFile(
+            stem + ORIGINAL_FORMATS[fmt], Image.MIME[fmt], 0, None
+        )
+        img.save(stripped, fmt, **options)
+    stripped.size = stripped.tell()
+    stripped.seek(0)
+    return stripped
+
+
+def _save(path, content):
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    return default_storage.save(path, ContentFile(content))
+
+
+def render_variants(name):
+    """Render the variants of the stored image at name
+
+    Returns the original's width and height and the variants, smallest
+    first, as [{"label", "width", "height", <ext>: path}].
+    """
+    with default_storage.open(name) as source:
+        img = Image.open(source)
+        # Apply the EXIF orientation before the EXIF data is dropped
+        img = ImageOps.exif_transpose(img)
+        img.load()
+
+    width, height = img.size
+    variants = []
+    for label, edge in VARIANTS:
+        if edge is not None and edge >= max(width, height):
+            continue
+        resized = img.copy()
+        if edge is not None:
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+        variant = {
+            "label": label, "width": resized.width, "height": resized.height,
+        }
+        for ext, fmt, options in _formats():
+            variant[ext] = _save(
+                variant_path(name, label, ext),
+                _encode(resized, fmt, options),
+            )
+        variants.append(variant)
+    return width, height, variants
+
+
+def delete_variants(variants):
+    """Delete the stored files of a receipe's image variants"""
+    for variant in variants:
+        for key, path in variant.items():
+            if key not in VARIANT_FIELDS:
+                default_storage.delete(path)
+
+
+def delete_variant_dir(name):
+    """Delete every variant rendered for the image at name"""
+    directory = os.path.dirname(variant_path(name, "x", "x"))
+    try:
+        _dirs, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for filename in files:
+        default_storage.delete(os.path.join(directory, filename))
+
+
+def _shared_variants(receipe_id, name):
+    """Return the rendered variants of another receipe with this image"""
+    return Receipe.objects.filter(
+        image=name, image_status=Receipe.IMAGE_READY
+    ).exclude(pk=receipe_id).values_list(
+        "image_width", "image_height", "image_variants"
+    ).first()
+
+
+def process_image(receipe_id, name):
+    """Render and record the variants of a receipe's image
+
+    Receipes sharing a stored image share its variants, so they are only
+    rendered once. Nothing is recorded when the receipe got another
+    image meanwhile.
+    """
+    shared = _shared_variants(receipe_id, name)
+    if shared is not None:
+        width, height, variants = shared
+        status = Receipe.IMAGE_READY
+    else:
+        try:
+            width, height, variants = render_variants(name)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            logger.exception("Could not process receipe image %s", name)
+            width, height, variants = None, None, []
+            status = Receipe.IMAGE_FAILED
+        else:
+            status = Receipe.IMAGE_READY
+
+    with transaction.atomic():
+        receipe = Receipe.objects.select_for_update().filter(
+            pk=receipe_id, image=name
+        ).first()
+        if receipe is None:
+            if not Receipe.objects.filter(image=name).exists():
+                delete_variants(variants)
+            return
+        receipe.image_status = status
+        receipe.image_width = width
+        receipe.image_height = height
+        receipe.image_variants = variants
+        receipe.save(update_fields=[
+            "image_status", "image_width", "image_height", "image_variants",
+        ])
+
+
+def _work(receipe_id, name):
+    # Worker threads outlive requests and no request_finished signal
+    # closes what they open, so close it once the job is done
+    try:
+        process_image(receipe_id, name)
+    except Exception:
+        logger.exception("Receipe image job for %s failed", name)
+    finally:
+        connections.close_all()
+
+
+def schedule(receipe):
+    """Queue the variants of receipe's image once the transaction commits
+
+    The variants of a replaced image go with the image itself, see
+    receipe.signals.
+    """
+    args = (receipe.pk, receipe.image.name)
+
+    def submit():
+        if settings.RECEIPE_IMAGE_WORKERS > 0:
+            get_executor().submit(_work, *args)
+        else:
+            process_image(*args)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,104 @@
+"""
+Django command to load test the read endpoints under ASGI
+"""
+import asyncio
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, override_settings
+from rest_framework.authtoken.models import Token
+
+from receipe.benchmarks import get_bench_user, seed_receipes
+
+
+URLCONFS = (
+    ("sync views", "app.urls"),
+    ("pooled async views", "app.asgi_urls"),
+)
+
+
+class Command(BaseCommand):
+    """Compare sync and pooled async views under concurrent requests
+
+    Every query sleeps for --latency-ms to stand in for a slow database.
+    Django runs sync views of an ASGI process one at a time on a shared
+    thread, while the pooled async views overlap up to ASGI_THREADS.
+    """
+
+    help = "Load test read endpoints through the ASGI handler"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", default="bench@example.com")
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Seed this many receipes first")
+        parser.add_argument("--path", default="/api/receipes/")
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=20)
+        parser.add_argument("--latency-ms", type=float, default=20)
+
+    def _delay(self, execute, sql, params, many, context):
+        time.sleep(self.latency)
+        return execute(sql, params, many, context)
+
+    def _slow_down(self, sender, connection, **kwargs):
+        if self._delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self._delay)
+            self.slowed.append(connection)
+
+    async def _load(self, path, token, requests, concurrency):
+        """Send requests with at most concurrency in flight"""
+        client = AsyncClient()
+        slots = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def send(number):
+            async with slots:
+                start = time.perf_counter()
+                # A distinct query string per request bypasses the
+                # response cache so every request reaches the database
+                response = await client.get(
+                    path, {"bench": number}, authorization=f"Token {token}"
+                )
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(number) for number in range(requests)))
+        elapsed = time.perf_counter() - start
+        # Sync views ran on asgiref's shared thread, close its connection
+        await sync_to_async(connections.close_all)()
+        return requests / elapsed, latencies
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        user = get_bench_user(options["email"])
+        if options["seed"]:
+            seed_receipes(user, options["seed"])
+        token, _created = Token.objects.get_or_create(user=user)
+
+        self.latency = options["latency_ms"] / 1000
+        self.slowed = []
+        connection_created.connect(self._slow_down)
+        try:
+            for label, urlconf in URLCONFS:
+                # The in-process client sends requests as "testserver"
+                with override_settings(
+                    ROOT_URLCONF=urlconf, ALLOWED_HOSTS=["testserver"]
+                ):
+                    rate, latencies = asyncio.run(self._load(
+                        options["path"], token.key, options["requests"],
+                        options["concurrency"],
+                    ))
+                self.stdout.write(
+                    f"{label}: {rate:.1f} requests/sec, "
+                    f"median {statistics.median(latencies) * 1000:.1f} ms, "
+                    f"max {max(latencies) * 1000:.1f} ms"
+                )
+        finally:
+            connection_created.disconnect(self._slow_down)
+            for slowed in self.slowed:
+                slowed.execute_wrappers.remove(self._delay)
@@ -0,0 +1,76 @@
+"""
+Django command to benchmark the bulk receipe importer
+"""
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from receipe import bulk
+from receipe.benchmarks import get_bench_user
+from receipe.serializers import ReceipeDetailSerializer
+
+
+class Command(BaseCommand):
+    """Report bulk import throughput in rows per second"""
+
+    help = "Stream synthetic rows through the bulk importer"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", default="bench@example.com")
+        parser.add_argument("--rows", type=int, default=20000)
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--format", choices=["ndjson", "csv"],
+                            default="ndjson")
+
+    def _ndjson_lines(self, count):
+        for i in range(count):
+            yield json.dumps({
+                "title": f"imported {i}",
+                "time_minutes": 10 + i % 50,
+                "price": "4.20",
+                "tags": [{"name": f"tag {i % 20}"}],
+                "ingredients": [{"name": f"ingredient {i % 100}"},
+                                {"name": f"ingredient {i % 7}"}],
+            }).encode() + b"\n"
+
+    def _csv_lines(self, count):
+        yield b"title,time_minutes,price,tags,ingredients\n"
+        for i in range(count):
+            yield (
+                f'imported {i},{10 + i % 50},4.20,tag {i % 20},'
+                f'"ingredient {i % 100},ingredient {i % 7}"\n'
+            ).encode()
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        user = get_bench_user(options["email"])
+        request = Request(APIRequestFactory().post("/"))
+        request.user = user
+        if options["format"] == "csv":
+            rows = bulk.iter_csv_rows(self._csv_lines(options["rows"]))
+        else:
+            rows = bulk.iter_ndjson_rows(self._ndjson_lines(options["rows"]))
+
+        importer = bulk.BulkImporter(
+            ReceipeDetailSerializer,
+            user=user,
+            context={"request": request},
+            chunk_size=options["chunk_size"],
+        )
+        tracemalloc.start()
+        start = time.perf_counter()
+        summary = importer.run(rows)
+        elapsed = time.perf_counter() - start
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"Imported {summary['created']} rows "
+            f"({summary['failed']} failed) in {elapsed:.2f} s: "
+            f"{summary['created'] / elapsed:.0f} rows/sec, "
+            f"peak traced memory {peak / 1024 / 1024:.1f} MiB"
+        )
@@ -0,0 +1,79 @@
+"""
+Django command to benchmark ranking receipes by ingredients at hand
+"""
+import itertools
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.models import Receipe, Ingredient
+from receipe.benchmarks import (
+    format_timing, get_bench_user, seed_receipes, time_call
+)
+
+
+class Command(BaseCommand):
+    """Time the cookable endpoint for growing sets of ingredients
+
+    Requests go through the whole stack, so the timings include the
+    view's queryset, serializers and middleware as they are.
+    """
+
+    help = "Time the cookable receipe ranking against seeded data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", default="cook@example.com")
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Seed this many receipes first")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--page-size", type=int, default=50)
+
+    def _get(self, client, params):
+        """Request a page of the ranking"""
+        response = client.get(reverse("receipe:receipe-cookable"), params)
+        assert response.status_code == 200, response.status_code
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        user = get_bench_user(options["email"])
+        if options["seed"]:
+            seed_receipes(user, options["seed"])
+        token, _created = Token.objects.get_or_create(user=user)
+        client = Client(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        total = Receipe.objects.filter(user=user).count()
+        self.stdout.write(
+            f"Benchmarking cookable over {total} receipes on "
+            f"{connection.vendor}"
+        )
+        ingr_ids = list(
+            Ingredient.objects.filter(user=user).order_by("id")
+            .values_list("id", flat=True)
+        )
+        counter = itertools.count()
+        # The in-process client sends requests as "testserver"
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            for count in (3, 10, 30):
+                ids = ingr_ids[:count]
+                params = {
+                    "ingredients": ",".join(str(i) for i in ids),
+                    "page_size": options["page_size"],
+                }
+                # A distinct query string per request bypasses the
+                # response cache
+                self.stdout.write(format_timing(
+                    f"cookable {count} ingredients",
+                    time_call(
+                        lambda: self._get(
+                            client, dict(params, bench=next(counter))
+                        ),
+                        options["repeat"],
+                    ),
+                ))
+                ranked = Receipe.objects.filter(
+                    user=user, ingredients__in=ids
+                ).distinct().count()
+                self.stdout.write(f"{'':<40} {ranked} ranked")
@@ -0,0 +1,103 @@
+"""
+Django command to benchmark the per request cost of database connections
+"""
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.db import pool as pools
+from core.db.backends.postgresql.base import DatabaseWrapper
+from receipe.benchmarks import format_timing, time_call
+
+
+class Command(BaseCommand):
+    """Compare opening a connection per request with keeping or pooling it
+
+    Each simulated request runs what Django runs around a view: the
+    close_old_connections() of request_started and request_finished
+    around one query.
+    """
+
+    help = "Time requests with new, persistent and pooled connections"
+
+    modes = [
+        ("new connection per request", {"CONN_MAX_AGE": 0}),
+        ("persistent", {"CONN_MAX_AGE": 60}),
+        ("persistent + health check",
+         {"CONN_MAX_AGE": 60, "CONN_HEALTH_CHECKS": True}),
+        ("pooled", {"CONN_MAX_AGE": 0, "POOL_SIZE": 4}),
+        ("pooled + health check",
+         {"CONN_MAX_AGE": 0, "POOL_SIZE": 4, "CONN_HEALTH_CHECKS": True}),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=200)
+        parser.add_argument("--threads", type=int, default=8,
+                            help="Threads sharing the pool in the last run")
+        parser.add_argument("--pool-size", type=int, default=4)
+
+    def _wrapper(self, label, overrides):
+        """Return a connection of its own to the default database"""
+        settings_dict = {
+            **connection.settings_dict,
+            "CONN_HEALTH_CHECKS": False,
+            "POOL_SIZE": 0,
+            **overrides,
+        }
+        return DatabaseWrapper(settings_dict, alias=f"bench {label}")
+
+    def _request(self, wrapper):
+        wrapper.close_if_unusable_or_obsolete()
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        wrapper.close_if_unusable_or_obsolete()
+
+    def _contended(self, overrides, threads, repeat):
+        """Run requests from threads sharing one pool, return ms each"""
+        def work():
+            # Connections belong to the thread creating them
+            wrapper = self._wrapper("contended", overrides)
+            try:
+                for _ in range(repeat):
+                    self._request(wrapper)
+            finally:
+                wrapper.close()
+
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return (time.perf_counter() - start) * 1000 / (threads * repeat)
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        if connection.vendor != "postgresql":
+            raise CommandError(
+                "Connections can only be compared on PostgreSQL"
+            )
+
+        repeat = options["repeat"]
+        for label, overrides in self.modes:
+            if "POOL_SIZE" in overrides:
+                overrides = {**overrides, "POOL_SIZE": options["pool_size"]}
+            wrapper = self._wrapper(label, overrides)
+            self.stdout.write(format_timing(
+                label, time_call(lambda: self._request(wrapper), repeat),
+            ))
+            wrapper.close()
+
+        overrides = {"CONN_MAX_AGE": 0, "POOL_SIZE": options["pool_size"]}
+        per_request = self._contended(overrides, options["threads"], repeat)
+        self.stdout.write(
+            f"{options['threads']} threads sharing {options['pool_size']} "
+            f"pooled connections: {per_request:.2f} ms per request"
+        )
+        for (alias, _params), pool in pools.pools.items():
+            if alias == "bench contended":
+                self.stdout.write(f"  pool stats: {pool.stats()}")
+        pools.close_idle()
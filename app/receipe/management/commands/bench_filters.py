@@ -0,0 +1,79 @@
+"""
+Django command to benchmark the receipe tag/ingredient filters
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import Receipe, Tags, Ingredient
+from receipe.benchmarks import (
+    format_timing, get_bench_user, seed_receipes, time_call
+)
+from receipe.filters import ReceipeFilter
+
+
+class Command(BaseCommand):
+    """Compare the JOIN + DISTINCT filter with the subquery filters"""
+
+    help = "Time receipe list filters against seeded data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", default="bench@example.com")
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Seed this many receipes first")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--page-size", type=int, default=50)
+
+    def _join_distinct(self, user, params):
+        """Build the queryset the way the list endpoint used to"""
+        queryset = Receipe.objects.filter(user=user)
+        if params.get("tags"):
+            ids = [int(i) for i in params["tags"].split(",")]
+            queryset = queryset.filter(tags__id__in=ids)
+        if params.get("ingredients"):
+            ids = [int(i) for i in params["ingredients"].split(",")]
+            queryset = queryset.filter(ingredients__id__in=ids)
+        return queryset.order_by("-id").distinct()
+
+    def _subquery(self, user, params):
+        """Build the queryset with the subquery filter engine"""
+        queryset = Receipe.objects.filter(user=user)
+        return ReceipeFilter(params).filter_queryset(queryset).order_by("-id")
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        user = get_bench_user(options["email"])
+        if options["seed"]:
+            seed_receipes(user, options["seed"])
+
+        tag_ids = list(
+            Tags.objects.filter(user=user).values_list("id", flat=True)[:3]
+        )
+        ingr_ids = list(
+            Ingredient.objects.filter(user=user)
+            .values_list("id", flat=True)[:2]
+        )
+        total = Receipe.objects.filter(user=user).count()
+        self.stdout.write(f"Benchmarking filters over {total} receipes")
+
+        def csv(ids):
+            return ",".join(str(i) for i in ids)
+
+        cases = [
+            ("1 tag", {"tags": csv(tag_ids[:1])}),
+            ("3 tags", {"tags": csv(tag_ids)}),
+            ("3 tags + 2 ingredients",
+             {"tags": csv(tag_ids), "ingredients": csv(ingr_ids)}),
+        ]
+        size = options["page_size"]
+        for label, params in cases:
+            legacy = self._join_distinct(user, params)
+            self.stdout.write(format_timing(
+                f"join+distinct {label}",
+                time_call(lambda: list(legacy[:size]), options["repeat"]),
+            ))
+            for match in ("any", "all"):
+                queryset = self._subquery(user, dict(params, match=match))
+                self.stdout.write(format_timing(
+                    f"match={match} {label}",
+                    time_call(lambda: list(queryset[:size]),
+                              options["repeat"]),
+                ))
@@ -0,0 +1,96 @@
+"""
+Django command to benchmark the overhead of request metrics
+"""
+import itertools
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.models import Receipe
+
+from receipe.benchmarks import get_bench_user, seed_receipes
+
+
+# Receipes seeded for a user without any, an empty list answers 404
+DEFAULT_SEED = 100
+
+
+class Command(BaseCommand):
+    """Compare requests with RequestMetricsMiddleware on and off
+
+    Requests alternate between two clients, one loading the middleware
+    and one not, so drift of the machine hits both alike.
+    """
+
+    help = "Time API requests with and without request metrics"
+
+    cases = [
+        # A distinct query string per request bypasses the response cache
+        ("receipe list", "receipe:receipe-list", True),
+        ("receipe list, cached", "receipe:receipe-list", False),
+        ("tag list", "receipe:tag-list", True),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", default="bench@example.com")
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Seed this many receipes first, "
+                                 f"{DEFAULT_SEED} when the user has none")
+        parser.add_argument("--requests", type=int, default=1000,
+                            help="Requests per client and case")
+
+    def _client(self, enabled, token):
+        """Return a client whose handler was built with the setting"""
+        client = Client(HTTP_AUTHORIZATION=f"Token {token}")
+        # The middleware chain is built on the first request
+        with override_settings(REQUEST_METRICS=enabled):
+            client.get(reverse("receipe:tag-list"))
+        return client
+
+    def _time(self, client, path, params):
+        """Return the seconds one request takes"""
+        start = time.perf_counter()
+        response = client.get(path, params)
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.status_code
+        return elapsed
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        user = get_bench_user(options["email"])
+        seed = options["seed"]
+        if not seed and not Receipe.objects.filter(user=user).exists():
+            seed = DEFAULT_SEED
+        if seed:
+            seed_receipes(user, seed)
+        token, _created = Token.objects.get_or_create(user=user)
+        counter = itertools.count()
+
+        # The in-process client sends requests as "testserver"
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            clients = {
+                enabled: self._client(enabled, token.key)
+                for enabled in (False, True)
+            }
+            for label, url_name, bypass_cache in self.cases:
+                path = reverse(url_name)
+                timings = {False: [], True: []}
+                for number in range(options["requests"]):
+                    # Alternate which client goes first
+                    for enabled in (number % 2 == 0, number % 2 == 1):
+                        params = (
+                            {"bench": next(counter)} if bypass_cache else {}
+                        )
+                        timings[enabled].append(
+                            self._time(clients[enabled], path, params)
+                        )
+                off = statistics.median(timings[False]) * 1000
+                on = statistics.median(timings[True]) * 1000
+                self.stdout.write(
+                    f"{label:<24} off {off:7.3f} ms  on {on:7.3f} ms  "
+                    f"overhead {(on - off) / off * 100:+.1f}%"
+                )
@@ -0,0 +1,87 @@
+"""
+Django command to benchmark receipe full text search
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from core.models import Receipe, Tags
+from receipe.benchmarks import (
+    format_timing, get_bench_user, seed_receipes, time_call
+)
+from receipe.filters import ReceipeFilter
+from receipe.search import ReceipeSearch
+
+
+class Command(BaseCommand):
+    """Compare ranked search with an unindexed ILIKE scan"""
+
+    help = "Time receipe searches against seeded data"
+
+    cases = [
+        ("1 word", "curry"),
+        ("prefix", "chick"),
+        ("2 words", "spicy curry"),
+        ("3 words", "smoky salmon lemon"),
+        # Seeded titles end in their sequence number
+        ("selective prefix", "4242"),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", default="bench@example.com")
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Seed this many receipes first")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--page-size", type=int, default=50)
+
+    def _ilike(self, user, text):
+        """Build the substring scan clients would otherwise need"""
+        queryset = Receipe.objects.filter(user=user)
+        for term in text.split():
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(description__icontains=term)
+            )
+        return queryset.defer("search_vector").order_by("-id")
+
+    def _search(self, user, params):
+        """Build the queryset the list endpoint runs for a search"""
+        search = ReceipeSearch(params)
+        queryset = Receipe.objects.filter(user=user).defer("search_vector")
+        queryset = ReceipeFilter(params).filter_queryset(queryset)
+        return search.filter_queryset(queryset).order_by(*search.ordering)
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        user = get_bench_user(options["email"])
+        if options["seed"]:
+            seed_receipes(user, options["seed"])
+
+        total = Receipe.objects.filter(user=user).count()
+        self.stdout.write(
+            f"Benchmarking search over {total} receipes on {connection.vendor}"
+        )
+        tag_id = Tags.objects.filter(user=user).values_list(
+            "id", flat=True
+        ).first()
+        size = options["page_size"]
+        cases = [(label, {"search": text}) for label, text in self.cases]
+        if tag_id is not None:
+            cases.append((
+                "2 words + tag",
+                {"search": "spicy curry", "tags": str(tag_id)},
+            ))
+
+        for label, params in cases:
+            ilike = self._ilike(user, params["search"])
+            self.stdout.write(format_timing(
+                f"ilike {label}",
+                time_call(lambda: list(ilike[:size]), options["repeat"]),
+            ))
+            queryset = self._search(user, params)
+            self.stdout.write(format_timing(
+                f"search {label}",
+                time_call(lambda: list(queryset[:size]), options["repeat"]),
+            ))
+            self.stdout.write(
+                f"{'':<40} {queryset.count()} matches"
+            )
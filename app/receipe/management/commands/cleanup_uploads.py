@@ -0,0 +1,20 @@
+"""
+Django command to garbage collect abandoned resumable uploads
+"""
+from django.core.management.base import BaseCommand
+
+from receipe import uploads
+
+
+class Command(BaseCommand):
+    """Delete expired upload sessions and stray partial files"""
+
+    help = "Remove resumable image uploads idle for RESUMABLE_UPLOAD_EXPIRY"
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        sessions, strays = uploads.cleanup()
+        self.stdout.write(
+            f"Removed {sessions} expired upload sessions "
+            f"and {strays} stray partial files"
+        )
@@ -0,0 +1,73 @@
+"""
+Django command to repair image blob reference counts
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import ImageBlob, Receipe
+from core.storage import image_storage
+from receipe import images
+
+
+class Command(BaseCommand):
+    """Recount blob references and delete blobs nothing uses
+
+    Reference counts drift when a transaction that stored a blob rolls
+    back after the file was written, or rows are changed without
+    signals. This recounts them from the receipes and deletes unused
+    blob rows and files.
+    """
+
+    help = "Recount image blob references and delete unused blobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace", type=int, default=3600,
+            help="Keep files without a row younger than this many seconds",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        fixed = deleted = 0
+        names = ImageBlob.objects.values_list("name", flat=True)
+        for name in names.iterator():
+            # Counting under the row lock waits for transactions still
+            # storing the blob, so their receipes are counted too
+            with transaction.atomic():
+                blob = ImageBlob.objects.select_for_update().filter(
+                    name=name
+                ).first()
+                if blob is None:
+                    continue
+                refs = Receipe.objects.filter(image=name).count()
+                if refs != blob.refcount:
+                    blob.refcount = refs
+                    blob.save(update_fields=["refcount"])
+                    fixed += 1
+            if not refs and image_storage.collect(
+                name, cleanup=images.delete_variant_dir
+            ):
+                deleted += 1
+
+        strays = 0
+        known = set(ImageBlob.objects.values_list("name", flat=True))
+        root = image_storage.path(image_storage.prefix)
+        cutoff = time.time() - options["grace"]
+        for directory, _dirs, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, image_storage.location)
+                name = name.replace(os.sep, "/")
+                if name in known or os.path.getmtime(path) > cutoff:
+                    continue
+                os.remove(path)
+                images.delete_variant_dir(name)
+                strays += 1
+
+        self.stdout.write(
+            f"Fixed {fixed} reference counts, deleted {deleted} unused "
+            f"blobs and {strays} files without a blob"
+        )
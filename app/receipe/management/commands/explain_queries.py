@@ -0,0 +1,70 @@
+"""
+Django command to print the query plans of the receipe viewsets
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from receipe import views
+
+
+class Command(BaseCommand):
+    """Print EXPLAIN ANALYZE for the SQL each viewset generates"""
+
+    help = "Print the query plan of each receipe viewset query"
+
+    targets = [
+        (views.ReceipeViewSet, "list", {}),
+        (views.ReceipeViewSet, "list", {"tags": "1,2"}),
+        (views.ReceipeViewSet, "list", {"tags": "1,2", "match": "all"}),
+        (views.ReceipeViewSet, "list", {"search": "chicken curry"}),
+        (views.ReceipeViewSet, "cookable", {"ingredients": "1,2,3"}),
+        (views.ReceipeViewSet, "retrieve", {}),
+        (views.TagViewSet, "list", {}),
+        (views.TagViewSet, "list", {"assigned_only": "1"}),
+        (views.TagViewSet, "list", {"order": "popular", "min_count": "2"}),
+        (views.IngredientsViewSet, "list", {}),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="User whose data is planned")
+        parser.add_argument(
+            "--no-analyze",
+            action="store_true",
+            help="Only plan the queries instead of running them",
+        )
+
+    def _queryset(self, viewset, action, params, user):
+        """Build the queryset the viewset would run for action"""
+        request = Request(APIRequestFactory().get("/", params))
+        request.user = user
+        view = viewset(action=action, request=request, format_kwarg=None,
+                       kwargs={})
+        queryset = view.get_queryset()
+        if action not in ("list", "cookable"):
+            return queryset.filter(pk=queryset.values("pk")[:1])
+        paginator = view.paginator
+        queryset = queryset.order_by(*paginator.get_ordering(view))
+        return queryset[:paginator.page_size + 1]
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        try:
+            user = get_user_model().objects.get(email=options["email"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+
+        explain = {}
+        if connection.vendor == "postgresql" and not options["no_analyze"]:
+            explain = {"analyze": True, "buffers": True}
+
+        for viewset, action, params in self.targets:
+            queryset = self._queryset(viewset, action, params, user)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{viewset.__name__}.{action} {params or ''}".rstrip()
+            ))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain))
+            self.stdout.write("")
@@ -0,0 +1,56 @@
+"""
+Django command to check or rebuild the attributes copied onto receipes
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Receipe
+from receipe import denormalized
+
+
+class Command(BaseCommand):
+    """Compare or recompute the tag and ingredient copies of receipes
+
+    The copies drift when links or names are changed without signals,
+    for instance by raw SQL or a queryset update() on Tags.
+    """
+
+    help = "Check or rebuild the denormalized tags and ingredients of receipes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report receipes whose copies are out of date",
+        )
+        parser.add_argument(
+            "--email", help="Only look at the receipes of this user",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=denormalized.BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        queryset = Receipe.objects.all()
+        if options["email"]:
+            queryset = queryset.filter(user__email=options["email"])
+
+        stale = list(denormalized.find_inconsistent(
+            queryset, batch_size=options["batch_size"]
+        ))
+        if options["check"]:
+            if stale:
+                shown = ", ".join(str(pk) for pk in stale[:20])
+                raise CommandError(
+                    f"{len(stale)} receipes have stale copies: {shown}"
+                    + (" ..." if len(stale) > 20 else "")
+                )
+            self.stdout.write(self.style.SUCCESS(
+                "Every receipe's copies are up to date"
+            ))
+            return
+
+        denormalized.refresh(stale)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt the copies of {len(stale)} receipes"
+        ))
@@ -0,0 +1,29 @@
+"""
+Django command to render the variants of stored receipe images
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import Receipe
+from receipe import images
+
+
+class Command(BaseCommand):
+    """Render image variants the pipeline has not produced yet"""
+
+    help = "Render missing receipe image variants, e.g. for old uploads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true",
+                            help="Render every image again")
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        queryset = Receipe.objects.exclude(image="").exclude(image=None)
+        if not options["all"]:
+            queryset = queryset.exclude(image_status=Receipe.IMAGE_READY)
+
+        done = 0
+        for receipe_id, name in queryset.values_list("id", "image").iterator():
+            images.process_image(receipe_id, name)
+            done += 1
+        self.stdout.write(f"Rendered variants of {done} images")
@@ -0,0 +1,34 @@
+"""
+Django command to seed receipes for benchmarking
+"""
+from django.core.management.base import BaseCommand
+
+from receipe.benchmarks import get_bench_user, seed_receipes
+
+
+class Command(BaseCommand):
+    """Django command to bulk create receipes for a benchmark user"""
+
+    help = "Bulk create receipes, tags and ingredients for benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", default="bench@example.com")
+        parser.add_argument("--receipes", type=int, default=100000)
+        parser.add_argument("--tags", type=int, default=50)
+        parser.add_argument("--ingredients", type=int, default=200)
+        parser.add_argument("--per-receipe", type=int, default=4)
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        user = get_bench_user(options["email"])
+        self.stdout.write(
+            f"Seeding {options['receipes']} receipes for {user.email}"
+        )
+        created = seed_receipes(
+            user,
+            options["receipes"],
+            tags=options["tags"],
+            ingredients=options["ingredients"],
+            per_receipe=options["per_receipe"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Created {created} receipes"))
@@ -0,0 +1,27 @@
+"""
+Prometheus collector of the receipe app's shared state
+
+The values are read from the database when scraped, so every worker
+process reports the same totals.
+"""
+from prometheus_client.core import GaugeMetricFamily
+
+from core.models import ImageUploadSession, Receipe
+
+
+class ReceipeCollector:
+    """Report the image queues"""
+
+    def collect(self):
+        yield GaugeMetricFamily(
+            "receipe_upload_sessions",
+            "Resumable image uploads started and not completed",
+            value=ImageUploadSession.objects.count(),
+        )
+        yield GaugeMetricFamily(
+            "receipe_images_pending",
+            "Receipe images waiting for their variants to be rendered",
+            value=Receipe.objects.filter(
+                image_status=Receipe.IMAGE_PENDING
+            ).count(),
+        )
@@ -0,0 +1,145 @@
+"""
+Keyset pagination for receipe APIs
+"""
+import base64
+import binascii
+import json
+from operator import attrgetter
+
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Paginate by seeking past the last row of the previous page
+
+    The cursor is an opaque token holding the ordering values of the last
+    row returned, so every page is a single indexed range scan no matter
+    how deep the client has paged.
+    """
+
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    ordering = ("-id",)
+    invalid_cursor_message = _("Invalid cursor")
+
+    def get_ordering(self, view):
+        """Return the ordering fields, preferring the ones on the view"""
+        if hasattr(view, "get_ordering"):
+            return tuple(view.get_ordering())
+        return tuple(getattr(view, "ordering", self.ordering))
+
+    def get_page_size(self, request):
+        """Return the page size requested by the client, if valid"""
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def encode_cursor(self, values):
+        """Encode the ordering values of a row into an opaque cursor"""
+        raw = json.dumps(values, cls=JSONEncoder, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        """Return the position encoded in the request cursor, if any"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def _seek_filter(self, position):
+        """Build the filter selecting rows after position
+
+        For ordering (a, -b) this is ``a > x OR (a = x AND b < y)``.
+        """
+        seek = Q()
+        for i, (field, descending) in enumerate(self.fields):
+            lookup = "lt" if descending else "gt"
+            term = Q(**{f"{field}__{lookup}": position[i]})
+            for j, (prev_field, _desc) in enumerate(self.fields[:i]):
+                term &= Q(**{prev_field: position[j]})
+            seek |= term
+        return seek
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return the rows of the page the request cursor points at"""
+        self.request = request
+        ordering = self.get_ordering(view)
+        self.fields = [
+            (name.lstrip("-"), name.startswith("-")) for name in ordering
+        ]
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        self.is_first_page = position is None
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._seek_filter(position))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        """Return the URL of the next page, or None on the last page"""
+        if not self.has_next:
+            return None
+        getter = attrgetter(*(field for field, _desc in self.fields))
+        values = getter(self.page[-1])
+        if len(self.fields) == 1:
+            values = (values,)
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(list(values)),
+        )
+
+    def get_paginated_response(self, data):
+        """Wrap a page of serialized rows with the next link"""
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Opaque cursor returned in the next link",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page",
+                "schema": {"type": "integer"},
+            },
+        ]
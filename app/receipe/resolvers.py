@@ -0,0 +1,31 @@
+"""
+Batched lookups of receipe attributes by name
+"""
+
+
+def resolve_names(model, user, names):
+    """Return {name: obj} for user's rows named names, creating missing ones
+
+    Costs one query when every name exists and three otherwise, however
+    many names are given. Rows created concurrently by another request
+    are picked up by the re-read thanks to the unique (user, name)
+    constraint and ignore_conflicts.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    found = {
+        obj.name: obj
+        for obj in model.objects.filter(user=user, name__in=names)
+    }
+    missing = names - found.keys()
+    if missing:
+        model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        found.update(
+            (obj.name, obj)
+            for obj in model.objects.filter(user=user, name__in=missing)
+        )
+    return found
@@ -0,0 +1,115 @@
+"""
+Full text search over receipes
+
+On PostgreSQL receipes are matched against Receipe.search_vector, a
+tsvector the triggers installed by core migration 0014 keep current from
+the title (weight A), tag and ingredient names (B) and description (C).
+It is indexed with GIN and results are ranked with ts_rank. Every term
+of the query is matched as a prefix, so "chick cur" finds "chicken
+curry" while it is being typed.
+
+Other backends fall back to case insensitive substring matches on the
+same fields, ranked by the weight of the fields each term matched.
+"""
+import re
+
+from django.db import connection
+from django.db.models import (
+    Case, Exists, F, FloatField, OuterRef, Q, Value, When
+)
+from django.db.models.functions import Cast
+from django.contrib.postgres.search import SearchQuery, SearchRank
+
+from core.models import Receipe
+
+
+CONFIG = "english"
+MAX_TERMS = 8
+# ts_rank's default weights of the A, B and C labels
+WEIGHTS = {"title": 1.0, "attrs": 0.4, "description": 0.2}
+
+TERM = re.compile(r"[^\W_]+")
+
+
+def parse_terms(text):
+    """Return the words of a search query, at most MAX_TERMS of them"""
+    return TERM.findall(text or "")[:MAX_TERMS]
+
+
+def prefix_query(terms):
+    """Return a tsquery matching documents with every term as a prefix"""
+    raw = " & ".join(f"{term}:*" for term in terms)
+    return SearchQuery(raw, search_type="raw", config=CONFIG)
+
+
+class PostgresSearchEngine:
+    """Match the indexed tsvector and rank with ts_rank"""
+
+    def search(self, queryset, terms):
+        query = prefix_query(terms)
+        # ts_rank returns a real, whose text form does not compare equal
+        # to itself once it is read back from a pagination cursor
+        return queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+        )
+
+
+class FallbackSearchEngine:
+    """Match substrings of the searched fields, for backends without FTS"""
+
+    def _attr_match(self, relation, term):
+        field = Receipe._meta.get_field(relation)
+        target = field.m2m_reverse_field_name()
+        return Exists(field.remote_field.through.objects.filter(**{
+            f"{field.m2m_field_name()}_id": OuterRef("pk"),
+            f"{target}__name__icontains": term,
+        }))
+
+    def search(self, queryset, terms):
+        rank = Value(0.0, output_field=FloatField())
+        for term in terms:
+            fields = (
+                ("title", Q(title__icontains=term)),
+                ("attrs", self._attr_match("tags", term)
+                 | self._attr_match("ingredients", term)),
+                ("description", Q(description__icontains=term)),
+            )
+            matched = Q()
+            for name, condition in fields:
+                matched |= condition
+                rank = rank + Case(
+                    When(condition, then=Value(WEIGHTS[name])),
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                )
+            queryset = queryset.filter(matched)
+        return queryset.annotate(rank=rank)
+
+
+def get_engine():
+    """Return the search engine for the database in use"""
+    if connection.vendor == "postgresql":
+        return PostgresSearchEngine()
+    return FallbackSearchEngine()
+
+
+class ReceipeSearch:
+    """Apply the ``search`` query param to a receipe queryset
+
+    Matching receipes are annotated with a ``rank``; ``ordering`` puts
+    the best matches first and stays usable as a keyset.
+    """
+
+    ordering = ("-rank", "-id")
+
+    def __init__(self, params):
+        self.terms = parse_terms(params.get("search"))
+
+    def __bool__(self):
+        return bool(self.terms)
+
+    def filter_queryset(self, queryset):
+        """Return the receipes matching the search, annotated with rank"""
+        if not self.terms:
+            return queryset
+        return get_engine().search(queryset, self.terms)
@@ -2,22 +2,83 @@
 Serializer for receipe APIs
 """
 
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
+from PIL import Image
 from rest_framework import serializers
-from core.models import Receipe, Tags, Ingredient
-
-
-class IngredientSerializer(serializers.ModelSerializer):
+from core.models import Receipe, Tags, Ingredient, ImageUploadSession
+from receipe import images, uploads
+from receipe.resolvers import resolve_names
+
+
+@extend_schema_field({"type": "array", "items": {"type": "object"}})
+class ImageVariantsField(serializers.Field):
+    """Read only field rendering the image variants with their URLs"""
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def _url(self, path):
+        url = default_storage.url(path)
+        request = self.context.get("request")
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def to_representation(self, variants):
+        return [
+            {
+                key: (
+                    value if key in images.VARIANT_FIELDS
+                    else self._url(value)
+                )
+                for key, value in variant.items()
+            }
+            for variant in variants
+        ]
+
+
+IMAGE_FIELDS = [
+    "image_status", "image_width", "image_height", "image_variants",
+]
+
+
+class ReceipeAttrSerializer(serializers.ModelSerializer):
+    """Base serializer for receipe attributes unique by name per user"""
+    # Only rendered when the list annotated it, see BaseReceipeAttrViewSet
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    def validate_name(self, value):
+        """Reject renaming onto a name the user already has"""
+        if self.instance is not None:
+            model = self.Meta.model
+            clash = model.objects.filter(
+                user=self.instance.user, name=value
+            ).exclude(pk=self.instance.pk)
+            if clash.exists():
+                raise serializers.ValidationError(
+                    f"{model.__name__} with this name already exists."
+                )
+        return value
+
+
+class IngredientSerializer(ReceipeAttrSerializer):
     """Serializer for Ingredient"""
     class Meta:
         model = Ingredient
-        fields = ["id", "name"]
+        fields = ["id", "name", "recipe_count"]
         read_only_fields = ['id']
 
-class TagSerializer(serializers.ModelSerializer):
+
+class TagSerializer(ReceipeAttrSerializer):
     """Serializer for Tags"""
     class Meta:
         model = Tags
-        fields = ["id", "name"]
+        fields = ["id", "name", "recipe_count"]
         read_only_fields = ['id']
 
 
@@ -32,22 +93,24 @@ class ReceipeSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients']
         read_only_fields = ['id', 'user']
 
+    def _set_attrs(self, receipe, relation, model, items):
+        """Attach items to receipe, creating missing ones in bulk"""
+        auth_user = self.context['request'].user
+        objs = resolve_names(
+            model, auth_user, (item['name'] for item in items)
+        )
+        if objs:
+            getattr(receipe, relation).add(*objs.values())
+
     def _get_or_create_tags(self, tags, receipe):
         """Handle getting or creating tags as needed"""
-
-        auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tags.objects.get_or_create(user=auth_user, **tag)
-            receipe.tags.add(tag_obj)
+        self._set_attrs(receipe, 'tags', Tags, tags)
 
     def _get_or_create_ingredients(self, ingredients, receipe):
         """Handle getting or creating ingrdients"""
+        self._set_attrs(receipe, 'ingredients', Ingredient, ingredients)
 
-        auth_user = self.context['request'].user
-        for ingr in ingredients:
-            ingr_obj, created = Ingredient.objects.get_or_create(user=auth_user, **ingr)
-            receipe.ingredients.add(ingr_obj)
-
+    @transaction.atomic
     def create(self, validated_data):
         """Create receipe"""
         tags = validated_data.pop('tags', [])
@@ -57,6 +120,7 @@ class ReceipeSerializer(serializers.ModelSerializer):
         self._get_or_create_ingredients(ingredients=ingredients, receipe=receipe)
         return receipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update receipe"""
         tags = validated_data.pop("tags", None)
@@ -64,7 +128,7 @@ class ReceipeSerializer(serializers.ModelSerializer):
         if tags is not None:
             instance.tags.clear()
             self._get_or_create_tags(tags, instance)
-        elif ingredients is not None:
+        if ingredients is not None:
             instance.ingredients.clear()
             self._get_or_create_ingredients(ingredients, instance)
         for attr, value in validated_data.items():
@@ -73,19 +137,108 @@ class ReceipeSerializer(serializers.ModelSerializer):
 
         return instance
 
+
+class DenormalizedAttrsField(serializers.Field):
+    """Read only field rendering the copy of attributes kept on a receipe"""
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, items):
+        return items
+
+
+@extend_schema_field(TagSerializer(many=True))
+class DenormalizedTagsField(DenormalizedAttrsField):
+    pass
+
+
+@extend_schema_field(IngredientSerializer(many=True))
+class DenormalizedIngredientsField(DenormalizedAttrsField):
+    pass
+
+
+class ReceipeListSerializer(ReceipeSerializer):
+    """Serializer rendering receipe lists without the link tables"""
+    tags = DenormalizedTagsField(source='tag_cache')
+    ingredients = DenormalizedIngredientsField(source='ingredient_cache')
+
+
 class ReceipeDetailSerializer(ReceipeSerializer):
     """Serializer for receipe detail view"""
+    image_variants = ImageVariantsField()
 
     class Meta(ReceipeSerializer.Meta):
-        fields = ReceipeSerializer.Meta.fields + ['description', 'image']
+        fields = (
+            ReceipeSerializer.Meta.fields + ['description', 'image']
+            + IMAGE_FIELDS
+        )
+        read_only_fields = (
+            ReceipeSerializer.Meta.read_only_fields + IMAGE_FIELDS
+        )
+
+
+class CookableReceipeSerializer(ReceipeSerializer):
+    """Serializer for receipes ranked by the ingredients at hand"""
+    matched = serializers.IntegerField(read_only=True)
+    missing = serializers.IntegerField(read_only=True)
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(ReceipeSerializer.Meta):
+        fields = ReceipeSerializer.Meta.fields + [
+            'matched', 'missing', 'coverage',
+        ]
+
+
+class CookableReceipeListSerializer(CookableReceipeSerializer):
+    """Serializer rendering ranked receipes without the link tables"""
+    tags = DenormalizedTagsField(source='tag_cache')
+    ingredients = DenormalizedIngredientsField(source='ingredient_cache')
+
 
 class ReceipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images"""
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Receipe
-        fields = ["id", "image"]
+        fields = ["id", "image"] + IMAGE_FIELDS
         read_only_field = ["id"]
+        read_only_fields = IMAGE_FIELDS
         extra_kwargs = {"image": {"required": "True"}}
 
+    def validate_image(self, image):
+        """Drop the EXIF, GPS and other metadata of the upload"""
+        try:
+            return images.strip_metadata(image)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            raise serializers.ValidationError(
+                "Upload a valid image. The file you uploaded was either "
+                "not an image or a corrupted image."
+            )
 
+
+class ImageUploadSessionSerializer(serializers.ModelSerializer):
+    """Serializer for resumable image upload sessions"""
+    expires_at = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImageUploadSession
+        fields = ["id", "filename", "size", "offset", "expires_at"]
+        read_only_fields = ["id", "offset"]
+
+    @extend_schema_field(OpenApiTypes.DATETIME)
+    def get_expires_at(self, session):
+        return serializers.DateTimeField().to_representation(
+            uploads.expires_at(session)
+        )
+
+    def validate_size(self, value):
+        """Reject images larger than the upload limit"""
+        if not 0 < value <= settings.RESUMABLE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Size must be between 1 and "
+                f"{settings.RESUMABLE_UPLOAD_MAX_SIZE} bytes."
+            )
+        return value
@@ -0,0 +1,155 @@
+"""
+Signal handlers keeping receipe versions and caches consistent with writes
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from core.models import Receipe, Tags, Ingredient
+from receipe import cache, denormalized, images
+from receipe.versions import touch_receipes, touch_user
+
+
+RELATION_NAMES = {Tags: "tags", Ingredient: "ingredients"}
+
+
+@receiver(post_save, sender=get_user_model())
+def start_user_generation(sender, instance, created, **kwargs):
+    """Give a new user a cache generation nothing is cached under"""
+    if created:
+        cache.reset_generation(instance.pk)
+
+
+@receiver(post_save, sender=Receipe)
+def receipe_saved(sender, instance, created, **kwargs):
+    """Bump the versions a saved receipe is part of"""
+    if not created:
+        touch_receipes(pk=instance.pk)
+    touch_user(instance.user_id)
+
+
+def _release_image(name):
+    """Give up a receipe's hold on a stored image and its variants"""
+    storage = Receipe._meta.get_field("image").storage
+    if storage.is_blob(name):
+        storage.release(name, cleanup=images.delete_variant_dir)
+    elif not Receipe.objects.filter(image=name).exists():
+        # Uploads stored before content addressing have no refcount and
+        # are deleted once no receipe uses them
+        def delete():
+            storage.delete(name)
+            images.delete_variant_dir(name)
+        transaction.on_commit(delete)
+
+
+def _image_name(instance):
+    """Return the loaded image name of a receipe, None when deferred"""
+    value = instance.__dict__.get("image")
+    return getattr(value, "name", value)
+
+
+@receiver(post_save, sender=Receipe)
+def receipe_image_replaced(sender, instance, **kwargs):
+    """Release the image a receipe was saved without"""
+    if "image" not in instance.__dict__:
+        return
+    stored = getattr(instance, "_stored_image", None)
+    stored = getattr(stored, "name", stored)
+    current = _image_name(instance)
+    if stored and stored != current:
+        _release_image(stored)
+    instance._stored_image = current
+
+
+@receiver(post_delete, sender=Receipe)
+def receipe_image_deleted(sender, instance, **kwargs):
+    """Release the image of a deleted receipe"""
+    name = _image_name(instance)
+    if name:
+        _release_image(name)
+
+
+@receiver(post_save, sender=Tags)
+@receiver(post_save, sender=Ingredient)
+def attr_saved(sender, instance, created, **kwargs):
+    """Bump the versions of the receipes rendering a renamed attribute"""
+    if not created:
+        touch_receipes(**{RELATION_NAMES[sender]: instance})
+    touch_user(instance.user_id)
+
+
+@receiver(pre_delete, sender=Tags)
+@receiver(pre_delete, sender=Ingredient)
+def attr_deleting(sender, instance, **kwargs):
+    """Bump the versions of the receipes about to lose an attribute"""
+    touch_receipes(**{RELATION_NAMES[sender]: instance})
+
+
+@receiver(post_delete, sender=Receipe)
+@receiver(post_delete, sender=Tags)
+@receiver(post_delete, sender=Ingredient)
+def row_deleted(sender, instance, **kwargs):
+    """Bump the owner's version when one of their rows goes away"""
+    touch_user(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Receipe.tags.through)
+@receiver(m2m_changed, sender=Receipe.ingredients.through)
+def links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Bump the versions of receipes whose tags or ingredients changed"""
+    if reverse and action == "pre_clear":
+        # The links are gone by post_clear, so find the receipes now
+        touch_receipes(**{RELATION_NAMES[type(instance)]: instance})
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        touch_receipes(pk=instance.pk)
+    elif pk_set:
+        touch_receipes(pk__in=pk_set)
+    touch_user(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Receipe.tags.through)
+@receiver(m2m_changed, sender=Receipe.ingredients.through)
+def links_denormalized(sender, instance, action, reverse, pk_set, **kwargs):
+    """Refresh the tag and ingredient copies of relinked receipes"""
+    if reverse and action == "pre_clear":
+        instance._cleared_receipes = denormalized.linked_receipe_ids(instance)
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if action != "post_clear" and not pk_set:
+        return
+    if not reverse:
+        denormalized.refresh([instance.pk])
+    elif action == "post_clear":
+        denormalized.refresh(instance.__dict__.pop("_cleared_receipes", []))
+    else:
+        denormalized.refresh(pk_set)
+
+
+@receiver(post_save, sender=Tags)
+@receiver(post_save, sender=Ingredient)
+def attr_renamed(sender, instance, created, **kwargs):
+    """Refresh the copies of a saved attribute's name"""
+    if not created:
+        denormalized.refresh(denormalized.linked_receipe_ids(instance))
+
+
+@receiver(pre_delete, sender=Tags)
+@receiver(pre_delete, sender=Ingredient)
+def attr_unlinking(sender, instance, **kwargs):
+    """Remember the receipes a deleted attribute is removed from"""
+    # Deleting cascades to the links without sending m2m_changed
+    instance._unlinked_receipes = denormalized.linked_receipe_ids(instance)
+
+
+@receiver(post_delete, sender=Tags)
+@receiver(post_delete, sender=Ingredient)
+def attr_unlinked(sender, instance, **kwargs):
+    """Drop a deleted attribute from the copies of its receipes"""
+    denormalized.refresh(instance.__dict__.pop("_unlinked_receipes", []))
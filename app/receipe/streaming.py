@@ -0,0 +1,62 @@
+"""
+Streaming export of receipes
+"""
+from itertools import islice
+
+from django.db.models import Prefetch, prefetch_related_objects
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.models import Tags, Ingredient
+
+
+JSON = "json"
+NDJSON = "ndjson"
+CONTENT_TYPES = {
+    JSON: "application/json",
+    NDJSON: "application/x-ndjson",
+}
+
+
+def attr_prefetches():
+    """Return the prefetches loading only what receipe serializers render"""
+    return [
+        Prefetch("tags", queryset=Tags.objects.only("id", "name")),
+        Prefetch(
+            "ingredients", queryset=Ingredient.objects.only("id", "name")
+        ),
+    ]
+
+
+def iter_chunks(queryset, chunk_size):
+    """Yield lists of receipes with their tags and ingredients prefetched
+
+    ``iterator()`` streams rows from the database without caching them on
+    the queryset but ignores ``prefetch_related``, so each chunk is
+    prefetched on its own and at most one chunk is alive at a time.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        prefetch_related_objects(chunk, *attr_prefetches())
+        yield chunk
+
+
+def iter_export(queryset, serializer_class, context, output=JSON,
+                chunk_size=500):
+    """Yield the encoded receipes of queryset as a JSON array or NDJSON"""
+    encoder = JSONEncoder(separators=(",", ":"))
+    first = True
+    if output == JSON:
+        yield b"["
+    for chunk in iter_chunks(queryset, chunk_size):
+        rows = serializer_class(chunk, many=True, context=context).data
+        encoded = [encoder.encode(row) for row in rows]
+        if output == NDJSON:
+            yield ("\n".join(encoded) + "\n").encode()
+        else:
+            yield (("" if first else ",") + ",".join(encoded)).encode()
+        first = False
+    if output == JSON:
+        yield b"]"
@@ -0,0 +1,168 @@
+"""
+Tests for the async read views served in ASGI mode
+"""
+import asyncio
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.backends.utils import CursorWrapper
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core.async_views import pooled_view
+from core.models import Receipe, Tags, Ingredient
+
+
+RECEIPES_URL = reverse('receipe:receipe-list')
+TAGS_URL = reverse('receipe:tag-list')
+INGREDIENTS_URL = reverse('receipe:ingredient-list')
+HEALTH_URL = reverse('health-check')
+
+
+def detail_url(receipe_id):
+    """Create and return a receipe detail URL"""
+    return reverse('receipe:receipe-detail', args=[receipe_id])
+
+
+@override_settings(ROOT_URLCONF='app.asgi_urls')
+class AsyncReadViewTests(TransactionTestCase):
+    """Test the read endpoints through the ASGI handler"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.receipe = Receipe.objects.create(
+            user=self.user,
+            title='Sample receipe',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        self.receipe.tags.add(
+            Tags.objects.create(user=self.user, name='Vegan')
+        )
+        self.receipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt')
+        )
+        self.client = AsyncClient()
+        self.auth = {'authorization': f'Token {self.token.key}'}
+
+    async def test_list_and_detail(self):
+        """Test receipes are listed and retrieved by the async views"""
+        res = await self.client.get(RECEIPES_URL, **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in res.json()['results']], [self.receipe.id]
+        )
+
+        res = await self.client.get(detail_url(self.receipe.id), **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['title'], 'Sample receipe')
+
+    async def test_attr_lists(self):
+        """Test tags and ingredients are listed by the async views"""
+        for url, name in ((TAGS_URL, 'Vegan'), (INGREDIENTS_URL, 'Salt')):
+            res = await self.client.get(url, **self.auth)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.json()['results'][0]['name'], name)
+
+    async def test_requires_authentication(self):
+        """Test the async views still authenticate requests"""
+        res = await self.client.get(RECEIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_health_check(self):
+        """Test the async health check"""
+        res = await self.client.get(HEALTH_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), {'healthy': True})
+
+    async def test_other_endpoints_fall_through(self):
+        """Test endpoints without an async view keep working"""
+        res = await self.client.get(reverse('user:me'), **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['email'], self.user.email)
+
+    async def test_writes_through_async_route(self):
+        """Test writes to an async routed URL still reach the viewset"""
+        payload = {'title': 'New', 'time_minutes': 1, 'price': '1.00'}
+
+        res = await self.client.post(
+            RECEIPES_URL, payload, content_type='application/json',
+            **self.auth,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    async def test_requests_overlap_through_middleware(self):
+        """Test concurrent reads overlap through the whole MIDDLEWARE list
+
+        A sync only middleware would run the rest of the chain, and so
+        every request, on Django's one sync thread.
+        """
+        execute = CursorWrapper.execute
+
+        def slow_execute(cursor, *args, **kwargs):
+            time.sleep(0.05)
+            return execute(cursor, *args, **kwargs)
+
+        async def timed_get(number):
+            start = time.perf_counter()
+            # A distinct query string bypasses the response cache
+            res = await self.client.get(
+                RECEIPES_URL, {'number': number}, **self.auth
+            )
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            return time.perf_counter() - start
+
+        self.assertIn(
+            'core.db.middleware.ReplicaPinMiddleware', settings.MIDDLEWARE
+        )
+        with patch.object(CursorWrapper, 'execute', slow_execute):
+            single = await timed_get(0)
+            start = time.perf_counter()
+            await asyncio.gather(*(timed_get(n) for n in range(1, 5)))
+            concurrent = time.perf_counter() - start
+
+        self.assertLess(concurrent, single * 2.5)
+
+    def test_bench_asgi(self):
+        """Test the ASGI load benchmark runs"""
+        out = StringIO()
+
+        call_command(
+            'bench_asgi', requests=4, concurrency=2, latency_ms=0,
+            email=self.user.email, stdout=out,
+        )
+
+        self.assertIn('pooled async views', out.getvalue())
+        self.assertIn('requests/sec', out.getvalue())
+
+
+class PooledViewTests(TransactionTestCase):
+    """Test wrapping sync views for the thread pool"""
+
+    async def test_runs_in_pool(self):
+        """Test the wrapped view runs on a pool thread"""
+        def view(request):
+            return threading.current_thread().name
+
+        result = await pooled_view(view)(None)
+
+        self.assertTrue(result.startswith('asgi-view'))
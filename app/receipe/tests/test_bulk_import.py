@@ -0,0 +1,138 @@
+"""
+Test the bulk receipe import API
+"""
+import csv
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Receipe, Tags
+
+
+BULK_URL = reverse('receipe:receipe-bulk-import')
+
+
+def ndjson(*rows):
+    """Return rows encoded as an NDJSON body"""
+    return "\n".join(
+        row if isinstance(row, str) else json.dumps(row) for row in rows
+    )
+
+
+class BulkImportAPITests(TestCase):
+    """Test importing receipes in bulk"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='bulk@example.com',
+            password='12345',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_auth_required(self):
+        """Test importing requires authentication"""
+        res = APIClient().post(BULK_URL, '', content_type='text/csv')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(RECEIPE_BULK_CHUNK_SIZE=2)
+    def test_import_ndjson_reports_row_errors(self):
+        """Test valid rows are created across chunks despite bad rows"""
+        Tags.objects.create(user=self.user, name='Dinner')
+        body = ndjson(
+            {'title': 'Soup', 'time_minutes': 20, 'price': '3.50',
+             'tags': [{'name': 'Dinner'}, {'name': 'Quick'}]},
+            {'title': 'No time', 'price': '1.00'},
+            '{not json',
+            {'title': 'Salad', 'time_minutes': 5, 'price': '2.00',
+             'description': 'Fresh',
+             'ingredients': [{'name': 'Lettuce'}]},
+        )
+
+        res = self.client.post(
+            BULK_URL, body, content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['failed'], 2)
+        self.assertEqual([e['row'] for e in res.data['errors']], [2, 3])
+        self.assertIn('time_minutes', res.data['errors'][0]['errors'])
+
+        soup = Receipe.objects.get(user=self.user, title='Soup')
+        self.assertEqual(
+            sorted(soup.tags.values_list('name', flat=True)),
+            ['Dinner', 'Quick'],
+        )
+        self.assertEqual(Tags.objects.filter(user=self.user).count(), 2)
+        salad = Receipe.objects.get(user=self.user, title='Salad')
+        self.assertEqual(salad.description, 'Fresh')
+        self.assertEqual(salad.ingredients.get().name, 'Lettuce')
+
+    def test_import_csv(self):
+        """Test importing receipes from CSV with comma separated tags"""
+        body = (
+            'title,time_minutes,price,link,tags\n'
+            'Stew,60,7.25,,"Dinner, Slow"\n'
+            'Toast,2,0.50,https://example.com,\n'
+        )
+
+        res = self.client.post(
+            BULK_URL, body, content_type='text/csv; charset=utf-8'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 2)
+        stew = Receipe.objects.get(user=self.user, title='Stew')
+        self.assertEqual(
+            sorted(stew.tags.values_list('name', flat=True)),
+            ['Dinner', 'Slow'],
+        )
+        self.assertEqual(
+            Receipe.objects.get(title='Toast').link, 'https://example.com'
+        )
+
+    def test_unsupported_content_type(self):
+        """Test bodies other than NDJSON or CSV are rejected"""
+        res = self.client.post(BULK_URL, {'title': 'x'}, format='json')
+
+        self.assertEqual(
+            res.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+
+    @override_settings(RECEIPE_BULK_CHUNK_SIZE=1)
+    def test_invalid_utf8(self):
+        """Test a body that is not UTF-8 is rejected at its line"""
+        body = (
+            ndjson({'title': 'Soup', 'time_minutes': 20, 'price': '3.50'})
+            .encode() + b'\n{"title": "Cr\xe8me"}\n'
+        )
+
+        res = self.client.post(
+            BULK_URL, body, content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['line'], 2)
+        self.assertIn('Invalid UTF-8', res.data['detail'])
+        self.assertEqual(res.data['created'], 1)
+
+    def test_malformed_csv(self):
+        """Test a CSV record the parser cannot read is rejected"""
+        body = (
+            'title,time_minutes,price\n'
+            'Stew,60,7.25\n'
+            f'"{"x" * (csv.field_size_limit() + 1)}",1,1.00\n'
+        )
+
+        res = self.client.post(BULK_URL, body, content_type='text/csv')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['line'], 3)
+        self.assertIn('Invalid CSV', res.data['detail'])
+        self.assertFalse(Receipe.objects.filter(user=self.user).exists())
@@ -0,0 +1,168 @@
+"""
+Test the per-user response cache of the list endpoints
+"""
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Receipe, Tags
+
+
+RECEIPES_URL = reverse('receipe:receipe-list')
+TAGS_URL = reverse('receipe:tag-list')
+FILE_CACHE = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+def cache_lookups():
+    """Return the response cache (hits, misses) counted so far"""
+    return tuple(
+        REGISTRY.get_sample_value(f'receipe_cache_{name}_total')
+        for name in ('hits', 'misses')
+    )
+
+
+def create_receipe(user, title='sample'):
+    """Create and return a sample receipe"""
+    return Receipe.objects.create(
+        user=user, title=title, time_minutes=5, price=Decimal('1.00')
+    )
+
+
+class ResponseCacheTests(TestCase):
+    """Test list responses are cached and invalidated on writes"""
+
+    def setUp(self):
+        # Responses are only cached in a backend all processes share
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        shared = override_settings(CACHES={
+            'default': {'BACKEND': FILE_CACHE, 'LOCATION': location.name},
+        })
+        shared.enable()
+        self.addCleanup(shared.disable)
+        self.user = get_user_model().objects.create_user(
+            email='cache@example.com',
+            password='12345',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.lookups_before = cache_lookups()
+
+    def lookups(self):
+        """Return the (hits, misses) counted since setUp"""
+        return tuple(
+            now - before
+            for now, before in zip(cache_lookups(), self.lookups_before)
+        )
+
+    def test_second_request_hits_cache(self):
+        """Test repeating a list request is served from the cache"""
+        create_receipe(self.user)
+
+        first = self.client.get(RECEIPES_URL)
+        second = self.client.get(RECEIPES_URL)
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Content-Type'], first['Content-Type'])
+        self.assertEqual(self.lookups(), (1, 1))
+
+    def test_query_params_are_normalized(self):
+        """Test the order of query params does not split the cache"""
+        create_receipe(self.user)
+        self.client.get(RECEIPES_URL, {'page_size': 5, 'match': 'any'})
+
+        res = self.client.get(RECEIPES_URL + '?match=any&page_size=5')
+        other = self.client.get(RECEIPES_URL, {'page_size': 6})
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+        self.assertEqual(other['X-Cache'], 'MISS')
+
+    def test_create_invalidates(self):
+        """Test creating a receipe through the API invalidates the list"""
+        create_receipe(self.user)
+        self.client.get(RECEIPES_URL)
+
+        self.client.post(
+            RECEIPES_URL,
+            {'title': 'new', 'time_minutes': 3, 'price': '2.00'},
+        )
+        res = self.client.get(RECEIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.json()['results']), 2)
+
+    def test_tag_link_and_rename_invalidate(self):
+        """Test m2m changes and tag renames invalidate both lists"""
+        receipe = create_receipe(self.user)
+        tag = Tags.objects.create(user=self.user, name='Dinner')
+        self.client.get(RECEIPES_URL)
+        self.client.get(TAGS_URL)
+
+        receipe.tags.add(tag)
+        res = self.client.get(RECEIPES_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.json()['results'][0]['tags'][0]['name'], 'Dinner')
+
+        tag.name = 'Supper'
+        tag.save()
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.json()['results'][0]['name'], 'Supper')
+
+    def test_cache_is_per_user(self):
+        """Test users never see each other's cached responses"""
+        create_receipe(self.user, title='mine')
+        self.client.get(RECEIPES_URL)
+        other = get_user_model().objects.create_user(email='o@example.com')
+        create_receipe(other, title='theirs')
+        client = APIClient()
+        client.force_authenticate(other)
+
+        res = client.get(RECEIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.json()['results'][0]['title'], 'theirs')
+
+    def test_browsable_api_not_cached(self):
+        """Test only JSON responses are cached"""
+        create_receipe(self.user)
+        self.client.get(RECEIPES_URL, HTTP_ACCEPT='text/html')
+        res = self.client.get(RECEIPES_URL, HTTP_ACCEPT='text/html')
+
+        self.assertNotIn('X-Cache', res)
+
+    def test_bulk_import_invalidates(self):
+        """Test bulk imports invalidate although they send no signals"""
+        create_receipe(self.user)
+        self.client.get(RECEIPES_URL)
+
+        self.client.post(
+            reverse('receipe:receipe-bulk-import'),
+            '{"title": "bulk", "time_minutes": 1, "price": "1.00"}',
+            content_type='application/x-ndjson',
+        )
+        res = self.client.get(RECEIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.json()['results']), 2)
+
+    def test_process_local_cache_not_used(self):
+        """Test nothing is cached in a backend other processes miss"""
+        create_receipe(self.user)
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}):
+            self.client.get(RECEIPES_URL)
+            res = self.client.get(RECEIPES_URL)
+
+            self.assertNotIn('X-Cache', res)
+            self.assertEqual(self.lookups(), (0, 0))
@@ -0,0 +1,79 @@
+"""
+Test receipe management commands
+"""
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import Receipe
+
+
+class BenchmarkCommandTests(TestCase):
+    """Test the seeding and benchmark commands"""
+
+    def test_seed_receipes(self):
+        """Test seeding creates receipes with tags and ingredients"""
+        call_command(
+            'seed_receipes', receipes=12, tags=3, ingredients=4,
+            per_receipe=2, stdout=StringIO(),
+        )
+
+        receipes = Receipe.objects.filter(user__email='bench@example.com')
+        self.assertEqual(receipes.count(), 12)
+        self.assertEqual(receipes.first().tags.count(), 2)
+        self.assertEqual(receipes.first().ingredients.count(), 2)
+
+    def test_bench_filters(self):
+        """Test the filter benchmark reports every case"""
+        out = StringIO()
+        call_command('bench_filters', seed=5, repeat=1, stdout=out)
+
+        self.assertIn('join+distinct 1 tag', out.getvalue())
+        self.assertIn('match=all 3 tags', out.getvalue())
+
+    def test_bench_search(self):
+        """Test the search benchmark reports every case"""
+        out = StringIO()
+        call_command('bench_search', seed=5, repeat=1, stdout=out)
+
+        self.assertIn('ilike 1 word', out.getvalue())
+        self.assertIn('search 2 words + tag', out.getvalue())
+
+    def test_bench_cookable(self):
+        """Test the cookable benchmark reports every case"""
+        out = StringIO()
+        call_command('bench_cookable', seed=5, repeat=1, stdout=out)
+
+        self.assertIn('cookable 3 ingredients', out.getvalue())
+        self.assertIn('cookable 30 ingredients', out.getvalue())
+
+    def test_explain_queries(self):
+        """Test the plan of every viewset query is printed"""
+        get_user_model().objects.create_user(
+            email='plan@example.com', password='12345'
+        )
+        out = StringIO()
+        call_command('explain_queries', 'plan@example.com', stdout=out)
+
+        self.assertIn('ReceipeViewSet.list', out.getvalue())
+        self.assertIn('IngredientsViewSet.list', out.getvalue())
+
+    def test_bench_bulk_import(self):
+        """Test the bulk import benchmark reports throughput"""
+        out = StringIO()
+        call_command('bench_bulk_import', rows=6, chunk_size=4, stdout=out)
+
+        self.assertIn('Imported 6 rows (0 failed)', out.getvalue())
+        self.assertIn('rows/sec', out.getvalue())
+
+    def test_bench_request_metrics_seeds_empty_user(self):
+        """Test the request metrics benchmark seeds a user without data"""
+        out = StringIO()
+        call_command('bench_request_metrics', requests=1, stdout=out)
+
+        self.assertTrue(Receipe.objects.filter(
+            user__email='bench@example.com'
+        ).exists())
+        self.assertIn('overhead', out.getvalue())
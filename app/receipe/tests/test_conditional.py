@@ -0,0 +1,129 @@
+"""
+Test ETag and conditional request support of the receipe API
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Receipe, Tags
+
+
+RECEIPES_URL = reverse('receipe:receipe-list')
+
+
+def detail_url(receipe_id):
+    """Create and return a receipe detail url"""
+    return reverse('receipe:receipe-detail', args=[receipe_id])
+
+
+class ConditionalRequestTests(TestCase):
+    """Test ETags on receipe list and detail responses"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='etag@example.com',
+            password='12345',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.receipe = Receipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('1.00'),
+        )
+
+    def test_detail_not_modified(self):
+        """Test a matching If-None-Match skips the receipe query"""
+        etag = self.client.get(detail_url(self.receipe.id))['ETag']
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(
+                detail_url(self.receipe.id), HTTP_IF_NONE_MATCH=etag
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_detail_etag_changes_on_write(self):
+        """Test updates and tag changes produce a new detail ETag"""
+        url = detail_url(self.receipe.id)
+        first = self.client.get(url)['ETag']
+
+        self.client.patch(url, {'title': 'Stew'})
+        second = self.client.get(url)['ETag']
+        tag = Tags.objects.create(user=self.user, name='Dinner')
+        self.receipe.tags.add(tag)
+        third = self.client.get(url)['ETag']
+        tag.name = 'Supper'
+        tag.save()
+        fourth = self.client.get(url, HTTP_IF_NONE_MATCH=third)
+
+        self.assertEqual(len({first, second, third}), 3)
+        self.assertEqual(fourth.status_code, status.HTTP_200_OK)
+        self.assertEqual(fourth.data['tags'][0]['name'], 'Supper')
+
+    def test_list_not_modified_until_write(self):
+        """Test the list ETag holds until the user's data changes"""
+        etag = self.client.get(RECEIPES_URL)['ETag']
+
+        res = self.client.get(RECEIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Receipe.objects.create(
+            user=self.user, title='New', time_minutes=1, price=Decimal('1.00')
+        )
+        res = self.client.get(RECEIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(len(res.json()['results']), 2)
+
+    def test_list_etag_depends_on_params(self):
+        """Test different filters of the list get different ETags"""
+        res = self.client.get(RECEIPES_URL)
+        other = self.client.get(RECEIPES_URL, {'page_size': 1})
+
+        self.assertNotEqual(res['ETag'], other['ETag'])
+
+    def test_if_match_update(self):
+        """Test writes with a stale If-Match fail with 412"""
+        url = detail_url(self.receipe.id)
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.patch(url, {'title': 'One'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+        res = self.client.patch(url, {'title': 'Two'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(
+            res.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        self.receipe.refresh_from_db()
+        self.assertEqual(self.receipe.title, 'One')
+
+    def test_if_match_delete(self):
+        """Test deleting with a stale If-Match keeps the receipe"""
+        url = detail_url(self.receipe.id)
+
+        res = self.client.delete(url, HTTP_IF_MATCH='"stale"')
+
+        self.assertEqual(
+            res.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        self.assertTrue(Receipe.objects.filter(id=self.receipe.id).exists())
+
+    def test_other_users_receipe_not_found(self):
+        """Test conditional headers do not leak other users' receipes"""
+        other = get_user_model().objects.create_user(email='o@example.com')
+        receipe = Receipe.objects.create(user=other, title='x', time_minutes=1)
+
+        res = self.client.get(detail_url(receipe.id), HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
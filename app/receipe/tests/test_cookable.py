@@ -0,0 +1,163 @@
+"""
+Test ranking receipes by the ingredients at hand
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Receipe, Tags, Ingredient
+
+
+COOKABLE_URL = reverse('receipe:receipe-cookable')
+
+
+def csv(objects):
+    return ','.join(str(obj.id) for obj in objects)
+
+
+class CookableApiTests(TestCase):
+    """Test the cookable receipe list"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='cook@example.com',
+            password='12345',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ['Rice', 'Egg', 'Onion', 'Garlic', 'Chilli']
+        ]
+
+    def create_receipe(self, title, ingredients):
+        """Create a receipe using the ingredients at the given indexes"""
+        receipe = Receipe.objects.create(
+            user=self.user,
+            title=title,
+            time_minutes=10,
+            price=Decimal('1.00'),
+        )
+        receipe.ingredients.add(*(self.ingredients[i] for i in ingredients))
+        return receipe
+
+    def test_ranked_by_coverage_then_missing(self):
+        """Test fully covered receipes come first, then fewest missing"""
+        self.create_receipe('Boiled egg', [1])
+        self.create_receipe('Fried rice', [0, 1, 2, 3])
+        self.create_receipe('Egg curry', [1, 2, 3, 4])
+        self.create_receipe('Omelette', [1, 2])
+        self.create_receipe('Plain soup', [4])
+
+        res = self.client.get(
+            COOKABLE_URL, {'ingredients': csv(self.ingredients[:3])}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        rows = [
+            (r['title'], r['matched'], r['missing'], r['coverage'])
+            for r in res.data['results']
+        ]
+        self.assertEqual(rows, [
+            ('Omelette', 2, 0, 1.0),
+            ('Boiled egg', 1, 0, 1.0),
+            ('Fried rice', 3, 1, 0.75),
+            ('Egg curry', 2, 2, 0.5),
+        ])
+
+    def test_combines_with_tag_filter(self):
+        """Test only receipes with the given tags are ranked"""
+        tag = Tags.objects.create(user=self.user, name='Breakfast')
+        omelette = self.create_receipe('Omelette', [1, 2])
+        omelette.tags.add(tag)
+        self.create_receipe('Boiled egg', [1])
+
+        res = self.client.get(COOKABLE_URL, {
+            'ingredients': csv(self.ingredients[:3]),
+            'tags': str(tag.id),
+        })
+
+        self.assertEqual(
+            [r['id'] for r in res.data['results']], [omelette.id]
+        )
+
+    def test_pages_follow_the_ranking(self):
+        """Test walking the cursor returns the ranking without gaps"""
+        for i in range(7):
+            self.create_receipe(f'receipe {i}', range(i % 4 + 1))
+        params = {'ingredients': csv(self.ingredients[:2])}
+
+        ranked = self.client.get(COOKABLE_URL, params).data['results']
+        res = self.client.get(COOKABLE_URL, dict(params, page_size=3))
+        paged = []
+        while True:
+            paged += res.data['results']
+            if res.data['next'] is None:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(paged, ranked)
+        self.assertEqual(len(paged), 7)
+
+    def test_query_count_does_not_grow_with_receipes(self):
+        """Test the ranking is one query whatever the number of receipes"""
+        params = {'ingredients': csv(self.ingredients)}
+        self.create_receipe('first', [0, 1])
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(COOKABLE_URL, params)
+        for i in range(10):
+            self.create_receipe(f'receipe {i}', [i % 5, (i + 1) % 5])
+        with CaptureQueriesContext(connection) as many:
+            res = self.client.get(COOKABLE_URL, params)
+
+        self.assertEqual(len(res.data['results']), 11)
+        self.assertEqual(len(many), len(few))
+
+    def test_renders_copies_like_link_tables(self):
+        """Test the page renders the copied attributes like the joined ones"""
+        tag = Tags.objects.create(user=self.user, name='Breakfast')
+        self.create_receipe('Omelette', [1, 2]).tags.add(tag)
+        self.create_receipe('Fried rice', [0, 1, 2, 3])
+        params = {'ingredients': csv(self.ingredients[:3])}
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(COOKABLE_URL, params)
+        with override_settings(RECEIPE_DENORMALIZED_LIST=False):
+            joined = self.client.get(COOKABLE_URL, dict(params, joined=1))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('core_receipe_tags' in q['sql'] for q in queries))
+        self.assertEqual(res.data['results'], joined.data['results'])
+        self.assertEqual(
+            res.data['results'][0]['tags'], [{'id': tag.id, 'name': tag.name}]
+        )
+
+    def test_ingredients_required(self):
+        """Test asking without ingredients is a bad request"""
+        res = self.client.get(COOKABLE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ingredients', res.data)
+
+    def test_other_users_receipes_are_not_ranked(self):
+        """Test receipes of other users never show up"""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='12345',
+        )
+        receipe = Receipe.objects.create(
+            user=other, title='Theirs', time_minutes=5, price=Decimal('1.00')
+        )
+        receipe.ingredients.add(self.ingredients[0])
+
+        res = self.client.get(
+            COOKABLE_URL, {'ingredients': csv(self.ingredients)}
+        )
+
+        self.assertEqual(res.data['results'], [])
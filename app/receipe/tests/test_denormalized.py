@@ -0,0 +1,186 @@
+"""
+Test the tags and ingredients copied onto receipes
+"""
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Receipe, Tags, Ingredient
+from receipe import denormalized
+
+
+RECEIPES_URL = reverse('receipe:receipe-list')
+
+
+def detail_url(receipe_id):
+    return reverse('receipe:receipe-detail', args=[receipe_id])
+
+
+def copies(receipe):
+    """Return the stored copies of a receipe as (tag names, ingr names)"""
+    receipe.refresh_from_db()
+    return (
+        [tag['name'] for tag in receipe.tag_cache],
+        [ingr['name'] for ingr in receipe.ingredient_cache],
+    )
+
+
+class DenormalizedAttrsTests(TestCase):
+    """Test the copies follow every change of links and names"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='denorm@example.com',
+            password='12345',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.receipe = Receipe.objects.create(
+            user=self.user,
+            title='Dal',
+            time_minutes=10,
+            price=Decimal('1.00'),
+        )
+        self.vegan = Tags.objects.create(user=self.user, name='Vegan')
+        self.quick = Tags.objects.create(user=self.user, name='Quick')
+        self.rice = Ingredient.objects.create(user=self.user, name='Rice')
+
+    def test_api_writes_update_copies(self):
+        """Test creating and updating through the API fills the copies"""
+        res = self.client.post(RECEIPES_URL, {
+            'title': 'Curry',
+            'time_minutes': 20,
+            'price': '3.00',
+            'tags': [{'name': 'Vegan'}, {'name': 'Spicy'}],
+            'ingredients': [{'name': 'Rice'}],
+        }, format='json')
+        receipe = Receipe.objects.get(pk=res.data['id'])
+        self.assertEqual(copies(receipe), (['Vegan', 'Spicy'], ['Rice']))
+        self.assertEqual((receipe.tag_count, receipe.ingredient_count), (2, 1))
+
+        self.client.patch(
+            detail_url(receipe.id), {'tags': [{'name': 'Quick'}]},
+            format='json',
+        )
+
+        self.assertEqual(copies(receipe), (['Quick'], ['Rice']))
+        self.assertEqual(receipe.tag_count, 1)
+
+    def test_link_changes_from_both_sides(self):
+        """Test adds, removes and clears from either side are copied"""
+        self.receipe.tags.add(self.vegan, self.quick)
+        self.rice.receipe_set.add(self.receipe)
+        self.assertEqual(copies(self.receipe), (['Vegan', 'Quick'], ['Rice']))
+
+        self.receipe.tags.remove(self.vegan)
+        self.assertEqual(copies(self.receipe), (['Quick'], ['Rice']))
+
+        self.rice.receipe_set.clear()
+        self.quick.receipe_set.clear()
+        self.assertEqual(copies(self.receipe), ([], []))
+
+    def test_rename_and_delete_attributes(self):
+        """Test renamed and deleted attributes are copied"""
+        self.receipe.tags.add(self.vegan, self.quick)
+
+        self.vegan.name = 'Plant based'
+        self.vegan.save()
+        self.assertEqual(copies(self.receipe)[0], ['Plant based', 'Quick'])
+
+        self.quick.delete()
+        self.assertEqual(copies(self.receipe)[0], ['Plant based'])
+        self.assertEqual(self.receipe.tag_count, 1)
+
+    def test_list_renders_without_link_tables(self):
+        """Test the list reads no link table and renders like before"""
+        self.receipe.tags.add(self.vegan, self.quick)
+        self.receipe.ingredients.add(self.rice)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECEIPES_URL)
+        with override_settings(RECEIPE_DENORMALIZED_LIST=False):
+            joined = self.client.get(RECEIPES_URL, {'joined': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(any(
+            'core_receipe_tags' in q['sql'] or
+            'core_receipe_ingredients' in q['sql']
+            for q in queries
+        ))
+        self.assertEqual(res.data['results'], joined.data['results'])
+
+    def test_check_and_rebuild_command(self):
+        """Test the command reports drift and rebuilds the copies"""
+        self.receipe.tags.add(self.vegan)
+        # update() sends no signals, so the copy goes stale
+        Tags.objects.filter(pk=self.vegan.pk).update(name='Vegetarian')
+
+        with self.assertRaisesMessage(CommandError, '1 receipes'):
+            call_command('rebuild_denormalized', check=True, stdout=StringIO())
+        call_command('rebuild_denormalized', stdout=StringIO())
+
+        self.assertEqual(copies(self.receipe)[0], ['Vegetarian'])
+        out = StringIO()
+        call_command('rebuild_denormalized', check=True, stdout=out)
+        self.assertIn('up to date', out.getvalue())
+
+    def rebuild_corrupted(self):
+        """Corrupt the copies of a few receipes, rebuild and check them"""
+        receipes = [self.receipe] + [
+            Receipe.objects.create(
+                user=self.user, title=f'Receipe {i}', time_minutes=5,
+                price=Decimal('1.00'),
+            )
+            for i in range(3)
+        ]
+        receipes[0].tags.add(self.vegan, self.quick)
+        receipes[0].ingredients.add(self.rice)
+        receipes[1].tags.add(self.quick)
+        receipes[2].ingredients.add(self.rice)
+        expected = {
+            receipe.pk: (
+                *copies(receipe),
+                receipe.tag_count, receipe.ingredient_count,
+            )
+            for receipe in receipes
+        }
+        Receipe.objects.filter(pk__in=expected).update(
+            tag_cache=[{'id': 0, 'name': 'Stale'}],
+            ingredient_cache=[],
+            tag_count=7,
+            ingredient_count=7,
+        )
+
+        out = StringIO()
+        call_command('rebuild_denormalized', stdout=out)
+
+        self.assertIn('Rebuilt the copies of 4 receipes', out.getvalue())
+        for receipe in receipes:
+            self.assertEqual(
+                (*copies(receipe), receipe.tag_count,
+                 receipe.ingredient_count),
+                expected[receipe.pk],
+            )
+        self.assertEqual(expected[receipes[0].pk], (
+            ['Vegan', 'Quick'], ['Rice'], 2, 1,
+        ))
+
+    def test_rebuild_restores_corrupted_copies(self):
+        """Test the rebuild restores copies and counts of every receipe"""
+        self.rebuild_corrupted()
+
+    def test_rebuild_row_by_row(self):
+        """Test the rebuild of backends without the SQL UPDATE"""
+        fallback = Mock(vendor='sqlite')
+        with patch.object(denormalized, 'connection', fallback):
+            self.rebuild_corrupted()
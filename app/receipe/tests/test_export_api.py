@@ -0,0 +1,103 @@
+"""
+Test the streaming receipe export API
+"""
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Receipe, Tags
+
+
+EXPORT_URL = reverse('receipe:receipe-export')
+
+
+def create_receipes(user, count, tag):
+    """Create count receipes tagged with tag"""
+    for i in range(count):
+        receipe = Receipe.objects.create(
+            user=user,
+            title=f'receipe {i}',
+            description='exported',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+        receipe.tags.add(tag)
+
+
+def read_stream(res):
+    """Return the streamed body of a response as text"""
+    return b''.join(res.streaming_content).decode()
+
+
+@override_settings(RECEIPE_EXPORT_CHUNK_SIZE=2)
+class ExportAPITests(TestCase):
+    """Test exporting a user's receipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='export@example.com',
+            password='12345',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tags.objects.create(user=self.user, name='Dinner')
+
+    def test_export_json_array(self):
+        """Test the default export is a JSON array of every receipe"""
+        create_receipes(self.user, 5, self.tag)
+        other = get_user_model().objects.create_user(email='o@example.com')
+        Receipe.objects.create(user=other, title='x', time_minutes=1)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        rows = json.loads(read_stream(res))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['description'], 'exported')
+        self.assertEqual(
+            rows[0]['tags'], [{'id': self.tag.id, 'name': 'Dinner'}]
+        )
+
+    def test_export_ndjson(self):
+        """Test exporting one receipe per line"""
+        create_receipes(self.user, 3, self.tag)
+
+        res = self.client.get(EXPORT_URL, {'output': 'ndjson'})
+
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = read_stream(res).splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0])['title'], 'receipe 2')
+
+    def test_export_empty_library(self):
+        """Test exporting without receipes returns an empty array"""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(json.loads(read_stream(res)), [])
+
+    def test_export_queries_per_chunk(self):
+        """Test tags and ingredients are prefetched once per chunk"""
+        create_receipes(self.user, 4, self.tag)
+        with CaptureQueriesContext(connection) as few:
+            read_stream(self.client.get(EXPORT_URL))
+        create_receipes(self.user, 4, self.tag)
+        with CaptureQueriesContext(connection) as many:
+            read_stream(self.client.get(EXPORT_URL))
+
+        # Two more chunks, each one prefetching tags and ingredients
+        self.assertEqual(len(many) - len(few), 4)
+
+    def test_export_invalid_output(self):
+        """Test an unknown output format is rejected"""
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,128 @@
+"""
+Test facet counts of the receipe list
+"""
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Receipe, Tags, Ingredient
+
+
+RECEIPES_URL = reverse('receipe:receipe-list')
+
+
+def counts(facets):
+    """Return {name: count} of one facet"""
+    return {row['name']: row['count'] for row in facets}
+
+
+class FacetApiTests(TestCase):
+    """Test the facets param of the receipe list"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='facets@example.com',
+            password='12345',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Facets are only cached in a backend all processes share
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        shared = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location.name,
+        }})
+        shared.enable()
+        self.addCleanup(shared.disable)
+        self.vegan = Tags.objects.create(user=self.user, name='Vegan')
+        self.quick = Tags.objects.create(user=self.user, name='Quick')
+        self.rice = Ingredient.objects.create(user=self.user, name='Rice')
+
+    def create_receipe(self, title, tags=(), ingredients=()):
+        receipe = Receipe.objects.create(
+            user=self.user,
+            title=title,
+            time_minutes=10,
+            price=Decimal('1.00'),
+        )
+        receipe.tags.add(*tags)
+        receipe.ingredients.add(*ingredients)
+        return receipe
+
+    def test_counts_per_tag_and_ingredient(self):
+        """Test facets count the receipes per tag and ingredient"""
+        self.create_receipe('Dal', [self.vegan, self.quick], [self.rice])
+        self.create_receipe('Salad', [self.vegan])
+        self.create_receipe('Toast', [self.quick])
+
+        res = self.client.get(RECEIPES_URL, {'facets': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            counts(res.data['facets']['tags']), {'Vegan': 2, 'Quick': 2}
+        )
+        self.assertEqual(
+            counts(res.data['facets']['ingredients']), {'Rice': 1}
+        )
+
+    def test_counts_follow_filters(self):
+        """Test facets only count the receipes matching the filters"""
+        self.create_receipe('Dal', [self.vegan, self.quick], [self.rice])
+        self.create_receipe('Salad', [self.vegan])
+        self.create_receipe('Toast', [self.quick])
+
+        res = self.client.get(
+            RECEIPES_URL, {'facets': 1, 'tags': str(self.vegan.id)}
+        )
+
+        self.assertEqual(
+            counts(res.data['facets']['tags']), {'Vegan': 2, 'Quick': 1}
+        )
+        res = self.client.get(RECEIPES_URL, {'facets': 1, 'search': 'toast'})
+        self.assertEqual(counts(res.data['facets']['tags']), {'Quick': 1})
+        self.assertEqual(res.data['facets']['ingredients'], [])
+
+    def test_no_facets_unless_asked(self):
+        """Test the list leaves facets out by default"""
+        self.create_receipe('Dal', [self.vegan])
+
+        res = self.client.get(RECEIPES_URL)
+
+        self.assertNotIn('facets', res.data)
+
+    def test_query_count_independent_of_data_and_pages(self):
+        """Test facets cost a fixed number of queries, once per filter"""
+        self.create_receipe('Dal', [self.vegan])
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get(RECEIPES_URL, {'page_size': 1})
+        for i in range(5):
+            tag = Tags.objects.create(user=self.user, name=f'tag {i}')
+            self.create_receipe(f'receipe {i}', [tag], [self.rice])
+
+        with CaptureQueriesContext(connection) as first:
+            res = self.client.get(RECEIPES_URL, {'facets': 1, 'page_size': 1})
+        with CaptureQueriesContext(connection) as second:
+            self.client.get(res.data['next'])
+
+        self.assertEqual(len(first), len(plain) + 2)
+        self.assertEqual(len(second), len(plain))
+
+    def test_counts_refresh_after_writes(self):
+        """Test cached facets are dropped once the user's data changes"""
+        receipe = self.create_receipe('Dal', [self.vegan])
+        self.client.get(RECEIPES_URL, {'facets': 1})
+
+        receipe.tags.add(self.quick)
+        res = self.client.get(RECEIPES_URL, {'facets': 1})
+
+        self.assertEqual(
+            counts(res.data['facets']['tags']), {'Vegan': 1, 'Quick': 1}
+        )
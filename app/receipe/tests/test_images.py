@@ -0,0 +1,285 @@
+"""
+Tests for the receipe image pipeline
+"""
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageBlob, Receipe
+from receipe import images
+
+
+def image_upload_url(receipe_id):
+    """Create and return an image upload URL"""
+    return reverse("receipe:receipe-upload-image", args=[receipe_id])
+
+
+def detail_url(receipe_id):
+    """Create and return a receipe detail URL"""
+    return reverse("receipe:receipe-detail", args=[receipe_id])
+
+
+def by_label(variants):
+    """Return {label: variant} of a receipe's image variants"""
+    return {variant["label"]: variant for variant in variants}
+
+
+def make_image(size=(600, 300), fmt="JPEG", **save_kwargs):
+    """Return an in memory image file"""
+    buffer = BytesIO()
+    Image.new("RGB", size, color=(200, 30, 30)).save(
+        buffer, fmt, **save_kwargs
+    )
+    buffer.seek(0)
+    buffer.name = f"upload.{fmt.lower()}"
+    return buffer
+
+
+@override_settings(RECEIPE_IMAGE_WORKERS=0)
+class ImagePipelineTests(TestCase):
+    """Test rendering image variants for uploads"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.receipe = Receipe.objects.create(
+            user=self.user, title="Cake", time_minutes=5,
+            price=Decimal("5.00"),
+        )
+
+    def _upload(self, image, run_jobs=True):
+        with self.captureOnCommitCallbacks(execute=run_jobs):
+            return self.client.post(
+                image_upload_url(self.receipe.id), {"image": image},
+                format="multipart",
+            )
+
+    def test_upload_returns_pending(self):
+        """Test the upload answers before the variants are rendered"""
+        res = self._upload(make_image(), run_jobs=False)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["image_status"], Receipe.IMAGE_PENDING)
+        self.assertEqual(res.data["image_variants"], [])
+
+    def test_variants_rendered(self):
+        """Test variants smaller than the original are rendered"""
+        self._upload(make_image((600, 300)))
+
+        self.receipe.refresh_from_db()
+        self.assertEqual(self.receipe.image_status, Receipe.IMAGE_READY)
+        self.assertEqual(
+            (self.receipe.image_width, self.receipe.image_height), (600, 300)
+        )
+        variants = self.receipe.image_variants
+        self.assertEqual(
+            [variant["label"] for variant in variants],
+            ["thumb", "small", "full"],
+        )
+        self.assertEqual(
+            (variants[0]["width"], variants[0]["height"]), (160, 80)
+        )
+        for variant in variants:
+            for ext in ("jpeg", "webp"):
+                self.assertTrue(default_storage.exists(variant[ext]))
+
+    def test_metadata_stripped(self):
+        """Test variants do not carry the EXIF data of the upload"""
+        exif = Image.Exif()
+        exif[0x010F] = "Camera maker"
+        self._upload(make_image(exif=exif.tobytes()))
+
+        self.receipe.refresh_from_db()
+        path = by_label(self.receipe.image_variants)["full"]["jpeg"]
+        with default_storage.open(path) as variant:
+            self.assertFalse(Image.open(variant).getexif())
+
+    def test_original_metadata_stripped(self):
+        """Test the stored upload is rotated and has no EXIF data left"""
+        exif = Image.Exif()
+        exif[0x010F] = "Camera maker"
+        exif[0x0112] = 6
+        self._upload(make_image((600, 300), exif=exif.tobytes()))
+
+        self.receipe.refresh_from_db()
+        with self.receipe.image.open() as original:
+            img = Image.open(original)
+            self.assertEqual(img.format, "JPEG")
+            self.assertEqual(img.size, (300, 600))
+            self.assertFalse(img.getexif())
+
+    def test_detail_exposes_variant_urls(self):
+        """Test the detail view renders absolute variant URLs"""
+        self._upload(make_image())
+
+        res = self.client.get(detail_url(self.receipe.id))
+
+        thumb = res.data["image_variants"][0]
+        self.assertEqual(thumb["label"], "thumb")
+        self.assertTrue(thumb["jpeg"].startswith("http://testserver/media/"))
+        self.assertEqual(thumb["width"], 160)
+        self.assertEqual(res.data["image_status"], Receipe.IMAGE_READY)
+
+    def test_reupload_deletes_old_variants(self):
+        """Test replacing the image removes the previous variants"""
+        self._upload(make_image())
+        self.receipe.refresh_from_db()
+        old_path = self.receipe.image_variants[0]["jpeg"]
+
+        self._upload(make_image((400, 400)))
+
+        self.assertFalse(default_storage.exists(old_path))
+
+    def test_unreadable_image_fails(self):
+        """Test an image Pillow cannot decode is marked failed"""
+        name = default_storage.save("uploads/receipe/x.jpg",
+                                    ContentFile(b"not an image"))
+        Receipe.objects.filter(pk=self.receipe.pk).update(image=name)
+
+        with self.assertLogs("receipe.images", "ERROR"):
+            images.process_image(self.receipe.pk, name)
+
+        self.receipe.refresh_from_db()
+        self.assertEqual(self.receipe.image_status, Receipe.IMAGE_FAILED)
+
+    def test_replaced_image_not_recorded(self):
+        """Test a job for an image that was replaced records nothing"""
+        name = default_storage.save("uploads/receipe/old.jpg",
+                                    ContentFile(make_image().read()))
+
+        images.process_image(self.receipe.pk, name)
+
+        self.receipe.refresh_from_db()
+        self.assertEqual(self.receipe.image_variants, [])
+        self.assertFalse(os.listdir(
+            os.path.join(self.media_root, "uploads", "receipe", "variants",
+                         "old")
+        ))
+
+    def test_render_image_variants_command(self):
+        """Test the command renders variants of old uploads"""
+        name = default_storage.save("uploads/receipe/legacy.jpg",
+                                    ContentFile(make_image().read()))
+        Receipe.objects.filter(pk=self.receipe.pk).update(image=name)
+        out = StringIO()
+
+        call_command("render_image_variants", stdout=out)
+
+        self.receipe.refresh_from_db()
+        self.assertEqual(self.receipe.image_status, Receipe.IMAGE_READY)
+        self.assertIn("1 images", out.getvalue())
+
+
+@override_settings(RECEIPE_IMAGE_WORKERS=0)
+class SharedImageTests(TestCase):
+    """Test receipes sharing content addressed image files"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.receipes = [
+            Receipe.objects.create(
+                user=self.user, title=f"Cake {i}", time_minutes=5,
+                price=Decimal("5.00"),
+            )
+            for i in range(2)
+        ]
+
+    def _upload(self, receipe, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                image_upload_url(receipe.id), {"image": image},
+                format="multipart",
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        receipe.refresh_from_db()
+        return receipe.image.name
+
+    def _files(self):
+        return sorted(
+            os.path.relpath(os.path.join(d, f), self.media_root)
+            for d, _s, fs in os.walk(self.media_root) for f in fs
+        )
+
+    def test_identical_uploads_share_file(self):
+        """Test the same photo uploaded twice is stored once"""
+        first = self._upload(self.receipes[0], make_image())
+        second = self._upload(self.receipes[1], make_image())
+
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith("blobs/"))
+        self.assertEqual(ImageBlob.objects.get(name=first).refcount, 2)
+        self.assertEqual(
+            self.receipes[0].image_variants, self.receipes[1].image_variants
+        )
+
+    def test_replaced_image_deleted(self):
+        """Test re-uploading deletes the unused previous image"""
+        old = self._upload(self.receipes[0], make_image((600, 300)))
+        old_variants = self.receipes[0].image_variants
+
+        new = self._upload(self.receipes[0], make_image((300, 600)))
+
+        self.assertNotEqual(old, new)
+        self.assertFalse(default_storage.exists(old))
+        self.assertFalse(default_storage.exists(old_variants[0]["jpeg"]))
+        self.assertFalse(ImageBlob.objects.filter(name=old).exists())
+
+    def test_shared_image_kept_until_last_receipe_deleted(self):
+        """Test deleting receipes releases their shared image"""
+        name = self._upload(self.receipes[0], make_image())
+        self._upload(self.receipes[1], make_image())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.receipes[0].delete()
+
+        self.assertTrue(default_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.receipes[1].delete()
+
+        self.assertFalse(default_storage.exists(name))
+        self.assertEqual(self._files(), [])
+
+    def test_collect_image_blobs(self):
+        """Test the repair command recounts and deletes unused blobs"""
+        name = self._upload(self.receipes[0], make_image())
+        ImageBlob.objects.filter(name=name).update(refcount=5)
+        Receipe.objects.filter(pk=self.receipes[0].pk).update(image="")
+        out = StringIO()
+
+        call_command("collect_image_blobs", stdout=out)
+
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertFalse(default_storage.exists(name))
+        self.assertIn("deleted 1 unused blobs", out.getvalue())
@@ -80,8 +80,8 @@ class PrivateIngredientAPITest(TestCase):
         serializer = IngredientSerializer(ingredients, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data['results'], serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
 
 
     def test_ingredient_update(self):
@@ -129,8 +129,8 @@ class PrivateIngredientAPITest(TestCase):
         
         s1 = IngredientSerializer(ingredient1)
         s2 = IngredientSerializer(ingredient2)
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     def test_filtered_ingredients_unique(self):
         """Test filtered ingredients return a unique list"""
@@ -152,4 +152,23 @@ class PrivateIngredientAPITest(TestCase):
 
         res = self.client.get(INGREDIENTS_URL, {"assigned_only": 1})
 
-        self.assertEqual(len(res.data), 1)
\ No newline at end of file
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_popular_ingredients(self):
+        """Test ingredients can be listed by receipe count"""
+        salt = create_ingredients(name="salt", user=self.user)
+        create_ingredients(name="saffron", user=self.user)
+        for title in ("eggs", "soup"):
+            receipe = Receipe.objects.create(title=title,
+                                             time_minutes=5,
+                                             price=Decimal("1.00"),
+                                             user=self.user)
+            receipe.ingredients.add(salt)
+
+        res = self.client.get(INGREDIENTS_URL,
+                              {"order": "popular", "min_count": 1})
+
+        self.assertEqual(
+            [(i["name"], i["recipe_count"]) for i in res.data["results"]],
+            [("salt", 2)],
+        )
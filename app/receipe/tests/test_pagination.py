@@ -0,0 +1,102 @@
+"""
+Test keyset pagination of the receipe APIs
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Receipe, Tags
+
+
+RECEIPES_URL = reverse('receipe:receipe-list')
+TAGS_URL = reverse('receipe:tag-list')
+
+
+def create_receipes(user, count):
+    """Create and return count sample receipes"""
+    return [
+        Receipe.objects.create(
+            user=user,
+            title=f'receipe {i}',
+            time_minutes=10,
+            price=Decimal('1.50'),
+        )
+        for i in range(count)
+    ]
+
+
+class KeysetPaginationTests(TestCase):
+    """Test paging through receipes and tags with cursors"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='pager@example.com',
+            password='12345',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _walk(self, url, params):
+        """Follow next links and return every page fetched"""
+        pages = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append(res.data['results'])
+            if res.data['next'] is None:
+                return pages
+            res = self.client.get(res.data['next'])
+
+    def test_pages_cover_all_receipes_in_order(self):
+        """Test walking the cursor returns every receipe once by -id"""
+        receipes = create_receipes(self.user, 7)
+
+        pages = self._walk(RECEIPES_URL, {'page_size': 3})
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        ids = [r['id'] for page in pages for r in page]
+        self.assertEqual(ids, sorted((r.id for r in receipes), reverse=True))
+
+    def test_tags_paginate_by_name_then_id(self):
+        """Test tags are paged by descending name without gaps"""
+        for name in ['b', 'a', 'd', 'c', 'e']:
+            Tags.objects.create(user=self.user, name=name)
+
+        pages = self._walk(TAGS_URL, {'page_size': 2})
+
+        rows = [(t['name'], t['id']) for page in pages for t in page]
+        expected = sorted(
+            Tags.objects.values_list('name', 'id'),
+            key=lambda row: (-ord(row[0]), row[1]),
+        )
+        self.assertEqual(rows, expected)
+
+    def test_deep_page_query_count_matches_first_page(self):
+        """Test a deep page costs the same queries as the first one"""
+        create_receipes(self.user, 6)
+        with CaptureQueriesContext(connection) as first:
+            res = self.client.get(RECEIPES_URL, {'page_size': 2})
+        next_url = self.client.get(res.data['next']).data['next']
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(next_url)
+
+        self.assertEqual(len(deep), len(first))
+
+    def test_empty_first_page_not_found(self):
+        """Test an empty receipe list still reports no receipe found"""
+        res = self.client.get(RECEIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is rejected"""
+        create_receipes(self.user, 1)
+        res = self.client.get(RECEIPES_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -9,7 +9,9 @@ from decimal import Decimal
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from core.models import Receipe, Tags, Ingredient
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from rest_framework import status
 from receipe.serializers import ReceipeSerializer, ReceipeDetailSerializer
@@ -71,7 +73,7 @@ class PrivateReceipeAPITests(TestCase):
         receipes = Receipe.objects.all().order_by('-id')
         serializer = ReceipeSerializer(receipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
 
     def test_retrieve_receipe_limited_to_a_user(self):
@@ -83,7 +85,7 @@ class PrivateReceipeAPITests(TestCase):
         receipes = Receipe.objects.filter(user=self.user).order_by('-id')
         serializer = ReceipeSerializer(receipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_get_receipe_detail(self):
         """Test get receipe detail"""
@@ -397,9 +399,9 @@ class PrivateReceipeAPITests(TestCase):
         s2 = ReceipeSerializer(r2)
         s3 = ReceipeSerializer(r3)
 
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
     def test_filter_by_ingredients(self):
         """Test filtering by ingredients"""
@@ -435,9 +437,159 @@ class PrivateReceipeAPITests(TestCase):
         s2 = ReceipeSerializer(r2)
         s3 = ReceipeSerializer(r3)
 
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
+
+    def test_filter_matching_several_tags_returned_once(self):
+        """Test a receipe matching several filter tags is listed once"""
+        receipe = create_receipe(self.user)
+        tag1 = Tags.objects.create(name="Vegan", user=self.user)
+        tag2 = Tags.objects.create(name="Quick", user=self.user)
+        receipe.tags.add(tag1, tag2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(
+                RECEIPES_URL, {"tags": f"{tag1.id},{tag2.id}"}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        for query in ctx.captured_queries:
+            self.assertNotIn("DISTINCT", query['sql'])
+
+    def test_filter_match_all_tags(self):
+        """Test match=all only returns receipes having every tag"""
+        tag1 = Tags.objects.create(name="Vegan", user=self.user)
+        tag2 = Tags.objects.create(name="Quick", user=self.user)
+        both = create_receipe(self.user, title="both")
+        both.tags.add(tag1, tag2)
+        one = create_receipe(self.user, title="one")
+        one.tags.add(tag1)
+
+        params = {"tags": f"{tag1.id},{tag2.id}", "match": "all"}
+        res = self.client.get(RECEIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [r['id'] for r in res.data['results']]
+        self.assertEqual(ids, [both.id])
+
+    def test_filter_invalid_params_bad_request(self):
+        """Test malformed filter params return a 400"""
+        create_receipe(self.user)
+
+        res = self.client.get(RECEIPES_URL, {"tags": "1,abc"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(RECEIPES_URL, {"tags": "1", "match": "some"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ReceipeQueryCountTests(TestCase):
+    """Test the number of queries stays constant as receipes grow"""
+
+    def setUp(self):
+        self.user = create_user(email='count@example.com', password='1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tags.objects.create(user=self.user, name='Dinner')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Salt'
+        )
+
+    def _create_receipes(self, count):
+        """Create receipes with a tag and an ingredient each"""
+        for _ in range(count):
+            receipe = create_receipe(self.user)
+            receipe.tags.add(self.tag)
+            receipe.ingredients.add(self.ingredient)
+
+    def _count_queries(self, url):
+        """Return the number of queries issued for a GET on url"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        """Test listing receipes does not issue a query per receipe"""
+        self._create_receipes(1)
+        baseline = self._count_queries(RECEIPES_URL)
+
+        self._create_receipes(10)
+        self.assertEqual(self._count_queries(RECEIPES_URL), baseline)
+
+    def test_list_defers_detail_fields(self):
+        """Test the list query does not select description or image"""
+        self._create_receipes(1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECEIPES_URL)
+
+        receipe_sql = [
+            q['sql'] for q in ctx.captured_queries
+            if 'FROM "core_receipe"' in q['sql']
+        ]
+        self.assertTrue(receipe_sql)
+        for sql in receipe_sql:
+            self.assertNotIn('"core_receipe"."description"', sql)
+            self.assertNotIn('"core_receipe"."image"', sql)
+
+    def test_detail_query_count_independent_of_tags(self):
+        """Test receipe detail prefetches tags and ingredients"""
+        receipe = create_receipe(self.user)
+        receipe.tags.add(self.tag)
+        baseline = self._count_queries(detail_url(receipe.id))
+
+        for i in range(5):
+            receipe.tags.add(Tags.objects.create(user=self.user, name=f't{i}'))
+            receipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'i{i}')
+            )
+        self.assertEqual(self._count_queries(detail_url(receipe.id)), baseline)
+
+    def _count_create_queries(self, names):
+        """Return the queries used to create a receipe with names as attrs"""
+        payload = {
+            'title': 'bulk',
+            'time_minutes': 5,
+            'price': Decimal('2.50'),
+            'tags': [{'name': f'tag {n}'} for n in names],
+            'ingredients': [{'name': f'ingr {n}'} for n in names],
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECEIPES_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return len(ctx.captured_queries)
+
+    def test_create_query_count_independent_of_attrs(self):
+        """Test creating tags and ingredients is batched"""
+        few = self._count_create_queries(range(2))
+        many = self._count_create_queries(range(2, 22))
+
+        self.assertEqual(few, many)
+        self.assertEqual(Tags.objects.filter(user=self.user).count(), 23)
+
+    def test_update_tags_and_ingredients_together(self):
+        """Test updating tags and ingredients in one request sets both"""
+        receipe = create_receipe(self.user)
+        receipe.tags.add(self.tag)
+        receipe.ingredients.add(self.ingredient)
+        payload = {
+            'tags': [{'name': 'Lunch'}, {'name': 'Lunch'}],
+            'ingredients': [{'name': 'Pepper'}, {'name': 'Salt'}],
+        }
+
+        res = self.client.patch(detail_url(receipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(receipe.tags.values_list('name', flat=True)), ['Lunch']
+        )
+        self.assertEqual(
+            sorted(receipe.ingredients.values_list('name', flat=True)),
+            ['Pepper', 'Salt'],
+        )
+        self.assertIn(self.ingredient, receipe.ingredients.all())
 
 
 class ImageUploadTests(TestCase):
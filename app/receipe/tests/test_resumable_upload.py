@@ -0,0 +1,242 @@
+"""
+Tests for resumable receipe image uploads
+"""
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageUploadSession, Receipe
+from receipe import uploads
+
+
+def start_url(receipe_id):
+    """Create and return the URL opening an upload session"""
+    return reverse("receipe:receipe-image-upload-start", args=[receipe_id])
+
+
+def session_url(receipe_id, upload_id):
+    """Create and return the URL of an upload session"""
+    return reverse(
+        "receipe:receipe-image-upload", args=[receipe_id, upload_id]
+    )
+
+
+def image_bytes(size=(300, 200)):
+    """Return the bytes of a JPEG image"""
+    buffer = BytesIO()
+    Image.new("RGB", size, color=(10, 120, 10)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@override_settings(RECEIPE_IMAGE_WORKERS=0)
+class ResumableUploadTests(TestCase):
+    """Test uploading receipe images in chunks"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        paths = override_settings(
+            MEDIA_ROOT=os.path.join(self.tmp, "media"),
+            RESUMABLE_UPLOAD_DIR=os.path.join(self.tmp, "parts"),
+        )
+        paths.enable()
+        self.addCleanup(paths.disable)
+
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.receipe = Receipe.objects.create(
+            user=self.user, title="Bread", time_minutes=60,
+            price=Decimal("2.00"),
+        )
+        self.data = image_bytes()
+
+    def _start(self, size=None):
+        res = self.client.post(
+            start_url(self.receipe.id),
+            {"filename": "photo.jpg", "size": size or len(self.data)},
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data["id"]
+
+    def _put(self, upload_id, start, end):
+        return self.client.generic(
+            "PUT",
+            session_url(self.receipe.id, upload_id),
+            self.data[start:end + 1],
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{end}/{len(self.data)}",
+        )
+
+    def test_upload_in_chunks(self):
+        """Test chunks are assembled into the receipe image"""
+        upload_id = self._start()
+        middle = len(self.data) // 2
+
+        res = self._put(upload_id, 0, middle - 1)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data["offset"], middle)
+
+        res = self._put(upload_id, middle, len(self.data) - 1)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["image_status"], Receipe.IMAGE_PENDING)
+        self.receipe.refresh_from_db()
+        with self.receipe.image.open() as image:
+            self.assertEqual(image.read(), self.data)
+        self.assertFalse(ImageUploadSession.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.tmp, "parts")), [])
+
+    def test_resume_reports_offset(self):
+        """Test a client can ask where to resume"""
+        upload_id = self._start()
+        self._put(upload_id, 0, 99)
+
+        res = self.client.get(session_url(self.receipe.id, upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["offset"], 100)
+
+    def test_chunk_at_wrong_offset(self):
+        """Test a chunk not starting at the offset is refused"""
+        upload_id = self._start()
+        self._put(upload_id, 0, 99)
+
+        res = self._put(upload_id, 50, 149)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data["offset"], 100)
+
+    def test_chunk_read_outside_transaction(self):
+        """Test a chunk is read from the client before any transaction"""
+        upload_id = self._start()
+        spool_chunk = uploads.spool_chunk
+        depths = []
+
+        def spool(*args):
+            depths.append(len(connection.savepoint_ids))
+            return spool_chunk(*args)
+
+        with patch("receipe.uploads.spool_chunk", spool):
+            res = self._put(upload_id, 0, 99)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(depths, [len(connection.savepoint_ids)])
+
+    def test_concurrent_chunk_refused(self):
+        """Test only one of two requests sending a chunk advances it"""
+        upload_id = self._start()
+        spool_chunk = uploads.spool_chunk
+
+        def spool(session, *args):
+            # The other request records the chunk while this one reads
+            ImageUploadSession.objects.filter(pk=session.pk).update(
+                offset=100
+            )
+            return spool_chunk(session, *args)
+
+        with patch("receipe.uploads.spool_chunk", spool):
+            res = self._put(upload_id, 0, 99)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data["offset"], 100)
+        self.assertEqual(os.listdir(os.path.join(self.tmp, "parts")), [])
+
+    def test_missing_content_range(self):
+        """Test a chunk without Content-Range is refused"""
+        upload_id = self._start()
+
+        res = self.client.generic(
+            "PUT", session_url(self.receipe.id, upload_id), b"abc",
+            content_type="application/octet-stream",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_too_large_refused(self):
+        """Test sessions above the size limit are not opened"""
+        with self.settings(RESUMABLE_UPLOAD_MAX_SIZE=10):
+            res = self.client.post(
+                start_url(self.receipe.id),
+                {"filename": "photo.jpg", "size": 11},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_image_discarded(self):
+        """Test a completed upload that is not an image is rejected"""
+        self.data = b"not an image at all"
+        upload_id = self._start()
+
+        res = self._put(upload_id, 0, len(self.data) - 1)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ImageUploadSession.objects.exists())
+        self.receipe.refresh_from_db()
+        self.assertFalse(self.receipe.image)
+
+    def test_abort_upload(self):
+        """Test deleting a session removes its partial file"""
+        upload_id = self._start()
+        self._put(upload_id, 0, 99)
+
+        res = self.client.delete(session_url(self.receipe.id, upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(ImageUploadSession.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.tmp, "parts")), [])
+
+    def test_other_users_session_not_found(self):
+        """Test sessions are only visible to their owner"""
+        upload_id = self._start()
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(session_url(self.receipe.id, upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cleanup_uploads(self):
+        """Test expired sessions and stray files are removed"""
+        upload_id = self._start()
+        self._put(upload_id, 0, 99)
+        stray = os.path.join(self.tmp, "parts", "stray.part")
+        open(stray, "wb").close()
+        os.utime(stray, (0, 0))
+        ImageUploadSession.objects.update(
+            updated_at=timezone.now() - timedelta(days=2)
+        )
+        out = StringIO()
+
+        call_command("cleanup_uploads", stdout=out)
+
+        self.assertFalse(ImageUploadSession.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.tmp, "parts")), [])
+        self.assertIn("1 expired upload sessions", out.getvalue())
+
+    def test_cleanup_keeps_live_sessions(self):
+        """Test sessions still in use are left alone"""
+        upload_id = self._start()
+        self._put(upload_id, 0, 99)
+
+        self.assertEqual(uploads.cleanup(), (0, 0))
+        self.assertTrue(ImageUploadSession.objects.exists())
@@ -0,0 +1,166 @@
+"""
+Test full text search of the receipe list
+"""
+from decimal import Decimal
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Receipe, Tags, Ingredient
+from receipe import search
+
+
+RECEIPES_URL = reverse('receipe:receipe-list')
+
+
+def create_receipe(user, **params):
+    """Create and return a sample receipe"""
+    defaults = {
+        'title': 'Sample receipe',
+        'time_minutes': 10,
+        'price': Decimal('2.50'),
+    }
+    defaults.update(params)
+    return Receipe.objects.create(user=user, **defaults)
+
+
+class ReceipeSearchTests(TestCase):
+    """Test the search param of the receipe list"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='search@example.com',
+            password='12345',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _search(self, text, **params):
+        """Return the ids the list answers a search with"""
+        res = self.client.get(RECEIPES_URL, dict(params, search=text))
+        if res.status_code == status.HTTP_404_NOT_FOUND:
+            return []
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [r['id'] for r in res.data['results']]
+
+    def test_search_matches_word_prefixes(self):
+        """Test every word of the search matches as a prefix"""
+        curry = create_receipe(self.user, title='Chicken curry')
+        create_receipe(self.user, title='Chicken soup')
+        create_receipe(self.user, title='Lentil curry')
+
+        self.assertEqual(self._search('chick cur'), [curry.id])
+
+    def test_search_matches_tags_ingredients_and_description(self):
+        """Test search covers tag and ingredient names and descriptions"""
+        tagged = create_receipe(self.user, title='Dal')
+        tagged.tags.add(Tags.objects.create(user=self.user, name='Vegan'))
+        with_ingr = create_receipe(self.user, title='Stew')
+        with_ingr.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Paprika')
+        )
+        described = create_receipe(
+            self.user, title='Bread', description='Needs rye flour'
+        )
+
+        self.assertEqual(self._search('vegan'), [tagged.id])
+        self.assertEqual(self._search('paprika'), [with_ingr.id])
+        self.assertEqual(self._search('rye'), [described.id])
+
+    def test_title_matches_rank_first(self):
+        """Test matches in the title outrank matches in the description"""
+        in_description = create_receipe(
+            self.user, title='Rice bowl', description='Served with curry'
+        )
+        in_title = create_receipe(self.user, title='Curry')
+
+        self.assertEqual(
+            self._search('curry'), [in_title.id, in_description.id]
+        )
+
+    def test_search_follows_renamed_attributes(self):
+        """Test renaming a tag changes which receipes a search finds"""
+        receipe = create_receipe(self.user, title='Dal')
+        tag = Tags.objects.create(user=self.user, name='Vegan')
+        receipe.tags.add(tag)
+
+        tag.name = 'Spicy'
+        tag.save()
+
+        self.assertEqual(self._search('vegan'), [])
+        self.assertEqual(self._search('spicy'), [receipe.id])
+
+    def test_search_combines_with_filters(self):
+        """Test search only returns receipes matching the filters too"""
+        tag = Tags.objects.create(user=self.user, name='Dinner')
+        tagged = create_receipe(self.user, title='Curry')
+        tagged.tags.add(tag)
+        create_receipe(self.user, title='Curry puffs')
+
+        ids = self._search('curry', tags=str(tag.id))
+
+        self.assertEqual(ids, [tagged.id])
+
+    def test_search_pages_by_rank(self):
+        """Test walking the cursor of a search returns each match once"""
+        for i in range(5):
+            create_receipe(self.user, title=f'Curry {i}')
+            create_receipe(
+                self.user, title=f'Rice {i}', description='with curry'
+            )
+        create_receipe(self.user, title='Soup')
+
+        res = self.client.get(RECEIPES_URL, {'search': 'curry',
+                                             'page_size': 3})
+        titles = []
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            titles += [r['title'] for r in res.data['results']]
+            if res.data['next'] is None:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(len(titles), 10)
+        self.assertEqual(len(set(titles)), 10)
+        self.assertTrue(all(t.startswith('Curry') for t in titles[:5]))
+
+    def test_search_is_limited_to_user(self):
+        """Test search never returns receipes of other users"""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='12345',
+        )
+        create_receipe(other, title='Curry')
+        mine = create_receipe(self.user, title='Curry')
+
+        self.assertEqual(self._search('curry'), [mine.id])
+
+    def test_blank_search_lists_everything(self):
+        """Test a search without words does not filter the list"""
+        receipes = [create_receipe(self.user) for _ in range(2)]
+
+        ids = self._search(' ,- ')
+
+        self.assertEqual(ids, sorted((r.id for r in receipes), reverse=True))
+
+
+class FallbackSearchTests(ReceipeSearchTests):
+    """Test the search of backends without full text search"""
+
+    def setUp(self):
+        super().setUp()
+        # Only the engine choice sees another backend, queries still
+        # run on the test database
+        vendor = patch.object(search, 'connection', Mock(vendor='sqlite'))
+        vendor.start()
+        self.addCleanup(vendor.stop)
+
+    def test_fallback_engine_used(self):
+        """Test the substring engine serves the searches"""
+        self.assertIsInstance(
+            search.get_engine(), search.FallbackSearchEngine
+        )
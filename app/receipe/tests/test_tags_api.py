@@ -3,6 +3,8 @@ Test Tags API
 """
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from core.models import Tags, Receipe
 from django.test import TestCase
@@ -56,7 +58,7 @@ class PrivateTagsAPITests(TestCase):
         tags = Tags.objects.all().order_by('-name')
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_get_tags_for_a_user(self):
         """Test retrieving tags for an authenticated user"""
@@ -70,8 +72,8 @@ class PrivateTagsAPITests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
-        self.assertEqual(len(res.data), 2)
+        self.assertEqual(res.data['results'], serializer.data)
+        self.assertEqual(len(res.data['results']), 2)
 
 
     def test_tag_update(self):
@@ -89,6 +91,17 @@ class PrivateTagsAPITests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, update_payload['name'])
 
+    def test_tag_rename_to_existing_name_error(self):
+        """Test renaming a tag onto another tag's name is rejected"""
+        create_tag(self.user, name='taken')
+        tag = create_tag(self.user, name='free')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'taken'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'free')
+
     def test_delete_tag(self):
         """Test deleting tag"""
 
@@ -117,8 +130,8 @@ class PrivateTagsAPITests(TestCase):
         s1 = TagSerializer(tag1)
         s2 = TagSerializer(tag2)
 
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     def test_filter_tags_unique(self):
         """Test filtered tags returns unique list """
@@ -137,7 +150,84 @@ class PrivateTagsAPITests(TestCase):
         receipe2.tags.add(tag)
 
         res = self.client.get(TAGS_URL, {"assigned_only": 1})
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def _tagged_receipes(self, counts):
+        """Create tags used by the given number of receipes each"""
+        tags = {}
+        for name, count in counts.items():
+            tag = create_tag(self.user, name=name)
+            for i in range(count):
+                receipe = Receipe.objects.create(title=f"{name} {i}",
+                                                 time_minutes=5,
+                                                 price=Decimal("1.00"),
+                                                 user=self.user)
+                receipe.tags.add(tag)
+            tags[name] = tag
+        return tags
+
+    def test_tags_with_counts(self):
+        """Test with_counts adds the number of receipes per tag"""
+        self._tagged_receipes({"Breakfast": 2, "Lunch": 1, "Dinner": 0})
+
+        res = self.client.get(TAGS_URL, {"with_counts": 1})
 
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        counts = {t["name"]: t["recipe_count"] for t in res.data["results"]}
+        self.assertEqual(counts, {"Breakfast": 2, "Lunch": 1, "Dinner": 0})
+
+    def test_tags_without_counts(self):
+        """Test counts are left out unless asked for"""
+        self._tagged_receipes({"Breakfast": 1})
 
+        res = self.client.get(TAGS_URL)
 
+        self.assertNotIn("recipe_count", res.data["results"][0])
+
+    def test_popular_tags_with_min_count(self):
+        """Test order=popular lists the most used tags first"""
+        self._tagged_receipes({"a": 1, "b": 3, "c": 2, "d": 0})
+
+        res = self.client.get(TAGS_URL, {"order": "popular", "min_count": 1})
+
+        self.assertEqual(
+            [(t["name"], t["recipe_count"]) for t in res.data["results"]],
+            [("b", 3), ("c", 2), ("a", 1)],
+        )
+
+    def test_popular_tags_paginate(self):
+        """Test walking popular tags with a cursor keeps the order"""
+        self._tagged_receipes({"a": 1, "b": 3, "c": 2, "d": 2, "e": 0})
+
+        res = self.client.get(TAGS_URL, {"order": "popular", "page_size": 2})
+        names = []
+        while True:
+            names += [t["name"] for t in res.data["results"]]
+            if res.data["next"] is None:
+                break
+            res = self.client.get(res.data["next"])
+
+        self.assertEqual(names[0], "b")
+        self.assertEqual(set(names[1:3]), {"c", "d"})
+        self.assertEqual(names[3:], ["a", "e"])
+
+    def test_tag_list_query_count_is_constant(self):
+        """Test counting tags does not add queries per tag or receipe"""
+        params = {"assigned_only": 1, "with_counts": 1}
+        self._tagged_receipes({"a": 1})
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(TAGS_URL, params)
+        self._tagged_receipes({"b": 3, "c": 2, "d": 4})
+        with CaptureQueriesContext(connection) as many:
+            res = self.client.get(TAGS_URL, params)
+
+        self.assertEqual(len(res.data["results"]), 4)
+        self.assertEqual(len(many), len(few))
+
+    def test_invalid_tag_list_params(self):
+        """Test malformed list params are bad requests"""
+        for params in ({"min_count": "many"}, {"order": "newest"},
+                       {"assigned_only": "yes"}):
+            res = self.client.get(TAGS_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,168 @@
+"""
+Resumable uploads of receipe images
+
+A client opens an upload session with the image's name and size, then
+sends the bytes in any number of PUT requests carrying a Content-Range
+header. Each chunk is streamed to a file on disk, so neither a chunk
+nor the whole image is held in memory, and an interrupted upload
+resumes from the session's offset. Chunks are read from the client
+before the session row is touched; only appending them to the partial
+file and advancing the offset happens in a transaction. The last chunk
+hands the file to Receipe.image.
+"""
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.utils import timezone
+
+from core.models import ImageUploadSession
+
+
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+READ_SIZE = 64 * 1024
+
+
+class ContentRangeError(ValueError):
+    """Raised for a missing or malformed Content-Range header"""
+
+
+class PartFile(UploadedFile):
+    """A completed partial file, handed to storages without copying
+
+    Storages and image validation use temporary_file_path() to move and
+    read the file from disk instead of loading it into memory.
+    """
+
+    def __init__(self, path, name, size):
+        super().__init__(open(path, "rb"), name=name, size=size)
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def part_path(session):
+    """Return the path of the partial file of an upload session"""
+    return os.path.join(
+        settings.RESUMABLE_UPLOAD_DIR, f"{session.pk}.part"
+    )
+
+
+def parse_content_range(header, size):
+    """Return (start, length) of a "bytes start-end/size" header"""
+    match = CONTENT_RANGE.match(header or "")
+    if not match:
+        raise ContentRangeError(
+            "Expected Content-Range: bytes start-end/size."
+        )
+    start, end, total = (int(value) for value in match.groups())
+    if total != size or start > end or end >= size:
+        raise ContentRangeError("Content-Range does not fit the upload.")
+    return start, end - start + 1
+
+
+def received(session):
+    """Return how many bytes of the upload are safely on disk"""
+    try:
+        size = os.path.getsize(part_path(session))
+    except FileNotFoundError:
+        size = 0
+    return min(size, session.offset)
+
+
+def spool_chunk(session, stream, length):
+    """Write up to length bytes of stream to a file of its own
+
+    Returns the path of the file and the number of bytes written. A body
+    cut short still counts, so a client whose connection dropped resumes
+    after the last byte that arrived. The caller removes the file.
+    """
+    os.makedirs(settings.RESUMABLE_UPLOAD_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(
+        dir=settings.RESUMABLE_UPLOAD_DIR, prefix=f"{session.pk}.",
+        suffix=".chunk",
+    )
+    written = 0
+    with os.fdopen(fd, "wb") as chunk:
+        while stream is not None and written < length:
+            data = stream.read(min(READ_SIZE, length - written))
+            if not data:
+                break
+            chunk.write(data)
+            written += len(data)
+    return path, written
+
+
+def append_chunk(session, offset, chunk_path):
+    """Write a spooled chunk to the partial file at offset
+
+    Run it with the session row locked, so chunks of one upload are
+    written one at a time.
+    """
+    path = part_path(session)
+    with open(path, "r+b" if os.path.exists(path) else "wb") as part:
+        # Drop bytes past the offset left by a write that failed midway
+        part.seek(offset)
+        part.truncate()
+        with open(chunk_path, "rb") as chunk:
+            shutil.copyfileobj(chunk, part, READ_SIZE)
+
+
+def completed_file(session):
+    """Return the partial file of a completed session as an upload"""
+    return PartFile(part_path(session), session.filename, session.size)
+
+
+def discard(session):
+    """Delete an upload session and its partial file"""
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def expires_at(session):
+    """Return when an idle upload session becomes garbage"""
+    return session.updated_at + timedelta(
+        seconds=settings.RESUMABLE_UPLOAD_EXPIRY
+    )
+
+
+def cleanup(now=None):
+    """Delete expired sessions and partial files without a session
+
+    Returns the number of sessions and stray files removed.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=settings.RESUMABLE_UPLOAD_EXPIRY)
+    sessions = 0
+    for session in ImageUploadSession.objects.filter(updated_at__lt=cutoff):
+        discard(session)
+        sessions += 1
+
+    strays = 0
+    if os.path.isdir(settings.RESUMABLE_UPLOAD_DIR):
+        live = {
+            f"{pk}.part" for pk in
+            ImageUploadSession.objects.values_list("pk", flat=True)
+        }
+        for entry in os.scandir(settings.RESUMABLE_UPLOAD_DIR):
+            if entry.name in live:
+                continue
+            # Chunks are left behind by requests that died while reading
+            if not entry.name.endswith((".part", ".chunk")):
+                continue
+            # Leave files a session being created right now may own
+            modified = datetime.fromtimestamp(
+                entry.stat().st_mtime, tz=timezone.utc
+            )
+            if modified < cutoff:
+                os.remove(entry.path)
+                strays += 1
+    return sessions, strays
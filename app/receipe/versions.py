@@ -0,0 +1,21 @@
+"""
+Version stamps of receipes and of users' receipe data
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import F
+
+from core.models import Receipe
+from receipe import cache
+
+
+def touch_user(user_id):
+    """Record that some receipe data of a user changed"""
+    get_user_model().objects.filter(pk=user_id).update(
+        data_version=F("data_version") + 1
+    )
+    cache.bump_generation(user_id)
+
+
+def touch_receipes(**filters):
+    """Bump the version of every receipe matching filters"""
+    Receipe.objects.filter(**filters).update(version=F("version") + 1)
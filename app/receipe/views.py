@@ -1,16 +1,39 @@
 """
 Views for the receipeAPI
 """
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Count, Exists, IntegerField, OuterRef, Subquery
+)
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from drf_spectacular.utils import (extend_schema_view, extend_schema, OpenApiParameter, OpenApiTypes)
 from rest_framework import (viewsets, mixins, status)
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.exceptions import UnsupportedMediaType, ValidationError
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.response import Response
-from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from core.models import Receipe, Tags, Ingredient
+from core.db.mixins import ReplicaReadMixin
+from core.metrics import TimedViewMixin
+from core.models import Receipe, Tags, Ingredient, ImageUploadSession
 from receipe import serializers
+from receipe import bulk
+from receipe import cookable
+from receipe import facets
+from receipe import images
+from receipe import uploads
+from receipe.cache import cached_list
+from receipe.conditional import detail_etag, if_match, list_etag
+from receipe import streaming
+from receipe.filters import ReceipeFilter, params_to_ints
+from receipe.pagination import KeysetPagination
+from receipe.search import ReceipeSearch
+from user.authentication import CachedTokenAuthentication
 
 
 @extend_schema_view(
@@ -25,46 +48,120 @@ from receipe import serializers
                 "ingredients",
                 OpenApiTypes.STR,
                 description="Comma separated list of ingredient IDs to filter"
+            ),
+            OpenApiParameter(
+                "match",
+                OpenApiTypes.STR,
+                enum=["any", "all"],
+                description=(
+                    "Match receipes having any (default) or all of the "
+                    "given IDs"
+                ),
+            ),
+            OpenApiParameter(
+                "search",
+                OpenApiTypes.STR,
+                description="Words to search the title, description, tags "
+                            "and ingredients for, best matches first"
+            ),
+            OpenApiParameter(
+                "facets",
+                OpenApiTypes.INT,
+                enum=[0, 1],
+                description="Add the number of matching receipes per tag "
+                            "and per ingredient to the response"
             )
         ]
     )
 )
-class ReceipeViewSet(viewsets.ModelViewSet):
+class ReceipeViewSet(ReplicaReadMixin, TimedViewMixin, viewsets.ModelViewSet):
     """View for managing receipe """
 
     serializer_class = serializers.ReceipeDetailSerializer
     queryset = Receipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    ordering = ("-id",)
+
+    def _denormalized(self):
+        """Return True when the action renders the copied attributes"""
+        return (self.action in ("list", "cookable")
+                and settings.RECEIPE_DENORMALIZED_LIST)
+
+    def _apply_query_plan(self, queryset):
+        """Shape the queryset for the fields the current action renders"""
+        if self._denormalized():
+            return queryset.defer(
+                "description", "image", "image_variants", "search_vector"
+            )
+        queryset = queryset.defer(
+            "search_vector", "tag_cache", "ingredient_cache"
+        )
+        if self.action in ("list", "cookable", "retrieve", "update",
+                           "partial_update"):
+            queryset = queryset.prefetch_related(*streaming.attr_prefetches())
+        if self.action in ("list", "cookable"):
+            queryset = queryset.defer(
+                "description", "image", "image_variants"
+            )
+        return queryset
 
-    def _params_to_ints(self, qs):
-        """Convert a list of strings to integers"""
-        return [int(str_id) for str_id in qs.split(",")]
+    def get_search(self):
+        """Return the search of the request's query params"""
+        if not hasattr(self, "_search"):
+            self._search = ReceipeSearch(self.request.query_params)
+        return self._search
+
+    def get_ordering(self):
+        """Order search results by rank, other lists by id"""
+        if self.action == "cookable":
+            return cookable.ORDERING
+        if self.action == "list" and self.get_search():
+            return self.get_search().ordering
+        return self.ordering
+
+    def _ingredients_at_hand(self):
+        """Return the ingredient ids a cookable request passed"""
+        value = self.request.query_params.get("ingredients")
+        if not value:
+            raise ValidationError(
+                {"ingredients": "Expected the IDs of the ingredients at hand."}
+            )
+        return params_to_ints("ingredients", value)
 
     def get_queryset(self):
         """Retrieve receipes for authenticated user"""
-        tags = self.request.query_params.get("tags")
-        ingredients = self.request.query_params.get("ingredients")
-        queryset = self.queryset
-
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if  ingredients:
-            ingr_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingr_ids)
+        queryset = ReceipeFilter(
+            self.request.query_params
+        ).filter_queryset(self._apply_query_plan(self.queryset))
+        if self.action == "list":
+            queryset = self.get_search().filter_queryset(queryset)
+        elif self.action == "cookable":
+            # Rank narrow rows, cookable() then loads the page it returns
+            queryset = cookable.annotate_coverage(
+                queryset.only("id", "ingredient_count").prefetch_related(None),
+                self._ingredients_at_hand(),
+            )
 
         return queryset.filter(
             user=self.request.user
-        ).order_by("-id").distinct()
-
+        ).order_by(*self.get_ordering())
 
     def get_serializer_class(self):
         """Return the serializer class for request"""
-        if self.action == "list":
+        if self.action == "cookable":
+            if self._denormalized():
+                return serializers.CookableReceipeListSerializer
+            return serializers.CookableReceipeSerializer
+        elif self._denormalized():
+            return serializers.ReceipeListSerializer
+        elif self.action == "list":
             return serializers.ReceipeSerializer
         elif self.action == "upload_image":
             return serializers.ReceipeImageSerializer
+        elif self.action in ("start_image_upload", "image_upload"):
+            return serializers.ImageUploadSessionSerializer
 
         return self.serializer_class
 
@@ -79,29 +176,263 @@ class ReceipeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(receipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            self._save_image(receipe, serializer)
             return Response(serializer.data, status.HTTP_200_OK)
 
         return Response(serializer.errors, status.HTTP_400_BAD_REQUEST)
 
+    def _save_image(self, receipe, serializer):
+        """Store a validated image and queue its variants"""
+        # The variants are rendered off the request, see receipe.images
+        try:
+            with transaction.atomic():
+                receipe = serializer.save(
+                    image_status=Receipe.IMAGE_PENDING,
+                    image_width=None,
+                    image_height=None,
+                    image_variants=[],
+                )
+                images.schedule(receipe)
+        finally:
+            # The copy without metadata is not one of the request's files,
+            # which Django closes and deletes once the response is sent
+            serializer.validated_data["image"].close()
+        return receipe
+
+    @action(methods=["POST"], detail=True, url_path="image-upload",
+            url_name="image-upload-start")
+    def start_image_upload(self, request, pk=None):
+        """Open a resumable upload of the receipe's image"""
+        receipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user, receipe=receipe)
+        return Response(serializer.data, status.HTTP_201_CREATED)
+
+    @extend_schema(parameters=[
+        OpenApiParameter("upload_id", OpenApiTypes.UUID,
+                         OpenApiParameter.PATH),
+    ])
+    @extend_schema(
+        methods=["PUT"],
+        request={"application/octet-stream": OpenApiTypes.BINARY},
+        responses={
+            200: serializers.ReceipeImageSerializer,
+            202: serializers.ImageUploadSessionSerializer,
+        },
+    )
+    @action(methods=["GET", "PUT", "DELETE"], detail=True,
+            url_path=r"image-upload/(?P<upload_id>[0-9a-f-]+)",
+            url_name="image-upload")
+    def image_upload(self, request, pk=None, upload_id=None):
+        """Report, continue or abort a resumable image upload
+
+        PUT takes the next chunk as the raw body with a Content-Range
+        header and answers 202 with the new offset until the last chunk,
+        which stores the image and answers like upload-image.
+        """
+        receipe = self.get_object()
+        session = get_object_or_404(
+            ImageUploadSession.objects.filter(user=request.user),
+            pk=upload_id, receipe=receipe,
+        )
+        if request.method == "GET":
+            return Response(self.get_serializer(session).data)
+        if request.method == "DELETE":
+            uploads.discard(session)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        try:
+            start, length = uploads.parse_content_range(
+                request.META.get("HTTP_CONTENT_RANGE"), session.size
+            )
+        except uploads.ContentRangeError as exc:
+            return Response({"detail": str(exc)}, status.HTTP_400_BAD_REQUEST)
+        offset = uploads.received(session)
+        if offset != session.offset:
+            # An offset was recorded for bytes that never reached the disk
+            ImageUploadSession.objects.filter(
+                pk=session.pk, offset=session.offset
+            ).update(offset=offset, updated_at=timezone.now())
+            session.offset = offset
+        if start == offset:
+            # Read the chunk from the client before touching the session
+            # row, a slow client then holds no lock or transaction open
+            chunk, written = uploads.spool_chunk(
+                session, request.stream, length
+            )
+            try:
+                with transaction.atomic():
+                    # Only one request advances the session from start
+                    advanced = ImageUploadSession.objects.filter(
+                        pk=session.pk, offset=start
+                    ).update(
+                        offset=start + written, updated_at=timezone.now()
+                    )
+                    if advanced:
+                        uploads.append_chunk(session, start, chunk)
+            finally:
+                os.remove(chunk)
+            if not advanced:
+                # Another request sent this chunk meanwhile
+                session.refresh_from_db()
+        if start != offset or not advanced:
+            return Response(
+                {"detail": "Chunk does not start at the offset.",
+                 "offset": session.offset},
+                status.HTTP_409_CONFLICT,
+            )
+        session.offset = start + written
+
+        if session.offset < session.size:
+            return Response(
+                self.get_serializer(session).data, status.HTTP_202_ACCEPTED
+            )
+
+        with uploads.completed_file(session) as upload:
+            serializer = serializers.ReceipeImageSerializer(
+                receipe,
+                data={"image": upload},
+                context=self.get_serializer_context(),
+            )
+            valid = serializer.is_valid()
+            if valid:
+                self._save_image(receipe, serializer)
+        uploads.discard(session)
+        if not valid:
+            return Response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.data, status.HTTP_200_OK)
+
+    @extend_schema(
+        request={
+            bulk.NDJSON: OpenApiTypes.STR,
+            bulk.CSV: OpenApiTypes.STR,
+        },
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(methods=["POST"], detail=False, url_path="bulk")
+    def bulk_import(self, request):
+        """Import receipes from a streamed NDJSON or CSV body"""
+        media_type = request.content_type.split(";")[0].strip()
+        if media_type == bulk.NDJSON:
+            rows = bulk.iter_ndjson_rows(request.stream)
+        elif media_type == bulk.CSV:
+            rows = bulk.iter_csv_rows(request.stream)
+        else:
+            raise UnsupportedMediaType(media_type)
+
+        importer = bulk.BulkImporter(
+            serializers.ReceipeDetailSerializer,
+            user=request.user,
+            context=self.get_serializer_context(),
+            chunk_size=settings.RECEIPE_BULK_CHUNK_SIZE,
+        )
+        try:
+            summary = importer.run(rows)
+        except bulk.MalformedBodyError as exc:
+            # Chunks before the bad line are already committed
+            return Response(
+                {
+                    "detail": str(exc),
+                    "line": exc.line,
+                    "created": importer.created,
+                },
+                status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(summary, status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "output",
+                OpenApiTypes.STR,
+                enum=[streaming.JSON, streaming.NDJSON],
+                description="Stream a JSON array (default) or NDJSON"
+            )
+        ],
+        responses={200: serializers.ReceipeDetailSerializer(many=True)},
+    )
+    @action(methods=["GET"], detail=False)
+    def export(self, request):
+        """Stream every receipe of the user in fixed size chunks"""
+        output = request.query_params.get("output", streaming.JSON)
+        if output not in streaming.CONTENT_TYPES:
+            expected = ", ".join(streaming.CONTENT_TYPES)
+            raise ValidationError({"output": f"Expected one of {expected}."})
+        response = StreamingHttpResponse(
+            streaming.iter_export(
+                self.get_queryset(),
+                self.get_serializer_class(),
+                context=self.get_serializer_context(),
+                output=output,
+                chunk_size=settings.RECEIPE_EXPORT_CHUNK_SIZE,
+            ),
+            content_type=streaming.CONTENT_TYPES[output],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="receipes.{output}"'
+        )
+        return response
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "ingredients",
+                OpenApiTypes.STR,
+                required=True,
+                description="Comma separated list of the IDs of the "
+                            "ingredients at hand"
+            ),
+            OpenApiParameter(
+                "tags",
+                OpenApiTypes.STR,
+                description="Comma separated list of tag IDs to filter"
+            ),
+        ],
+        responses={200: serializers.CookableReceipeSerializer(many=True)},
+    )
+    @action(methods=["GET"], detail=False)
+    @cached_list
+    def cookable(self, request):
+        """List receipes by how much of them the given ingredients cover"""
+        page = cookable.load_page(
+            self.paginate_queryset(self.get_queryset()),
+            self._apply_query_plan(self.queryset),
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
+    @list_etag
+    @cached_list
     def list(self, request, *args, **kwargs):
         """List for all receipes"""
-
         queryset = self.get_queryset()
-        if not queryset.exists():
+        page = self.paginate_queryset(queryset)
+        if not page and self.paginator.is_first_page:
             return Response({'detail': 'No recipe found.'}, status=status.HTTP_404_NOT_FOUND)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        serializer = self.get_serializer(page, many=True)
+        response = self.get_paginated_response(serializer.data)
+        if facets.wants_facets(request):
+            response.data["facets"] = facets.get_facets(request, queryset)
+        return response
 
+    @detail_etag
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a receipe, answering If-None-Match from its version"""
+        return super().retrieve(request, *args, **kwargs)
+
+    @if_match
+    def update(self, request, *args, **kwargs):
+        """Update a receipe, honouring If-Match"""
+        return super().update(request, *args, **kwargs)
+
+    @if_match
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         self.perform_destroy(instance)
         return Response({'detail': 'Recipe deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
 
 
-
 @extend_schema_view(
     list=extend_schema(
         parameters=[
@@ -110,37 +441,101 @@ class ReceipeViewSet(viewsets.ModelViewSet):
                 OpenApiTypes.INT,
                 enum=[0, 1],
                 description="Filter by items assigned to receipes"
+            ),
+            OpenApiParameter(
+                "with_counts",
+                OpenApiTypes.INT,
+                enum=[0, 1],
+                description="Add the number of receipes using each item"
+            ),
+            OpenApiParameter(
+                "min_count",
+                OpenApiTypes.INT,
+                description=(
+                    "Only list items used by at least this many receipes"
+                )
+            ),
+            OpenApiParameter(
+                "order",
+                OpenApiTypes.STR,
+                enum=["name", "popular"],
+                description="List by name (default) or most used first"
             )
         ]
     )
 )
-class BaseReceipeAttrViewSet(mixins.DestroyModelMixin,
-                 mixins.UpdateModelMixin,
-                 mixins.ListModelMixin,
-                 viewsets.GenericViewSet):
+class BaseReceipeAttrViewSet(ReplicaReadMixin, TimedViewMixin,
+                             mixins.DestroyModelMixin,
+                             mixins.UpdateModelMixin,
+                             mixins.ListModelMixin,
+                             viewsets.GenericViewSet):
     """Base ViewSet for Receipe attributes"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    ordering = ("-name", "id")
+    popular_ordering = ("-recipe_count", "id")
+
+    def _int_param(self, name, default=0):
+        """Return an integer query param, rejecting anything else"""
+        value = self.request.query_params.get(name)
+        if value in (None, ""):
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: "Expected an integer."})
+
+    def _order(self):
+        order = self.request.query_params.get("order") or "name"
+        if order not in ("name", "popular"):
+            raise ValidationError(
+                {"order": "Expected one of 'name' or 'popular'."}
+            )
+        return order
+
+    def get_ordering(self):
+        """Order by name, or by receipe count for order=popular"""
+        if self.action == "list" and self._order() == "popular":
+            return self.popular_ordering
+        return self.ordering
 
     def get_queryset(self):
         f"""Get {self.queryset.model.__name__.lower()}s for authenticated user """
-        assigned_only = bool(
-            int(self.request.query_params.get("assigned_only", 0))
-        )
-        queryset = self.queryset
-        if assigned_only:
-           queryset = queryset.filter(receipe__isnull=False)
-        return queryset.filter(
-            user=self.request.user
-            ).order_by('-name').distinct()
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action != "list":
+            return queryset.order_by(*self.ordering)
 
+        field = Receipe._meta.get_field(self.relation)
+        target = f"{field.m2m_reverse_field_name()}_id"
+        links = field.remote_field.through.objects.filter(
+            **{target: OuterRef("pk")}
+        ).order_by()
+        if self._int_param("assigned_only"):
+            queryset = queryset.filter(Exists(links))
+        min_count = self._int_param("min_count")
+        if (self._int_param("with_counts") or min_count
+                or self._order() == "popular"):
+            # Counted per item on the link table's index, so neither the
+            # receipes nor the links of other users are read
+            counts = links.values(target).annotate(
+                count=Count("*")
+            ).values("count")
+            queryset = queryset.annotate(recipe_count=Coalesce(
+                Subquery(counts, output_field=IntegerField()), 0
+            ))
+        if min_count:
+            queryset = queryset.filter(recipe_count__gte=min_count)
+        return queryset.order_by(*self.get_ordering())
+
+    @cached_list
     def list(self, request, *args, **kwargs):
         f"""List for all {self.queryset.model.__name__.lower()}s"""
-        queryset = self.get_queryset()
-        if not queryset.exists():
+        page = self.paginate_queryset(self.get_queryset())
+        if not page and self.paginator.is_first_page:
             return Response({'detail': f'No {self.queryset.model.__name__.lower()} found.'}, status=status.HTTP_404_NOT_FOUND)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     def destroy(self, request, *args, **kwargs):
         """Custom message for delete operation."""
         instance = self.get_object()
@@ -155,10 +550,12 @@ class TagViewSet(BaseReceipeAttrViewSet):
 
     serializer_class = serializers.TagSerializer
     queryset = Tags.objects.all()
+    relation = "tags"
 
 
 class IngredientsViewSet(BaseReceipeAttrViewSet):
     """Manage Ingredients in the Database"""
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
+    relation = "ingredients"
 
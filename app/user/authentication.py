@@ -0,0 +1,140 @@
+"""
+Token authentication backed by a cache instead of a query per request
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core.caches import is_shared
+
+
+TOKEN_KEY = "auth:token:{digest}"
+
+
+class LocalTokenCache:
+    """Bounded, thread safe LRU of tokens kept for a short TTL"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached token for key, if it has not expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token
+
+    def set(self, key, token):
+        """Cache token, evicting the least recently used entry when full"""
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (token, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_tokens = LocalTokenCache(
+    settings.AUTH_TOKEN_LOCAL_CACHE_SIZE,
+    settings.AUTH_TOKEN_LOCAL_CACHE_TTL,
+)
+
+
+def get_cache():
+    """Return the cache backend holding resolved tokens"""
+    return caches[settings.AUTH_TOKEN_CACHE_ALIAS]
+
+
+def is_enabled():
+    """Return whether resolved tokens are cached
+
+    Deleting a token or deactivating its user only invalidates the
+    caches of the process doing it, so with a process local backend the
+    other processes would keep accepting the token.
+    """
+    return is_shared(get_cache())
+
+
+def _shared_key(key):
+    # Hash the token so raw credentials never show up in cache key names
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return TOKEN_KEY.format(digest=digest)
+
+
+def _forget(keys):
+    for key in keys:
+        local_tokens.discard(key)
+    get_cache().delete_many([_shared_key(key) for key in keys])
+
+
+def invalidate_tokens(keys):
+    """Drop cached tokens, now and again once the transaction commits
+
+    The second pass discards entries a concurrent request cached from
+    the rows as they were before the commit.
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    _forget(keys)
+    transaction.on_commit(lambda: _forget(keys))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication resolving tokens from a cache
+
+    Lookups go to a small in-process LRU first, then the shared Django
+    cache, and only fall back to the database on a miss. Invalid tokens
+    are never cached, so they keep failing against the database.
+    Without a shared cache backend nothing is cached.
+    """
+
+    def authenticate_credentials(self, key):
+        if not is_enabled():
+            return super().authenticate_credentials(key)
+        token = local_tokens.get(key)
+        if token is None:
+            token = get_cache().get(_shared_key(key))
+            if token is not None:
+                local_tokens.set(key, token)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            get_cache().set(
+                _shared_key(key),
+                token,
+                timeout=settings.AUTH_TOKEN_CACHE_TIMEOUT,
+            )
+            local_tokens.set(key, token)
+            return (user, token)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return (token.user, token)
@@ -0,0 +1,29 @@
+"""
+Password hashers whose cost is read from the settings
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    BCryptSHA256PasswordHasher,
+    PBKDF2PasswordHasher,
+)
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 with PASSWORD_PBKDF2_ITERATIONS iterations"""
+
+    iterations = settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class TunedBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+    """bcrypt with 2 ** PASSWORD_BCRYPT_ROUNDS rounds"""
+
+    rounds = settings.PASSWORD_BCRYPT_ROUNDS
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 with the PASSWORD_ARGON2_* cost settings"""
+
+    time_cost = settings.PASSWORD_ARGON2_TIME_COST
+    memory_cost = settings.PASSWORD_ARGON2_MEMORY_COST
+    parallelism = settings.PASSWORD_ARGON2_PARALLELISM
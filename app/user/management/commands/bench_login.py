@@ -0,0 +1,66 @@
+"""
+Django command to benchmark the CPU cost of logging in
+"""
+import time
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+from user.serializers import AuthTokenSerializer
+
+
+class Command(BaseCommand):
+    """Measure CPU time per login and per configured password hasher"""
+
+    help = "Time logins and password hashers in CPU milliseconds"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", default="bench-login@example.com")
+        parser.add_argument("--password", default="bench-pass-123")
+        parser.add_argument("--logins", type=int, default=20)
+
+    def _cpu_ms(self, func, repeat):
+        """Return the mean CPU milliseconds func takes"""
+        start = time.process_time()
+        for _ in range(repeat):
+            func()
+        return (time.process_time() - start) * 1000 / repeat
+
+    def _report(self, label, ms):
+        self.stdout.write(f"{label}: {ms:.2f} ms CPU")
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        email, password = options["email"], options["password"]
+        user, _created = get_user_model().objects.get_or_create(
+            email=email, defaults={"name": "bench"}
+        )
+        user.set_password(password)
+        user.save(update_fields=["password"])
+        logins = options["logins"]
+
+        def legacy():
+            # The previous login path: a lookup, then authenticate()
+            get_user_model().objects.get(email=email)
+            authenticate(username=email, password=password)
+
+        def serializer():
+            login = AuthTokenSerializer(
+                data={"email": email, "password": password}
+            )
+            login.is_valid(raise_exception=True)
+
+        self._report("get + authenticate()", self._cpu_ms(legacy, logins))
+        self._report("AuthTokenSerializer", self._cpu_ms(serializer, logins))
+
+        for hasher in get_hashers():
+            try:
+                encoded = hasher.encode(password, hasher.salt())
+            except ValueError as exc:
+                self.stdout.write(f"{hasher.algorithm}: skipped ({exc})")
+                continue
+            self._report(
+                f"{hasher.algorithm} verify",
+                self._cpu_ms(lambda: hasher.verify(password, encoded), logins),
+            )
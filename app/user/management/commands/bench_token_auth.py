@@ -0,0 +1,62 @@
+"""
+Django command to benchmark token authentication
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory
+
+from user.authentication import (
+    CachedTokenAuthentication, is_enabled, local_tokens
+)
+from user.views import ManageUserView
+
+
+class Command(BaseCommand):
+    """Compare requests/sec of the token authentication classes"""
+
+    help = "Time authenticated requests to the user endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", default="bench@example.com")
+        parser.add_argument("--requests", type=int, default=2000)
+
+    def _run(self, view, token, requests, before=None):
+        factory = APIRequestFactory()
+        start = time.perf_counter()
+        for _ in range(requests):
+            if before:
+                before()
+            request = factory.get(
+                "/api/user/me/", HTTP_AUTHORIZATION=f"Token {token.key}"
+            )
+            response = view(request)
+            assert response.status_code == 200, response.status_code
+        return requests / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        """Entry point for commands"""
+        user, _created = get_user_model().objects.get_or_create(
+            email=options["email"], defaults={"name": "bench"}
+        )
+        token, _created = Token.objects.get_or_create(user=user)
+        requests = options["requests"]
+        if not is_enabled():
+            self.stdout.write(self.style.WARNING(
+                "AUTH_TOKEN_CACHE_ALIAS is process local, tokens are not "
+                "cached"
+            ))
+
+        cases = [
+            ("TokenAuthentication", TokenAuthentication, None),
+            ("CachedTokenAuthentication (shared cache)",
+             CachedTokenAuthentication, local_tokens.clear),
+            ("CachedTokenAuthentication", CachedTokenAuthentication, None),
+        ]
+        for label, auth_class, before in cases:
+            view = ManageUserView.as_view(authentication_classes=[auth_class])
+            rate = self._run(view, token, requests, before)
+            self.stdout.write(f"{label}: {rate:.0f} requests/sec")
@@ -1,5 +1,5 @@
 """Serializers for the user api view"""
-from django.contrib.auth import (get_user_model, authenticate)
+from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
@@ -55,18 +55,21 @@ class AuthTokenSerializer(serializers.Serializer):
                 code="email_not_found"
             )
 
-        user = authenticate(
-            request=self.context.get('request'),
-            username=email,
-            password=password
-        )
-
-        if not user:
+        # Verify against the fetched user instead of calling authenticate(),
+        # which would load the same row again. check_password() also
+        # rehashes the password when the hasher or its cost has changed.
+        if not user.check_password(password):
             raise serializers.ValidationError(
                 {"password": _("Incorrect password.")},
                 code="invalid_password"
             )
 
+        if not user.is_active:
+            raise serializers.ValidationError(
+                {"detail": _("User account is disabled.")},
+                code="inactive"
+            )
+
         attrs['user'] = user
         return attrs
 
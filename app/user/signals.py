@@ -0,0 +1,25 @@
+"""
+Signal handlers dropping cached auth tokens when their user changes
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_tokens
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, created, **kwargs):
+    """Drop the cached tokens of an edited or deactivated user"""
+    if not created:
+        invalidate_tokens(
+            Token.objects.filter(user_id=instance.pk)
+            .values_list("key", flat=True)
+        )
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Stop accepting a deleted token from the cache"""
+    invalidate_tokens([instance.key])
@@ -0,0 +1,179 @@
+"""Tests for the cached token authentication"""
+
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from io import StringIO
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import LocalTokenCache, local_tokens
+
+ME_URL = reverse('user:me')
+RECEIPES_URL = reverse('receipe:receipe-list')
+
+
+def create_user(**params):
+    """Create and return a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+class LocalTokenCacheTests(TestCase):
+    """Test the per-process token LRU"""
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest unused entry is dropped when full"""
+        lru = LocalTokenCache(maxsize=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('c'), 3)
+
+    def test_entries_expire(self):
+        """Test entries are not returned after their TTL"""
+        lru = LocalTokenCache(maxsize=2, ttl=0.01)
+        lru.set('a', 1)
+        lru._entries['a'] = (1, 0)
+
+        self.assertIsNone(lru.get('a'))
+
+    def test_zero_ttl_disables(self):
+        """Test nothing is kept with a TTL of 0"""
+        lru = LocalTokenCache(maxsize=2, ttl=0)
+        lru.set('a', 1)
+
+        self.assertIsNone(lru.get('a'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating API requests with cached tokens"""
+
+    def setUp(self):
+        # Tokens are only cached in a backend all processes share
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        shared = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location.name,
+        }})
+        shared.enable()
+        self.addCleanup(shared.disable)
+        local_tokens.clear()
+        self.user = create_user(
+            email='user@example.com',
+            password='testpass123',
+            name='user',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_counting_token_queries(self, url):
+        """Return the response to url and the token lookups it ran"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url)
+        table = Token._meta.db_table
+        return res, sum(table in query['sql'] for query in queries)
+
+    def test_token_lookup_is_cached(self):
+        """Test repeated requests do not query the token table"""
+        self.client.get(ME_URL)
+
+        res, lookups = self.get_counting_token_queries(ME_URL)
+
+        self.assertEqual(lookups, 0)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_shared_cache_used_without_local_entry(self):
+        """Test another process finds the token in the shared cache"""
+        self.client.get(ME_URL)
+        local_tokens.clear()
+
+        res, lookups = self.get_counting_token_queries(ME_URL)
+
+        self.assertEqual(lookups, 0)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is not authenticated"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        """Test a cached token stops working once deleted"""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a cached token stops working when its user is deactivated"""
+        self.client.get(RECEIPES_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(RECEIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_refreshes_user(self):
+        """Test edits through the me endpoint are seen by later requests"""
+        self.client.get(ME_URL)
+
+        res = self.client.patch(ME_URL, {'name': 'new name'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'new name')
+
+    def test_profile_update_saves_fresh_row(self):
+        """Test an update does not write back columns of the cached user"""
+        self.client.get(ME_URL)
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_staff=True, data_version=5
+        )
+
+        res = self.client.patch(ME_URL, {'name': 'new name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_staff)
+        self.assertEqual(self.user.data_version, 5)
+
+    def test_process_local_cache_not_used(self):
+        """Test tokens are looked up each time without a shared cache"""
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}):
+            self.client.get(ME_URL)
+
+            res, lookups = self.get_counting_token_queries(ME_URL)
+
+        self.assertEqual(lookups, 1)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_bench_token_auth(self):
+        """Test the token authentication benchmark runs"""
+        out = StringIO()
+
+        call_command('bench_token_auth', requests=3, stdout=out)
+
+        self.assertIn('CachedTokenAuthentication', out.getvalue())
+        self.assertIn('requests/sec', out.getvalue())
@@ -2,10 +2,14 @@
 
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from io import StringIO
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
@@ -123,6 +127,51 @@ class PublicUserApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_create_token_fetches_user_once(self):
+        """Test logging in loads the user a single time"""
+        user = create_user(email='test@gmail.com', password='123')
+        Token.objects.create(user=user)
+        payload = {'email': 'test@gmail.com', 'password': '123'}
+
+        # The user lookup and the token lookup
+        with self.assertNumQueries(2):
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_create_token_rehashes_password(self):
+        """Test a password stored with an older hasher is upgraded"""
+        user = create_user(email='test@gmail.com', password='123')
+        user.password = make_password('123', hasher='pbkdf2_sha1')
+        user.save()
+        payload = {'email': 'test@gmail.com', 'password': '123'}
+
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password('123'))
+
+    def test_create_token_inactive_user(self):
+        """Test no token is issued to a deactivated user"""
+        create_user(email='test@gmail.com', password='123', is_active=False)
+        payload = {'email': 'test@gmail.com', 'password': '123'}
+
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertNotIn('token', res.data)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bench_login(self):
+        """Test the login benchmark runs"""
+        out = StringIO()
+
+        call_command('bench_login', logins=1, stdout=out)
+
+        self.assertIn('AuthTokenSerializer', out.getvalue())
+        self.assertIn('ms CPU', out.getvalue())
+
 
 class PrivateUserAPITests(TestCase):
     """Test API requests thata require Authentication"""
@@ -1,8 +1,12 @@
 """View for the user API"""
 
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from core.db.mixins import ReplicaReadMixin
+from core.metrics import TimedViewMixin
+from .authentication import CachedTokenAuthentication
 from .serializers import *
 
 
@@ -15,12 +19,15 @@ class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(ReplicaReadMixin, TimedViewMixin,
+                     generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         """Retrieve and return the authenticated user"""
-        return self.request.user
+        # request.user may be a cached copy, updates must save the row
+        # as it is now
+        return get_user_model().objects.get(pk=self.request.user.pk)
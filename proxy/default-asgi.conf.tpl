@@ -0,0 +1,49 @@
+server {
+    listen ${LISTEN_PORT} ;
+
+
+    # Serve static files
+    location /static/ {
+        alias /vol/static/;
+    }
+
+    # Serve media files
+    location /media/ {
+        alias /vol/static/;
+    }
+
+    # Receipe images are named after their content and never change
+    location /media/blobs/ {
+        alias /vol/static/media/blobs/;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+
+    # Stream bulk receipe imports to Django instead of buffering them
+    location = /api/receipes/bulk/ {
+        proxy_pass http://${APP_HOST}:${APP_PORT};
+        include /etc/nginx/proxy_params;
+        client_max_body_size 500M;
+        proxy_request_buffering off;
+    }
+
+    # Stream resumable image upload chunks to Django as they arrive
+    location ~ ^/api/receipes/\d+/image-upload/ {
+        proxy_pass http://${APP_HOST}:${APP_PORT};
+        include /etc/nginx/proxy_params;
+        client_max_body_size 20M;
+        proxy_request_buffering off;
+    }
+
+    # Proxy requests to Django (via uvicorn)
+    location / {
+        proxy_pass http://${APP_HOST}:${APP_PORT};
+        include /etc/nginx/proxy_params;
+        client_max_body_size 10M;
+    }
+
+
+    # Block hidden files
+    location ~ /\. {
+        deny all;
+    }
+}
@@ -12,6 +12,28 @@ server {
         alias /vol/static/;
     }
 
+    # Receipe images are named after their content and never change
+    location /media/blobs/ {
+        alias /vol/static/media/blobs/;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+
+    # Stream bulk receipe imports to Django instead of buffering them
+    location = /api/receipes/bulk/ {
+        uwsgi_pass ${APP_HOST}:${APP_PORT};
+        include /etc/nginx/uwsgi_params;
+        client_max_body_size 500M;
+        uwsgi_request_buffering off;
+    }
+
+    # Stream resumable image upload chunks to Django as they arrive
+    location ~ ^/api/receipes/\d+/image-upload/ {
+        uwsgi_pass ${APP_HOST}:${APP_PORT};
+        include /etc/nginx/uwsgi_params;
+        client_max_body_size 20M;
+        uwsgi_request_buffering off;
+    }
+
     # Proxy requests to Django (via uWSGI)
     location / {
         uwsgi_pass ${APP_HOST}:${APP_PORT};
@@ -7,4 +7,14 @@ python manage.py collectstatic --noinput
 python manage.py makemigrations
 python manage.py migrate
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
+# Worker processes share their Prometheus samples through files here,
+# files left by a previous run would be added to the new samples
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+if [ "$SERVER_MODE" = "asgi" ]; then
+    uvicorn app.asgi:application --host 0.0.0.0 --port 9000 --workers 4
+else
+    uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
+fi